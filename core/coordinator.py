@@ -0,0 +1,204 @@
+"""
+任务运行协调：防止同一台机器上的多个实例（或同一实例内重叠的触发）同时处理同一批目录
+
+- 跨进程：对 tmp/social_ocr.lock 加文件锁（Linux 为 fcntl.flock，Windows 为 msvcrt.locking），
+  进程退出时操作系统自动释放，不会残留死锁
+- 重叠触发策略：
+    skip：已有任务在运行时，本次触发直接跳过
+    coalesce：等待正在运行的任务结束后再执行一次；等待期间的多次触发合并为一次
+- 每次运行生成运行ID，写入日志上下文（run_id）并在 logs/runs/ 下输出运行报告 JSON
+- 开启 --profile 时按比例剖析运行，结果以运行ID为文件名写入 logs/profile/（见 core/profiler.py）
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from core.logger import logger
+from core.metrics import RUNS
+from core.profiler import profile_run
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LOCK_PATH = os.path.join(root_dir, "tmp", "social_ocr.lock")
+DEFAULT_REPORT_DIR = os.path.join(root_dir, "logs", "runs")
+OVERLAP_POLICIES = ("skip", "coalesce")
+
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def new_run_id():
+    """运行ID：时间戳 + 随机后缀，如 20250902-220000-3f9a1c"""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class RunCoordinator:
+    """
+    用法：
+        coordinator = RunCoordinator(policy="skip")
+        coordinator.run(run_all_tasks, sync_enabled, full_resync, trigger="schedule")
+    """
+
+    def __init__(self, policy="skip", lock_path=DEFAULT_LOCK_PATH, report_dir=DEFAULT_REPORT_DIR, wait_interval=5,
+                 profile=True):
+        """
+        :param policy: 重叠触发策略 skip / coalesce
+        :param lock_path: 跨进程锁文件路径
+        :param report_dir: 运行报告目录，为 None 时不输出报告
+        :param wait_interval: coalesce 策略下等待其它实例释放锁的轮询间隔（秒）
+        :param profile: 是否按 --profile 的设置剖析运行（监听模式下每批新文件的识别不剖析）
+        """
+        if policy not in OVERLAP_POLICIES:
+            raise ValueError(f"未知的重叠触发策略: {policy}，可选 {OVERLAP_POLICIES}")
+        self.policy = policy
+        self.lock_path = lock_path
+        self.report_dir = report_dir
+        self.wait_interval = wait_interval
+        self.profile = profile
+        self._local_lock = threading.Lock()
+        self._coalesced = False  # 运行期间是否有被合并的触发
+
+    # ======================= 文件锁 =====================
+
+    def _read_holder(self):
+        try:
+            with open(self.lock_path, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except Exception:
+            return ""
+
+    def _acquire_file_lock(self, run_id, wait):
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT)
+        logged = False
+        while not _try_lock(fd):
+            if not wait:
+                os.close(fd)
+                return None
+            if not logged:
+                logger.info(f"[{run_id}] 其它实例正在运行（{self._read_holder()}），等待其结束")
+                logged = True
+            time.sleep(self.wait_interval)
+        # 记录持有者，便于排查
+        holder = json.dumps({"pid": os.getpid(), "host": socket.gethostname(), "run_id": run_id,
+                             "started": datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, ensure_ascii=False)
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, holder.encode('utf-8'))
+        return fd
+
+    def _release_file_lock(self, fd):
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+    # ======================= 运行 =====================
+
+    def run(self, func, *args, trigger="manual", **kwargs):
+        """
+        在锁保护下执行 func(*args, **kwargs)
+
+        :param trigger: 触发来源，写入运行报告（manual / schedule / watch 等）
+        :return: (是否执行, func 的返回值)
+        """
+        if not self._local_lock.acquire(blocking=False):
+            # 同一进程内已有任务在运行（如监听线程与定时触发重叠）
+            if self.policy == "coalesce":
+                self._coalesced = True
+                RUNS.labels(trigger, "coalesced").inc()
+                logger.info(f"已有任务在运行，本次触发（{trigger}）合并到其结束后执行")
+            else:
+                RUNS.labels(trigger, "skipped").inc()
+                logger.warning(f"已有任务在运行，跳过本次触发（{trigger}）")
+            return False, None
+        try:
+            ran, result = self._run_locked(func, args, kwargs, trigger)
+            # 运行期间被合并的触发，结束后补执行一次
+            while ran and self._coalesced:
+                self._coalesced = False
+                ran, result = self._run_locked(func, args, kwargs, f"{trigger}(coalesced)")
+            return ran, result
+        finally:
+            self._local_lock.release()
+
+    def _run_locked(self, func, args, kwargs, trigger):
+        run_id = new_run_id()
+        fd = self._acquire_file_lock(run_id, wait=self.policy == "coalesce")
+        if fd is None:
+            logger.warning(f"[{run_id}] 其它实例正在运行（{self._read_holder()}），跳过本次触发（{trigger}）")
+            RUNS.labels(trigger, "skipped").inc()
+            self._write_report(run_id, trigger, "skipped", None, None)
+            return False, None
+
+        started = datetime.now()
+        status, error, result, profile = "success", None, None, None
+        logger.info(f"[{run_id}] 任务开始（{trigger}）")
+        try:
+            with logger.contextualize(run_id=run_id), profile_run(run_id, self.profile) as session:
+                profile = session.prefix if session is not None else None
+                result = func(*args, **kwargs)
+        except Exception as e:
+            status, error = "failed", str(e)
+            logger.error(f"[{run_id}] 任务执行出错: {e}")
+        finally:
+            self._release_file_lock(fd)
+        finished = datetime.now()
+        logger.info(f"[{run_id}] 任务结束（{status}），耗时 {(finished - started).total_seconds():.1f} 秒")
+        RUNS.labels(trigger, status).inc()
+        self._write_report(run_id, trigger, status, started, finished, error, profile)
+        return True, result
+
+    def _write_report(self, run_id, trigger, status, started, finished, error=None, profile=None):
+        if not self.report_dir:
+            return
+        report = {
+            "run_id": run_id,
+            "trigger": trigger,
+            "policy": self.policy,
+            "status": status,
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "started": started.strftime('%Y-%m-%d %H:%M:%S') if started else None,
+            "finished": finished.strftime('%Y-%m-%d %H:%M:%S') if finished else None,
+            "duration_seconds": round((finished - started).total_seconds(), 3) if started and finished else None,
+            "error": error,
+        }
+        if status == "skipped":
+            report["holder"] = self._read_holder()
+        if profile:
+            report["profile"] = profile
+        try:
+            os.makedirs(self.report_dir, exist_ok=True)
+            with open(os.path.join(self.report_dir, f"{run_id}.json"), 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning(f"[{run_id}] 运行报告写入失败: {e}")
@@ -0,0 +1,119 @@
+"""
+批量识别的调试叠加图
+
+只为识别失败（或按比例抽样的成功）的截图渲染“包围盒 + 文字 + 序号”叠加图，用于排查蒙版问题：
+- 渲染与保存在后台线程中进行，主流程只提交任务，不等待
+- 待处理任务数有上限，超出时直接丢弃，不拖慢识别
+- 字体按 (路径, 字号) 缓存（见 core/ppocr_visualize.py），路径可通过 OCR_FONT_PATH 指定
+- 输出缩略图到 logs/debug_overlay/<日期>/
+- cv2 / PIL 在第一次渲染时才导入
+
+配置见 config.ini [debug_overlay] 段（经 core/settings.py 读取，随配置热加载生效）。
+"""
+
+import os
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from core.logger import logger
+from core.settings import get_config
+
+UNSAFE_FILENAME_PATTERN = re.compile(r'[\\/:*?"<>|#\s]+')
+
+
+def to_pil_image(image):
+    """OpenCV 图像（BGR / BGRA / 灰度）转为 PIL Image"""
+    import cv2
+    from PIL import Image
+    if image.ndim == 2:
+        return Image.fromarray(image)
+    if image.shape[2] == 4:
+        return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA))
+    return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+class DebugOverlayWriter:
+    """在后台线程中渲染并保存调试叠加图"""
+
+    def __init__(self, settings=None):
+        """
+        :param settings: 叠加图设置（OverlaySettings），为 None 时使用 config.ini [debug_overlay] 的当前值
+        """
+        self._settings = settings
+        self._slots = None
+        self._executor = None  # 首次提交时创建
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self):
+        return self._settings or get_config().debug_overlay
+
+    @property
+    def enabled(self):
+        return self.settings.mode in ('failed', 'sample')
+
+    def should_render(self, failed):
+        """失败的截图总是渲染；成功的截图仅在 sample 模式下按比例抽样"""
+        settings = self.settings
+        if settings.mode not in ('failed', 'sample'):
+            return False
+        if failed:
+            return True
+        return settings.mode == 'sample' and random.random() < settings.sample_rate
+
+    def submit(self, name, image, text_lines, failed, subdir=''):
+        """
+        提交一张叠加图（不等待渲染完成）
+
+        :param name: 输出文件名（不含扩展名）
+        :param image: OCR 输入图像（OpenCV 格式）
+        :param text_lines: OCR 文本块列表（含 box / text），按阅读顺序排列
+        :param failed: 是否为识别失败的截图
+        :param subdir: 日期目录下的子目录，如 应用/标签
+        :return: 是否已提交
+        """
+        if not self.should_render(failed):
+            return False
+        settings = self.settings
+        with self._lock:
+            if self._executor is None:
+                # 每轮 flush 后重新创建，待处理上限随配置更新
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-overlay")
+                self._slots = threading.BoundedSemaphore(settings.max_pending)
+            executor, slots = self._executor, self._slots
+        if not slots.acquire(blocking=False):
+            logger.debug(f"调试叠加图队列已满，跳过: {name}")
+            return False
+        status = "failed" if failed else "ok"
+        file_name = f"{status}_{UNSAFE_FILENAME_PATTERN.sub('_', name)}.jpg"
+        path = os.path.join(settings.output_dir, datetime.now().strftime('%Y%m%d'), subdir, file_name)
+        # 复制文本块，避免后续处理修改列表
+        lines = [{"box": line["box"], "text": str(line["text"])} for line in text_lines]
+        future = executor.submit(self._render, image, lines, path, settings.max_size)
+        future.add_done_callback(lambda _: slots.release())
+        return True
+
+    def _render(self, image, text_lines, path, max_size):
+        from core.ppocr_visualize import visualize
+        try:
+            img = visualize(text_lines, to_pil_image(image)).get(isBox=True, isText=True, isOrder=True)
+            img = img.convert("RGB")
+            img.thumbnail((max_size, max_size))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            img.save(path, quality=85)
+            logger.debug(f"调试叠加图已保存: {path}")
+        except Exception as e:
+            logger.warning(f"调试叠加图保存失败: {path}, 错误: {e}")
+
+    def flush(self):
+        """等待已提交的叠加图全部写完（每轮识别结束时调用）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+overlay_writer = DebugOverlayWriter()
@@ -1,9 +1,163 @@
+"""
+日志配置
+
+- 控制台与日志文件均为后台写入（enqueue=True）：调用方只负责格式化后入队，文件 I/O 在 loguru 的后台线程完成
+- 日志文件默认每行一条 JSON（LOG_FORMAT=text 时为文本），包含运行ID（run_id）与任务（job，如截图路径）
+- 按类别抽样：sampled("mask_attempt") 等标记的 INFO 及以下日志按 LOG_SAMPLE_RATES 抽样输出，
+  同一任务同一类别只抽样一次；同一任务（见 job_context）出现 WARNING 及以上日志时，
+  先补记该任务被抽样丢弃的日志，失败的截图保留完整过程
+
+环境变量：
+    LOG_LEVEL          控制台日志级别，默认 INFO
+    LOG_FORMAT         日志文件格式 json（默认）/ text
+    LOG_SAMPLE_RATE    抽样类别的默认输出比例，默认 0.1；设为 1 关闭抽样
+    LOG_SAMPLE_RATES   按类别覆盖，如 mask_attempt=0.05,user_info=1
+"""
+
+import json
 import os
+import random
+import sys
+import threading
+import traceback
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
 from loguru import logger
 
+load_dotenv()
+
 # 确保logs目录存在
 log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
 os.makedirs(log_dir, exist_ok=True)
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOG_SAMPLE_RATES = {
+    key.strip(): float(value)
+    for key, value in (item.split("=", 1) for item in os.getenv("LOG_SAMPLE_RATES", "").split(",") if "=" in item)
+}
+# 每个任务最多暂存的被抽样丢弃的日志条数
+SAMPLE_BUFFER_SIZE = 200
+WARNING_LEVEL_NO = 30
+
+# 不写入 JSON 的内部字段
+_INTERNAL_EXTRA = ("sample_drop", "replayed", "serialized")
+_local = threading.local()
+
+
+def _sample_rate(category):
+    return LOG_SAMPLE_RATES.get(category, LOG_SAMPLE_RATE)
+
+
+def _replay(records):
+    """补记被抽样丢弃的日志（保留原始时间与调用位置）"""
+    _local.replaying = True
+    try:
+        for record in records:
+            def restore(new_record, record=record):
+                new_record.update({key: record[key] for key in ("time", "name", "module", "function", "line", "file",
+                                                                 "thread", "process", "message")})
+                new_record["extra"] = {**record["extra"], "sample_drop": False, "replayed": True}
+            logger.patch(restore).log(record["level"].name, record["message"])
+    finally:
+        _local.replaying = False
+
+
+def _sampling_patcher(record):
+    """
+    每条日志只决定一次是否抽样丢弃（所有输出共用），丢弃的日志暂存到当前任务的缓冲区
+    """
+    if getattr(_local, "replaying", False):
+        return
+    buffer = getattr(_local, "buffer", None)
+    if record["level"].no >= WARNING_LEVEL_NO:
+        if buffer:
+            records = list(buffer)
+            buffer.clear()
+            _replay(records)
+        return
+    category = record["extra"].get("sample")
+    if category is None:
+        return
+    rate = _sample_rate(category)
+    if rate >= 1:
+        return
+    decisions = getattr(_local, "decisions", None)
+    if decisions is None:
+        keep = random.random() < rate
+    else:
+        # 同一任务同一类别只抽样一次：被选中的截图保留该类别的全部日志
+        keep = decisions.setdefault(category, random.random() < rate)
+    if keep:
+        return
+    record["extra"]["sample_drop"] = True
+    if buffer is not None and len(buffer) < SAMPLE_BUFFER_SIZE:
+        buffer.append({**record, "extra": dict(record["extra"])})
+
+
+def _keep(record):
+    return not record["extra"].get("sample_drop")
+
+
+def _context_suffix(record):
+    extra = record["extra"]
+    parts = [f"{key}={extra[key]}" for key in ("run_id", "job") if key in extra]
+    return f"[{' '.join(parts)}] " if parts else ""
+
+
+def _text_format(record):
+    record["extra"]["serialized"] = _context_suffix(record)
+    return ("<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+            "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+            "{extra[serialized]}<level>{message}</level>\n{exception}")
+
+
+def _json_format(record):
+    entry = {
+        "time": record["time"].isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "message": record["message"],
+        "location": f"{record['name']}:{record['function']}:{record['line']}",
+        "thread": record["thread"].name,
+    }
+    entry.update({key: value for key, value in record["extra"].items() if key not in _INTERNAL_EXTRA})
+    if record["extra"].get("replayed"):
+        entry["replayed"] = True
+    if record["exception"] is not None:
+        exc_type, exc_value, exc_tb = record["exception"]
+        entry["exception"] = "".join(traceback.format_exception(exc_type, exc_value, exc_tb))
+    record["extra"]["serialized"] = json.dumps(entry, ensure_ascii=False, default=str)
+    return "{extra[serialized]}\n"
+
+
+@contextmanager
+def job_context(job_id):
+    """
+    任务日志上下文：日志带上 job 字段；任务内出现 WARNING 及以上日志时补记被抽样丢弃的日志
+
+    用法：
+        with job_context(file_path):
+            ...
+    """
+    previous = getattr(_local, "buffer", None), getattr(_local, "decisions", None)
+    _local.buffer, _local.decisions = [], {}
+    try:
+        with logger.contextualize(job=job_id):
+            yield
+    finally:
+        _local.buffer, _local.decisions = previous
+
+
+def sampled(category):
+    """按类别抽样输出的 logger，如 sampled("mask_attempt").info(...)"""
+    return logger.bind(sample=category)
+
+
+logger.configure(patcher=_sampling_patcher)
+logger.remove()
+logger.add(sys.stderr, level=LOG_LEVEL, format=_text_format, filter=_keep, enqueue=True)
 # 配置日志文件
-logger.add(os.path.join(log_dir, "run_{time}.log"), rotation="100 MB", encoding="utf-8", retention="3 days")
\ No newline at end of file
+logger.add(os.path.join(log_dir, "run_{time}.log"), rotation="100 MB", encoding="utf-8", retention="3 days",
+           format=_json_format if LOG_FORMAT == "json" else _text_format, filter=_keep, enqueue=True, level="DEBUG")
@@ -0,0 +1,169 @@
+"""
+蒙版区域学习与识别结果打分
+
+- 蒙版缓存：每个蒙版文件（按路径 + 修改时间）只读取一次，同时从 Alpha 通道的连通区域
+  学习字段区域（slot），按阅读顺序与 config.ini [tags] 中的字段一一对应
+- 区域对齐：按文本行包围盒中心点把 OCR 结果分配到字段区域，每个区域只取一行，多出的噪声行不再导致整次识别作废
+- 打分：每个字段取所含文本行的最低置信度，结合数值校验选出最佳候选，
+  高置信的完整结果直接接受，不再继续尝试其余蒙版
+
+阈值见 config.ini [scoring] 段（accept_score、max_missing_fields，经 core/settings.py 读取，随配置热加载生效）。
+"""
+
+import os
+from functools import lru_cache
+
+from core.normalize import validate_fields
+from core.ocr import sort_by_reading_order
+from core.settings import get_config
+
+# 面积小于最大区域该比例的连通区域视为噪点
+MIN_SLOT_AREA_RATIO = 0.05
+
+
+class Mask:
+    """已加载的蒙版：Alpha 通道与字段区域"""
+
+    def __init__(self, alpha, slots):
+        self.alpha = alpha  # (H, W) uint8
+        self.slots = slots  # [(x0, y0, x1, y1), ...]，阅读顺序
+
+    @property
+    def shape(self):
+        return self.alpha.shape
+
+
+def learn_slots(alpha):
+    """
+    从 Alpha 通道的连通区域学习字段区域，按阅读顺序排列
+    """
+    import cv2
+    import numpy as np
+    count, _, stats, _ = cv2.connectedComponentsWithStats((alpha > 0).astype(np.uint8), connectivity=8)
+    stats = stats[1:]  # 去掉背景
+    if not len(stats):
+        return []
+    min_area = stats[:, cv2.CC_STAT_AREA].max() * MIN_SLOT_AREA_RATIO
+    slots = [(int(x), int(y), int(x + w), int(y + h)) for x, y, w, h, area in stats.tolist() if area >= min_area]
+    positions = [((x0 + x1) / 2, (y0 + y1) / 2, y1 - y0) for x0, y0, x1, y1 in slots]
+    return sort_by_reading_order(slots, positions, default_threshold=20)
+
+
+@lru_cache(maxsize=64)
+def _load_mask(mask_path, mtime):
+    import numpy as np
+    from PIL import Image
+    pil_image = Image.open(mask_path)
+    if 'A' not in pil_image.getbands():
+        return None
+    alpha = np.array(pil_image.getchannel('A'))
+    return Mask(alpha, learn_slots(alpha))
+
+
+def load_mask(mask_path):
+    """
+    读取蒙版（按路径和修改时间缓存），蒙版不含 Alpha 通道或读取失败时返回 None
+    """
+    try:
+        return _load_mask(mask_path, os.path.getmtime(mask_path))
+    except Exception:
+        return None
+
+
+def _box_center(box):
+    return sum(p[0] for p in box) / len(box), sum(p[1] for p in box) / len(box)
+
+
+def align_to_slots(lines, slots):
+    """
+    将文本行分配到字段区域：每个区域只取一行（离区域中心最近、其次置信度最高），
+    同一区域内的其余文本行视为噪声丢弃，不拼接到字段值中
+
+    :param lines: [(文本, 置信度, box), ...]，已按阅读顺序排列
+    :param slots: 字段区域列表
+    :return: (各区域文本列表, 各区域置信度列表)，空区域文本为 ''、置信度为 0
+    """
+    assigned = [None] * len(slots)  # 各区域选中的 (离中心的距离, -置信度, 文本, 置信度)
+    for text, score, box in lines:
+        cx, cy = _box_center(box)
+        best_index, best_distance = None, None
+        for i, (x0, y0, x1, y1) in enumerate(slots):
+            # 中心点到区域的距离，位于区域内为 0
+            dx = max(x0 - cx, 0, cx - x1)
+            dy = max(y0 - cy, 0, cy - y1)
+            distance = (dx * dx + dy * dy) ** 0.5
+            if distance <= (y1 - y0) / 2 and (best_distance is None or distance < best_distance):
+                best_index, best_distance = i, distance
+        if best_index is None:
+            continue
+        x0, y0, x1, y1 = slots[best_index]
+        item = (abs(cx - (x0 + x1) / 2) + abs(cy - (y0 + y1) / 2), -score, text, score)
+        if assigned[best_index] is None or item[:2] < assigned[best_index][:2]:
+            assigned[best_index] = item
+    texts = [item[2] if item else '' for item in assigned]
+    confidences = [item[3] if item else 0.0 for item in assigned]
+    return texts, confidences
+
+
+def make_candidate(texts, confidences, field_names, source, count_match=True):
+    """
+    构建候选结果
+
+    :param source: sequence（按行顺序一一对应）或 slots（按蒙版区域对齐）
+    :param count_match: 识别行数是否与字段数一致
+    """
+    present = [c for t, c in zip(texts, confidences) if t]
+    return {
+        "texts": texts,
+        "confidences": confidences,
+        "source": source,
+        "count_match": count_match,
+        "missing": sum(1 for t in texts if not t),
+        "invalid": validate_fields(texts, field_names),
+        "score": sum(present) / len(present) if present else 0.0,
+    }
+
+
+def evaluate_lines(lines, slots, field_names):
+    """
+    对一次 OCR 结果生成候选：行数与字段数一致时按顺序对应；
+    蒙版区域数与字段数一致时按区域对齐。两者都有时优先取完整的区域对齐结果。
+
+    :param lines: [(文本, 置信度, box), ...]，已清洗、去除空行并按阅读顺序排列
+    :return: 候选结果，无法与字段对应时返回 None
+    """
+    sequence = None
+    if len(lines) == len(field_names):
+        sequence = make_candidate([t for t, _, _ in lines], [s for _, s, _ in lines], field_names, "sequence")
+    aligned = None
+    if slots and len(slots) == len(field_names):
+        texts, confidences = align_to_slots(lines, slots)
+        aligned = make_candidate(texts, confidences, field_names, "slots", len(lines) == len(field_names))
+    if aligned and not aligned["missing"] and not aligned["invalid"]:
+        return aligned
+    return sequence or aligned
+
+
+def is_acceptable(candidate, accept_score=None):
+    """
+    候选结果可直接接受：字段完整且数值校验通过；
+    行数与字段数不一致（靠区域对齐才补全）时，还要求每个字段的置信度不低于 accept_score
+    （默认取 [scoring] accept_score）。只有一个字段时区域对齐无法区分数值与噪声行，要求行数一致
+    """
+    if candidate["missing"] or candidate["invalid"]:
+        return False
+    if len(candidate["texts"]) == 1:
+        return candidate["count_match"]
+    if accept_score is None:
+        accept_score = get_config().scoring.accept_score
+    return candidate["count_match"] or min(candidate["confidences"]) >= accept_score
+
+
+def candidate_rank(candidate):
+    """候选排序键（越小越好）：缺失字段少 > 校验失败少 > 平均置信度高"""
+    return candidate["missing"], len(candidate["invalid"]), -candidate["score"]
+
+
+def field_confidence(candidate, field_names):
+    """字段置信度 {字段名: 置信度}"""
+    return {field: round(float(c), 4) for field, c in zip(field_names, candidate["confidences"])}
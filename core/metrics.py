@@ -0,0 +1,300 @@
+"""
+进程内指标（Prometheus 文本格式）
+
+不依赖 prometheus_client，提供 Counter / Gauge / Histogram 三种指标，支持标签：
+- 服务模式（--mode serve）通过 GET /metrics 暴露
+- 其它模式设置环境变量 OCR_METRICS_TEXTFILE 后，定期（及每次运行结束时）写入文本文件，
+  供 node_exporter 的 textfile collector 采集，如
+  OCR_METRICS_TEXTFILE=/var/lib/node_exporter/textfile_collector/social_ocr.prom
+
+用法：
+    IMAGES_PROCESSED.labels("xhs", "note_data_overview_top").inc()
+    with OCR_CALL_SECONDS.time():
+        ...
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from core.logger import logger
+
+load_dotenv()
+
+OCR_METRICS_TEXTFILE = os.getenv("OCR_METRICS_TEXTFILE", "")
+# 文本文件最短写入间隔（秒）
+OCR_METRICS_INTERVAL = float(os.getenv("OCR_METRICS_INTERVAL", "15"))
+
+# 默认耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """按标签值取子指标（标签值顺序与 labelnames 一致）"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际传入 {values}")
+        key = tuple(str(value) for value in values)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _default(self):
+        # 无标签指标直接在自身上调用 inc / set / observe
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """输出时调用 function() 取值（如队列长度）"""
+        self.function = function
+
+    def render(self, name, labelnames, values):
+        value = self.value
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return []
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+    metric_type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def render(self, name, labelnames, values):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        for bound, c in zip(self.buckets, counts):
+            le = 'le="%s"' % _format_value(bound)
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {c}")
+        le = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {count}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {count}")
+        return lines
+
+
+class Histogram(_Metric):
+    """分桶统计（耗时、次数分布）"""
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标重复注册: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# ======================= 指标定义 =====================
+
+IMAGES_DISCOVERED = counter("ocr_images_discovered_total", "目录扫描发现的截图数", ("app", "tag"))
+IMAGES_PROCESSED = counter("ocr_images_processed_total", "识别成功的截图数", ("app", "tag"))
+IMAGES_FAILED = counter("ocr_images_failed_total", "所有蒙版均未识别成功的截图数", ("app", "tag"))
+MASK_ATTEMPTS = histogram("ocr_mask_attempts", "每张截图尝试的蒙版数", ("app",), buckets=(1, 2, 3, 4, 5, 8, 13))
+OCR_CALL_SECONDS = histogram("ocr_engine_call_seconds", "单次 OCR 引擎调用耗时（秒）")
+ENGINE_STARTS = counter("ocr_engine_starts_total", "OCR 引擎启动次数（含空闲回收后的重启）")
+SQLITE_COMMIT_SECONDS = histogram("ocr_sqlite_commit_seconds", "本地 SQLite 提交耗时（秒）", ("op",))
+MYSQL_ROWS_UPSERTED = counter("ocr_mysql_rows_upserted_total", "写入远程 MySQL 的行数", ("table",))
+QUEUE_DEPTH = gauge("ocr_queue_depth", "待处理队列长度", ("queue",))
+RUNS = counter("ocr_runs_total", "任务运行次数", ("trigger", "status"))
+
+
+def write_textfile(path=None):
+    """
+    将全部指标写入文本文件（先写临时文件再替换，node_exporter 不会读到写了一半的文件）
+    """
+    path = path or OCR_METRICS_TEXTFILE
+    if not path:
+        return False
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(REGISTRY.render())
+    os.replace(temp_path, path)
+    return True
+
+
+_last_write = 0.0
+
+
+def maybe_write_textfile(force=False):
+    """
+    设置了 OCR_METRICS_TEXTFILE 时，距上次写入超过 OCR_METRICS_INTERVAL 秒（或 force=True）则写入
+    """
+    global _last_write
+    if not OCR_METRICS_TEXTFILE:
+        return False
+    now = time.time()
+    if not force and now - _last_write < OCR_METRICS_INTERVAL:
+        return False
+    _last_write = now
+    try:
+        return write_textfile()
+    except Exception as e:
+        logger.warning(f"指标文件写入失败: {OCR_METRICS_TEXTFILE}, 错误: {e}")
+        return False
@@ -0,0 +1,90 @@
+"""
+OCR 文本行清洗与数值字段校验
+
+清洗规则按 (应用, 标签) 从 config.ini 的 [normalize] 段构建一次并缓存：
+- 去除中文（strip_cjk_apps 中的应用，keep_cjk_tags 前缀的标签除外）
+- 删除“秒”、空格，以及 {app}_remove_chars 中配置的字符；字母 o 修正为数字 0
+- 删除 <b>、</b> 标签
+
+数值校验按 [field_types] 段的字段类型（count / percent / duration）检查识别结果，
+明显不是数值的结果可以在保存前发现，换用其它蒙版重试。
+
+配置取自 core/settings.py 编译好的 AppConfig，config.ini 重新加载后清洗器随之重建。
+"""
+
+import re
+from functools import lru_cache
+
+from core.settings import get_config
+
+CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+
+# 各字段类型的合法格式（清洗后的文本）
+FIELD_TYPE_PATTERNS = {
+    # 计数：1234、1,234、1.5万、1.2w、3k
+    "count": re.compile(r'^\d{1,3}(,\d{3})+(\.\d+)?[万wWkK]?$|^\d+(\.\d+)?[万wWkK]?$'),
+    # 百分比：12.5%
+    "percent": re.compile(r'^\d+(\.\d+)?%$'),
+    # 时长：12、12.5（“秒”已清洗），或 1:05、01:02:03
+    "duration": re.compile(r'^\d+(\.\d+)?$|^\d+(:\d{1,2}){1,2}$'),
+}
+
+
+class TextNormalizer:
+    """单个 (应用, 标签) 的文本清洗器"""
+
+    def __init__(self, app_name, tag, settings):
+        """
+        :param settings: [normalize] 段设置（NormalizeSettings）
+        """
+        keep_cjk = any(tag.startswith(prefix) for prefix in settings.keep_cjk_tags)
+        self.strip_cjk = app_name in settings.strip_cjk_apps and not keep_cjk
+        remove_chars = '秒 ' + settings.app_remove_chars(app_name)
+        table = {ord(ch): None for ch in remove_chars}
+        table[ord('o')] = '0'
+        self.table = table
+
+    def normalize(self, text):
+        """清洗一行 OCR 文本，结果为空字符串时应丢弃该行"""
+        if self.strip_cjk:
+            text = CJK_PATTERN.sub('', text)
+        text = text.translate(self.table)
+        if '<' in text:
+            text = text.replace('<b>', '').replace('</b>', '')
+        return text
+
+
+@lru_cache(maxsize=None)
+def _build_normalizer(settings, app_name, tag):
+    return TextNormalizer(app_name, tag, settings)
+
+
+def get_normalizer(app_name, tag):
+    """
+    获取 (应用, 标签) 对应的清洗器（按 [normalize] 设置与参数缓存）
+    """
+    return _build_normalizer(get_config().normalize, app_name, tag)
+
+
+def get_field_type(field_name):
+    """
+    字段类型：count / percent / duration，未配置的字段返回 None（不校验）
+    """
+    return get_config().field_types.get(field_name)
+
+
+def validate_fields(values, field_names):
+    """
+    按字段类型校验识别结果
+
+    :param values: 清洗后的识别结果列表
+    :param field_names: 与 values 一一对应的字段名（中文）
+    :return: 不合法的 [(字段名, 值), ...]，全部合法时返回空列表
+    """
+    field_types = get_config().field_types
+    invalid = []
+    for value, field_name in zip(values, field_names):
+        pattern = FIELD_TYPE_PATTERNS.get(field_types.get(field_name))
+        if pattern and not pattern.match(value):
+            invalid.append((field_name, value))
+    return invalid
@@ -1,3 +1,7 @@
+from statistics import median
+
+from core.logger import logger
+
 # from surya.common.surya.schema import TaskNames
 # from surya.detection import DetectionPredictor
 # from surya.foundation import FoundationPredictor
@@ -55,6 +59,46 @@
 
 
 
+# 同一行的判定阈值：相邻文本行中心点的垂直距离小于 行高中位数 * 该比例
+ROW_HEIGHT_RATIO = 0.5
+
+
+def sort_by_reading_order(items, positions, default_threshold):
+    """
+    按阅读顺序排序：从上到下分行，行内从左到右（Paddle、Surya 结果共用）
+
+    先按 (y, x) 排序一次，再按与上一行文本的垂直距离分行，
+    分行阈值取行高中位数的一半，截图放大或高分辨率时阈值随之变化。
+
+    Args:
+        items: 文本行列表
+        positions: 与 items 一一对应的 (x, y, 行高)
+        default_threshold: 行高不可用（均为 0）时使用的固定像素阈值
+
+    Returns:
+        排序后的文本行列表
+    """
+    if not items:
+        return []
+    threshold = median(p[2] for p in positions) * ROW_HEIGHT_RATIO
+    if threshold <= 0:
+        threshold = default_threshold
+
+    order = sorted(range(len(items)), key=lambda i: (positions[i][1], positions[i][0]))
+    # 分行：与上一行文本的 y 距离超过阈值时开始新的一行
+    row_keys = [None] * len(items)
+    row_index = 0
+    last_y = positions[order[0]][1]
+    for i in order:
+        y = positions[i][1]
+        if y - last_y >= threshold:
+            row_index += 1
+        row_keys[i] = (row_index, positions[i][0])
+        last_y = y
+    order.sort(key=row_keys.__getitem__)
+    return [items[i] for i in order]
+
+
 def sort_text_lines_by_paddle_position(text_lines):
     """
     对文本行按位置进行排序：从上到下，从左到右
@@ -65,47 +109,59 @@ def sort_text_lines_by_paddle_position(text_lines):
     Returns:
         排序后的文本行列表
     """
+    positions = []
+    for line in text_lines:
+        xs = [point[0] for point in line['box']]
+        ys = [point[1] for point in line['box']]
+        # 包围盒中心点作为排序依据，上下边缘之差作为行高
+        positions.append((sum(xs) / 4, sum(ys) / 4, max(ys) - min(ys)))
+    return sort_by_reading_order(text_lines, positions, default_threshold=20)
 
-    # 按照y坐标（顶部）排序，如果y坐标相近则按x坐标排序
-    def get_line_position(line):
-        box = line['box']
-        # 计算包围盒的中心点y坐标和x坐标作为排序依据
-        y_center = sum(point[1] for point in box) / 4
-        x_center = sum(point[0] for point in box) / 4
-        return (y_center, x_center)
 
-    # 先大致按y坐标排序
-    sorted_lines = sorted(text_lines, key=get_line_position)
+# 排版解析器缓存：同一 key 在进程内只构建一次（GetParser 每次调用都会新建对象）
+# 解析器对象内部缓存了中间结果，不可在多线程间共享
+_layout_parsers = {}
 
-    # 更精细地处理同一行的内容（y坐标相近的视为一行）
-    # 这里我们假设同一行的高度差不超过平均高度的一半
-    result = []
-    current_line = []
-    last_y = None
+# 默认排序方式：按 PaddleOCR 文本块中心点分行排序
+DEFAULT_PARSER_KEY = "paddle_position"
 
-    for line in sorted_lines:
-        box = line['box']
-        y_center = sum(point[1] for point in box) / 4
-        x_center = sum(point[0] for point in box) / 4
 
-        if last_y is None or abs(y_center - last_y) < 20:  # 同一行的阈值设为20像素
-            current_line.append((x_center, line))
-        else:
-            # 将前一行按x坐标排序后加入结果
-            current_line.sort(key=lambda x: x[0])
-            result.extend([item[1] for item in current_line])
+def get_layout_parser(parser_key):
+    """
+    获取 tbpu 排版解析器实例（按 key 缓存复用）
 
-            # 开始新的一行
-            current_line = [(x_center, line)]
+    Args:
+        parser_key: tbpu.Parser 中的 key，如 multi_para、single_line
 
-        last_y = y_center
+    Returns:
+        解析器对象，key 不存在时返回 None
+    """
+    if parser_key not in _layout_parsers:
+        from tbpu import GetParser
+        _layout_parsers[parser_key] = GetParser(parser_key)
+    return _layout_parsers[parser_key]
+
+
+def sort_text_lines(text_lines, parser_key=None):
+    """
+    按指定的排版解析方式对 PaddleOCR 文本行排序
 
-    # 处理最后一行
-    if current_line:
-        current_line.sort(key=lambda x: x[0])
-        result.extend([item[1] for item in current_line])
+    Args:
+        text_lines: OCR识别结果中的文本行列表
+        parser_key: paddle_position（默认）或 tbpu 解析器 key
+
+    Returns:
+        排序后的文本行列表
+    """
+    if not parser_key or parser_key == DEFAULT_PARSER_KEY:
+        return sort_text_lines_by_paddle_position(text_lines)
+    parser = get_layout_parser(parser_key)
+    if parser is None:
+        logger.warning(f"未知的排版解析器: {parser_key}，使用默认排序")
+        return sort_text_lines_by_paddle_position(text_lines)
+    # 解析器会修改文本块字典，传入浅拷贝，避免影响原始OCR结果
+    return parser.run([dict(line) for line in text_lines])
 
-    return result
 
 def sort_text_lines_by_surya_position(text_lines):
     """
@@ -117,31 +173,9 @@ def sort_text_lines_by_surya_position(text_lines):
     Returns:
         排序后的文本行列表
     """
-    # 先按 y 坐标排序（从上到下）
-    sorted_lines = sorted(text_lines, key=lambda line: line.bbox[1])
-
-    # 在同一行内按 x 坐标排序（从左到右）
-    result = []
-    current_y = None
-    current_group = []
-
-    for line in sorted_lines:
-        if current_y is None or abs(line.bbox[1] - current_y) > 5:  # 设置合理的行间距阈值
-            if current_group:
-                # 对当前组内的行按 x 坐标排序
-                current_group.sort(key=lambda l: l.bbox[0])
-                result.extend(current_group)
-            current_group = [line]
-            current_y = line.bbox[1]
-        else:
-            current_group.append(line)
-
-    # 处理最后一组
-    if current_group:
-        current_group.sort(key=lambda l: l.bbox[0])
-        result.extend(current_group)
-
-    return result
+    positions = [(line.bbox[0], (line.bbox[1] + line.bbox[3]) / 2, line.bbox[3] - line.bbox[1])
+                 for line in text_lines]
+    return sort_by_reading_order(text_lines, positions, default_threshold=5)
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,90 @@
+"""
+OCR 引擎的延迟启动与空闲回收
+
+PaddleOCR-json 子进程不再在导入 core.run 时启动，而是在第一张图片需要识别时才启动；
+定时任务 / 监听模式下空闲超过 OCR_ENGINE_IDLE_SECONDS 秒后自动退出，下次识别时重新启动。
+没有新截图的运行、只做同步的运行都不再为加载模型付出时间。
+"""
+
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from core.logger import logger
+from core.metrics import ENGINE_STARTS
+
+load_dotenv()
+
+# OCR引擎，目前有两个选择：PaddleOCR和surya
+ocr_engine = os.getenv("OCR_ENGINE", "surya")
+# 引擎空闲多少秒后退出
+OCR_ENGINE_IDLE_SECONDS = int(os.getenv("OCR_ENGINE_IDLE_SECONDS", "600"))
+
+_engine = None
+_last_used = 0.0
+_lock = threading.Lock()
+
+
+def _start_engine():
+    from core.ppocr_api import GetOcrApi
+
+    # OCR 引擎路径
+    ocr_engine_path = os.getenv("OCR_ENGINE_PATH")
+    if not ocr_engine_path:
+        logger.error("OCR_ENGINE_PATH 环境变量未设置")
+    elif not os.path.exists(ocr_engine_path):
+        logger.error(f"OCR引擎路径不存在: {ocr_engine_path}")
+
+    start_time = time.time()
+    engine = GetOcrApi(ocr_engine_path)
+    cost = time.time() - start_time
+    ENGINE_STARTS.inc()
+    if engine.getRunningMode() == "local":
+        logger.info(f"初始化OCR成功，进程号为{engine.ret.pid}，耗时 {cost:.1f} 秒")
+    elif engine.getRunningMode() == "remote":
+        logger.info(f"连接远程OCR引擎成功，ip：{engine.ip}，port：{engine.port}")
+    return engine
+
+
+def get_ocr_engine():
+    """
+    获取 OCR 引擎，首次调用（或空闲回收后）时启动
+    """
+    global _engine, _last_used
+    with _lock:
+        if _engine is None:
+            _engine = _start_engine()
+        _last_used = time.time()
+        return _engine
+
+
+def shutdown_ocr_engine():
+    """
+    退出 OCR 引擎（未启动时不做任何事）
+    """
+    global _engine
+    with _lock:
+        if _engine is None:
+            return
+        try:
+            _engine.exit()
+            logger.info("OCR引擎已退出")
+        except Exception as e:
+            logger.warning(f"OCR引擎退出失败: {e}")
+        _engine = None
+
+
+def shutdown_idle_ocr_engine(idle_seconds=None):
+    """
+    引擎空闲超过 idle_seconds（默认 OCR_ENGINE_IDLE_SECONDS）秒时退出
+
+    :return: 是否退出了引擎
+    """
+    idle_seconds = OCR_ENGINE_IDLE_SECONDS if idle_seconds is None else idle_seconds
+    if _engine is None or time.time() - _last_used < idle_seconds:
+        return False
+    logger.info(f"OCR引擎空闲超过 {idle_seconds} 秒，退出引擎")
+    shutdown_ocr_engine()
+    return True
@@ -0,0 +1,298 @@
+"""
+本地 HTTP OCR 服务（--mode serve）
+
+采集设备上传截图后立即得到识别结果，不必等待定时任务扫描目录。基于 asyncio（标准库），不引入额外依赖：
+
+    POST /ocr?app=xhs&hardware=aibox&tag=note_data_overview_top    请求体为截图原始字节（png / jpg）
+    GET  /health                                                   队列长度等状态
+    GET  /metrics                                                  Prometheus 指标（见 core/metrics.py）
+
+查询参数：
+    app / hardware / tag   对应蒙版目录 mask/<app>/<hardware>/<tag>（tiktok 的 hardware 默认为 aibox），
+                           tag 须为 config.ini [tags] 中配置的标签，且蒙版目录已存在，否则返回 400
+    save=1                 同时写入本地库（与目录扫描相同的 s_<应用>_<标签>_ocr 表），写入时持有任务运行锁
+                           （tmp/social_ocr.lock），不与定时 / 监听任务同时写库；需要时附带：
+    title / link / device / account / date   作品标题、作品链接、设备IP、账号ID、采集日期（默认今天）
+
+返回 JSON：{"ok": true, "fields": {字段: 值}, "confidence": {字段: 置信度}, "saved": false}，
+识别失败返回 422，队列已满返回 503。
+
+串行识别队列：请求进入有界队列（超出 max_queue 返回 503），由唯一的 OCR 工作线程按到达顺序逐个识别。
+PaddleOCR-json 引擎是单个子进程，一次只能识别一张图片，因此这里不做批处理，也不额外等待凑批；
+并发请求只是排队，吞吐与逐张识别相同。
+"""
+
+import asyncio
+import io
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+
+from core.coordinator import RunCoordinator
+from core.logger import logger, job_context
+from core.metrics import REGISTRY, QUEUE_DEPTH, maybe_write_textfile
+from core.settings import get_config
+
+# 请求体上限（字节）
+MAX_BODY_BYTES = 20 * 1024 * 1024
+# 请求头读取超时（秒）
+HEADER_TIMEOUT = 10
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+MASK_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mask")
+# app / hardware / tag 会拼入蒙版目录路径与本地表名，只允许字母、数字、下划线与连字符
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# save=1 时写本地库前获取任务运行锁：其它实例（定时 / 监听任务）运行期间等待其结束
+save_coordinator = RunCoordinator("coalesce", report_dir=None, profile=False)
+
+
+class OcrRequest:
+    """一次识别请求"""
+
+    def __init__(self, params, body):
+        self.id = uuid.uuid4().hex[:8]
+        self.app_name = params.get("app", "xhs")
+        self.tag = params.get("tag", "")
+        default_hardware = "aibox" if self.app_name == "tiktok" else ""
+        self.hard_ware = params.get("hardware", default_hardware)
+        self.save = params.get("save", "0") in ("1", "true", "yes")
+        self.post_title = params.get("title", "")
+        self.note_link = params.get("link", "")
+        self.device = params.get("device", "")
+        self.account_id = params.get("account", "无")
+        self.collect_date = params.get("date") or datetime.now().strftime('%Y%m%d')
+        self.body = body
+
+    def validate(self):
+        """返回参数错误信息，参数完整时返回 None"""
+        if not self.tag:
+            return "缺少参数 tag"
+        if not self.hard_ware:
+            return "缺少参数 hardware"
+        for name, value in (("app", self.app_name), ("hardware", self.hard_ware), ("tag", self.tag)):
+            if not NAME_PATTERN.match(value):
+                return f"参数 {name} 只能包含字母、数字、下划线与连字符: {value}"
+        if self.tag not in get_config().tag_fields:
+            return f"未配置的标签: {self.tag}"
+        if not os.path.isdir(os.path.join(MASK_ROOT, self.app_name, self.hard_ware, self.tag)):
+            return f"蒙版目录不存在: mask/{self.app_name}/{self.hard_ware}/{self.tag}"
+        if not self.body:
+            return "请求体为空，应为截图原始字节"
+        return None
+
+
+def recognize_request(request):
+    """
+    在 OCR 工作线程中识别一个请求：解码图片 -> 蒙版 + OCR + 清洗 -> 可选保存
+
+    :return: (HTTP 状态码, 返回内容)
+    """
+    from core.run import imread_with_pil, recognize_with_masks, save_recognition
+
+    image = imread_with_pil(io.BytesIO(request.body))
+    if image is None:
+        return HTTPStatus.BAD_REQUEST, {"ok": False, "error": "图片解码失败"}
+    # 与采集目录的文件名格式一致（<标签>#<作品标题>.png），流量分析等按文件名前缀区分的逻辑照常生效
+    filename = f"{request.tag}#{request.post_title or request.id}.png"
+    result = recognize_with_masks(f"<http:{request.id}>", filename, request.app_name, request.hard_ware,
+                                  request.tag, image=image)
+    if result is None:
+        return HTTPStatus.UNPROCESSABLE_ENTITY, {"ok": False, "error": "所有蒙版均未识别成功"}
+
+    ocr_texts, index_mapping_data, confidence = result
+    saved = False
+    if request.save:
+        def save():
+            save_recognition(request.app_name, request.tag, request.post_title, request.note_link, result,
+                             request.collect_date, request.device, request.account_id)
+            return True
+
+        # 写入出错时 RunCoordinator 记录日志并返回 None
+        ran, saved = save_coordinator.run(save, trigger="serve-save")
+        if not ran or not saved:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"ok": False, "error": "识别成功但写入本地库失败"}
+    return HTTPStatus.OK, {
+        "ok": True,
+        "fields": dict(zip(index_mapping_data, ocr_texts)),
+        "confidence": confidence,
+        "saved": saved,
+    }
+
+
+class OcrQueue:
+    """识别请求的串行队列：单个 OCR 工作线程按到达顺序逐个识别"""
+
+    def __init__(self, max_queue=64, recognize=recognize_request):
+        """
+        :param max_queue: 排队请求上限，超出时返回 503
+        :param recognize: 识别函数（在工作线程中调用）
+        """
+        self.recognize = recognize
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-worker")
+        self.request_count = 0
+
+    def submit(self, request):
+        """
+        请求入队，返回等待结果的 Future；队列已满时返回 None
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((request, future))
+        except asyncio.QueueFull:
+            return None
+        return future
+
+    def _recognize(self, request):
+        """在工作线程中识别一个请求"""
+        with job_context(f"http:{request.id}"):
+            try:
+                return self.recognize(request)
+            except Exception as e:
+                logger.error(f"[{request.id}] 识别请求出错: {e}")
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"ok": False, "error": str(e)}
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            request, future = await self.queue.get()
+            if future.done():  # 等待结果的请求已取消
+                continue
+            self.request_count += 1
+            result = await loop.run_in_executor(self.executor, self._recognize, request)
+            if not future.done():
+                future.set_result(result)
+
+    async def run_in_worker(self, func, *args):
+        """在 OCR 工作线程中执行其它操作（如空闲回收引擎），避免与识别并发"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+async def read_request(reader):
+    """
+    读取一个 HTTP 请求
+
+    :return: (方法, 路径, 查询参数, 请求体)，格式错误时抛出 ValueError
+    """
+    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT)
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", "0"))
+    if length > MAX_BODY_BYTES:
+        raise ValueError(f"请求体超过上限 {MAX_BODY_BYTES} 字节")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    return method.upper(), url.path, params, body
+
+
+def write_response(writer, status, payload, content_type="application/json; charset=utf-8"):
+    """
+    :param payload: dict 按 JSON 返回；str 按 content_type 原样返回
+    """
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    status = HTTPStatus(status)
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n".encode("latin-1") + body)
+
+
+class OcrServer:
+    """
+    用法：
+        asyncio.run(OcrServer(host, port).serve_forever())
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, ocr_queue=None, idle_check_interval=60):
+        self.host = host
+        self.port = port
+        self.ocr_queue = ocr_queue
+        self.idle_check_interval = idle_check_interval
+        self.started = time.time()
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                method, path, params, body = await read_request(reader)
+            except (ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError) as e:
+                write_response(writer, HTTPStatus.BAD_REQUEST, {"ok": False, "error": f"请求格式错误: {e}"})
+                return
+
+            if method == "GET" and path == "/health":
+                write_response(writer, HTTPStatus.OK, {
+                    "ok": True,
+                    "queue": self.ocr_queue.queue.qsize(),
+                    "requests": self.ocr_queue.request_count,
+                    "uptime_seconds": round(time.time() - self.started, 1),
+                })
+            elif method == "GET" and path == "/metrics":
+                write_response(writer, HTTPStatus.OK, REGISTRY.render(), METRICS_CONTENT_TYPE)
+            elif method == "POST" and path == "/ocr":
+                request = OcrRequest(params, body)
+                error = request.validate()
+                if error:
+                    write_response(writer, HTTPStatus.BAD_REQUEST, {"ok": False, "error": error})
+                    return
+                future = self.ocr_queue.submit(request)
+                if future is None:
+                    write_response(writer, HTTPStatus.SERVICE_UNAVAILABLE, {"ok": False, "error": "识别队列已满，请稍后重试"})
+                    return
+                start_time = time.time()
+                status, payload = await future
+                logger.info(f"[{request.id}] {request.app_name}/{request.hard_ware}/{request.tag} "
+                            f"识别完成（{status}），耗时 {time.time() - start_time:.2f} 秒")
+                write_response(writer, status, payload)
+            else:
+                write_response(writer, HTTPStatus.NOT_FOUND, {"ok": False, "error": f"未知接口: {method} {path}"})
+        except Exception as e:
+            logger.error(f"处理 HTTP 请求出错: {e}")
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _shutdown_idle_engine(self):
+        from core.ocr_engine import shutdown_idle_ocr_engine
+        from core.settings import reload_config_if_changed
+        while True:
+            await asyncio.sleep(self.idle_check_interval)
+            reload_config_if_changed()
+            await self.ocr_queue.run_in_worker(shutdown_idle_ocr_engine)
+            maybe_write_textfile()
+
+    async def serve_forever(self):
+        if self.ocr_queue is None:
+            self.ocr_queue = OcrQueue()
+        QUEUE_DEPTH.labels("serve").set_function(self.ocr_queue.queue.qsize)
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        tasks = [asyncio.create_task(self.ocr_queue.run()), asyncio.create_task(self._shutdown_idle_engine())]
+        logger.info(f"OCR 服务已启动: http://{self.host}:{self.port}（POST /ocr，GET /health，GET /metrics）")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.ocr_queue.close()
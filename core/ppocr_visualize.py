@@ -2,7 +2,42 @@
 # 项目主页：
 # https://github.com/hiroi-sora/PaddleOCR-json
 from PIL import Image, ImageDraw, ImageFont
+from functools import cached_property, lru_cache
 import math
+import os
+
+# 字体查找顺序：参数指定的路径 > 环境变量 OCR_FONT_PATH > 以下常见的 Windows / Linux 中文字体
+FONT_CANDIDATES = [
+    r"C:\Windows\Fonts\msyh.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/wqy-microhei/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+]
+
+
+@lru_cache(maxsize=None)
+def resolveFontPath(ttfPath=None):
+    """返回第一个存在的字体文件路径，都不存在时返回 None（使用 PIL 内置字体）"""
+    for path in (ttfPath, os.getenv("OCR_FONT_PATH"), *FONT_CANDIDATES):
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+@lru_cache(maxsize=256)
+def getFont(ttfPath, size):
+    """按 (字体路径, 字号) 缓存字体对象，整个进程只加载一次"""
+    size = max(1, size)
+    path = resolveFontPath(ttfPath)
+    if path is None:
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:  # Pillow < 10.1 的内置字体不支持字号
+            return ImageFont.load_default()
+    return ImageFont.truetype(path, size)
 
 
 class visualize:
@@ -36,7 +71,7 @@ class visualize:
     def createText(
         textBlocks,
         size,
-        ttfPath="C:\Windows\Fonts\msyh.ttc",
+        ttfPath=None,
         ttfScale=0.9,
         fill="#ff0000",
     ):
@@ -44,13 +79,12 @@ class visualize:
         :textBlocks: 文本块列表。\n
         :size: 图片尺寸。\n
         以下为可选字段：\n
-        :ttfPath: 字体文件路径。默认为微软雅黑，若不存在此字体会报错。\n
+        :ttfPath: 字体文件路径。默认依次查找 OCR_FONT_PATH 与常见中文字体，见 resolveFontPath。\n
         :ttfScale: 字体大小整体缩放系数，应在1附近。\n
         :fill: 文字颜色，十六进制6位RGB或8位RGBA字符串，如 #112233ff。\n
         """
         img = Image.new("RGBA", size, 0)
         draw = ImageDraw.Draw(img)
-        ttfDict = {}  # 缓存不同大小的字体对象
         for tb in textBlocks:
             text = tb["text"]
             xy = tuple(tb["box"][0])  # 左上角坐标
@@ -58,16 +92,14 @@ class visualize:
             hight = round(
                 math.sqrt(((xy[0] - xy1[0]) ** 2) + ((xy[1] - xy1[1]) ** 2)) * ttfScale
             )
-            if hight not in ttfDict:
-                ttfDict[hight] = ImageFont.truetype(ttfPath, hight)  # 创建新大小的字体
-            draw.text(xy, text, font=ttfDict[hight], fill=fill)
+            draw.text(xy, text, font=getFont(ttfPath, hight), fill=fill)
         return img
 
     @staticmethod
     def createOrder(
         textBlocks,
         size,
-        ttfPath="C:\Windows\Fonts\msyh.ttc",
+        ttfPath=None,
         ttfSize=50,
         fill="#2233ff",
         bg="#ffffffe0",
@@ -76,13 +108,13 @@ class visualize:
         :textBlocks: 文本块列表。\n
         :size: 图片尺寸。\n
         以下为可选字段：\n
-        :ttfPath: 字体文件路径。默认为微软雅黑，若不存在此字体会报错。\n
+        :ttfPath: 字体文件路径。默认依次查找 OCR_FONT_PATH 与常见中文字体，见 resolveFontPath。\n
         :ttfSize: 字体大小。\n
         :fill: 文字颜色，十六进制6位RGB或8位RGBA字符串，如 #112233ff。\n
         """
         img = Image.new("RGBA", size, 0)
         draw = ImageDraw.Draw(img)
-        ttf = ImageFont.truetype(ttfPath, ttfSize)  # 字体
+        ttf = getFont(ttfPath, ttfSize)  # 字体
         for index, tb in enumerate(textBlocks):
             text = f"{index+1}"
             xy = tuple(tb["box"][0])  # 左上角坐标
@@ -110,16 +142,34 @@ class visualize:
 
     # ================================ 快捷接口 ================================
 
-    def __init__(self, textBlocks, imagePath):
-        """创建可视化对象。\n
+    def __init__(self, textBlocks, imagePath, ttfPath=None):
+        """创建可视化对象。各图层在首次使用时才生成，生成后复用。\n
         :textBlocks: 文本块列表，即OCR返回的data部分\n
-        :imagePath: 对应的图片路径。
+        :imagePath: 对应的图片路径，或已加载的 PIL Image 对象。\n
+        :ttfPath: 字体文件路径，默认见 resolveFontPath。
         """
-        self.imgSource = Image.open(imagePath).convert("RGBA")  # 原始图片图层
+        if isinstance(imagePath, Image.Image):
+            self.imgSource = imagePath.convert("RGBA")  # 原始图片图层
+        else:
+            self.imgSource = Image.open(imagePath).convert("RGBA")
         self.size = self.imgSource.size
-        self.imgBox = self.createBox(textBlocks, self.size)  # 包围盒图层
-        self.imgText = self.createText(textBlocks, self.size)  # 文字图层
-        self.imgOrder = self.createOrder(textBlocks, self.size)  # 序号图层
+        self.textBlocks = textBlocks
+        self.ttfPath = ttfPath
+
+    @cached_property
+    def imgBox(self):
+        """包围盒图层"""
+        return self.createBox(self.textBlocks, self.size)
+
+    @cached_property
+    def imgText(self):
+        """文字图层"""
+        return self.createText(self.textBlocks, self.size, ttfPath=self.ttfPath)
+
+    @cached_property
+    def imgOrder(self):
+        """序号图层"""
+        return self.createOrder(self.textBlocks, self.size, ttfPath=self.ttfPath)
 
     def get(self, isBox=True, isText=False, isOrder=False, isSource=True):
         """返回合成可视化结果的PIL Image图像。\n
@@ -130,11 +180,9 @@ class visualize:
         """
         img = Image.new("RGBA", self.size, 0)
         flags = (isSource, isBox, isText, isOrder)
-        for index, im in enumerate(
-            [self.imgSource, self.imgBox, self.imgText, self.imgOrder]
-        ):
-            if im and flags[index]:
-                img = visualize.composite(img, im)
+        for index, name in enumerate(("imgSource", "imgBox", "imgText", "imgOrder")):
+            if flags[index]:  # 只生成需要的图层
+                img = visualize.composite(img, getattr(self, name))
         return img
 
     def show(self, isBox=True, isText=False, isOrder=False, isSource=True):
@@ -0,0 +1,233 @@
+"""
+运行剖析（--profile）
+
+按运行（见 core/coordinator.py 的运行ID）输出性能剖析结果到 logs/profile/，排查生产环境中变慢的运行：
+- sample（采样）：后台线程每 OCR_PROFILE_INTERVAL_MS 毫秒采集一次各线程的调用栈，开销很小，
+  可配合 --profile-rate 对一部分定时任务长期开启
+- cprofile：cProfile 记录执行任务的线程中的全部函数调用（开销较大，适合手动排查），同时采样调用栈
+
+阶段计时：识别流程按阶段记录耗时（scan 扫描、decode 解码、mask 蒙版合成、ocr_wait 等待 OCR 引擎、
+normalize 排版与清洗、db 本地入库、merge 数据加工、sync 远程同步），采样的调用栈以 stage:<阶段> 为前缀。
+
+输出文件（<运行ID> 为文件名前缀）：
+    <运行ID>.collapsed     折叠调用栈（每行 "帧;帧;帧 次数"），可直接交给 flamegraph.pl / speedscope 生成火焰图
+    <运行ID>.pstats        cProfile 统计（仅 cprofile 模式），python -m pstats 或 snakeviz 查看
+    <运行ID>.txt           阶段耗时汇总与（cprofile 模式）累计耗时最高的函数
+
+用法：
+    configure("sample", rate=0.1)
+    with profile_run(run_id):
+        ...
+    with stage("db"):
+        ...
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from dotenv import load_dotenv
+
+from core.logger import logger, log_dir
+
+load_dotenv()
+
+PROFILE_MODES = ("off", "sample", "cprofile")
+OCR_PROFILE = os.getenv("OCR_PROFILE", "off").strip().lower()
+# 被剖析的运行比例（0~1）
+OCR_PROFILE_RATE = float(os.getenv("OCR_PROFILE_RATE", "1"))
+# 采样间隔（毫秒）
+OCR_PROFILE_INTERVAL_MS = float(os.getenv("OCR_PROFILE_INTERVAL_MS", "10"))
+PROFILE_DIR = os.path.join(log_dir, "profile")
+# 采样调用栈的最大深度
+MAX_STACK_DEPTH = 128
+
+_mode = OCR_PROFILE
+_rate = OCR_PROFILE_RATE
+_session = None  # 当前剖析会话
+_stage_stacks = {}  # {线程ID: [阶段, ...]}
+
+
+def configure(mode=None, rate=None):
+    """
+    设置剖析模式与比例（命令行参数优先于环境变量）
+    """
+    global _mode, _rate
+    if mode is not None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"未知的剖析模式: {mode}，可选 {PROFILE_MODES}")
+        _mode = mode
+    if rate is not None:
+        _rate = rate
+
+
+@contextmanager
+def stage(name):
+    """
+    记录一个阶段的耗时；未在剖析时几乎没有开销
+    """
+    session = _session
+    if session is None:
+        yield
+        return
+    stack = _stage_stacks.setdefault(threading.get_ident(), [])
+    stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stack.pop()
+        session.add_stage(name, time.perf_counter() - start)
+
+
+def staged(name):
+    """阶段计时装饰器：整个函数计入阶段 name"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """后台线程定时采集所有线程的调用栈，累计为折叠调用栈"""
+
+    def __init__(self, interval=OCR_PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                frames = []
+                while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                    frames.append(_frame_label(frame))
+                    frame = frame.f_back
+                stages = [f"stage:{name}" for name in _stage_stacks.get(ident, ())]
+                key = ";".join([names.get(ident, str(ident)), *stages, *reversed(frames)])
+                self.stacks[key] += 1
+            self.sample_count += 1
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for key, count in self.stacks.most_common():
+                f.write(f"{key} {count}\n")
+
+
+class ProfileSession:
+    """一次运行的剖析会话"""
+
+    def __init__(self, run_id, mode):
+        self.run_id = run_id
+        self.mode = mode
+        self.prefix = os.path.join(PROFILE_DIR, run_id)
+        self.stages = {}  # {阶段: [次数, 总耗时]}
+        self._lock = threading.Lock()
+        self.sampler = StackSampler()
+        self.profiler = cProfile.Profile() if mode == "cprofile" else None
+        self.started = None
+        self.duration = 0.0
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+
+    def stage_summary(self):
+        """阶段耗时（按总耗时降序）"""
+        with self._lock:
+            items = sorted(self.stages.items(), key=lambda item: item[1][1], reverse=True)
+        return [{"stage": name, "count": count, "seconds": round(seconds, 3),
+                 "percent": round(seconds / self.duration * 100, 1) if self.duration else 0.0}
+                for name, (count, seconds) in items]
+
+    def write(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        self.sampler.write_collapsed(f"{self.prefix}.collapsed")
+        summary = self.stage_summary()
+        lines = [f"运行ID: {self.run_id}", f"模式: {self.mode}", f"总耗时: {self.duration:.3f} 秒",
+                 f"采样次数: {self.sampler.sample_count}（间隔 {self.sampler.interval * 1000:.0f} 毫秒）", "",
+                 "阶段耗时（阶段可嵌套、可在多个线程中并行，占比之和不一定为 100%）:"]
+        for item in summary:
+            lines.append(f"  {item['stage']:<10} {item['count']:>8} 次 {item['seconds']:>10.3f} 秒 "
+                         f"{item['percent']:>6.1f}%")
+        if self.profiler is not None:
+            self.profiler.dump_stats(f"{self.prefix}.pstats")
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats("cumulative").print_stats(40)
+            lines.extend(["", "累计耗时最高的函数:", stream.getvalue()])
+        with open(f"{self.prefix}.txt", 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        stages = ", ".join(f"{item['stage']} {item['seconds']}s" for item in summary[:8]) or "无"
+        logger.info(f"[{self.run_id}] 剖析结果已写入 {self.prefix}.*，阶段耗时: {stages}")
+
+
+@contextmanager
+def profile_run(run_id, enabled=True):
+    """
+    按配置的模式与比例剖析一次运行，未被选中时直接执行
+
+    :param enabled: 为 False 时不剖析（如监听模式下每批新文件的识别）
+    :return: 剖析会话，未剖析时为 None
+    """
+    global _session
+    if not enabled or _mode == "off" or _session is not None or random.random() >= _rate:
+        yield None
+        return
+    session = ProfileSession(run_id, _mode)
+    _session = session
+    session.start()
+    try:
+        yield session
+    finally:
+        session.stop()
+        _session = None
+        _stage_stacks.clear()
+        try:
+            session.write()
+        except Exception as e:
+            logger.warning(f"[{run_id}] 剖析结果写入失败: {e}")
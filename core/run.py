@@ -1,18 +1,25 @@
 import json
 import os
 import re
-import cv2
-import numpy as np
-from PIL import Image
-from core.logger import logger
+from core.logger import logger, sampled, job_context
 # from core.ocr import sort_text_lines_by_surya_position, ocr, sort_text_lines_by_paddle_position
-from core.ocr import sort_text_lines_by_surya_position, sort_text_lines_by_paddle_position
+from core.ocr import sort_text_lines, DEFAULT_PARSER_KEY
+from core.normalize import get_normalizer
+from core.debug_overlay import overlay_writer
+from core.mask_scoring import (load_mask, evaluate_lines, make_candidate, is_acceptable, candidate_rank,
+                               field_confidence)
+from core.settings import get_config, list_mask_files
+from core.profiler import stage, staged
+from core.ocr_engine import ocr_engine, get_ocr_engine
+from core.metrics import (IMAGES_DISCOVERED, IMAGES_PROCESSED, IMAGES_FAILED, MASK_ATTEMPTS, OCR_CALL_SECONDS,
+                          maybe_write_textfile)
 # 调用同步函数将数据同步到远程数据库
-from db.data_sync import sync_post_data_to_remote, sync_user_info_to_remote
+from db.data_sync import sync_post_data_to_remote
 # 引入数据库模块
 from db import save_ocr_data
-import time
-import configparser
+from db.profile_cache import UserInfoBatch
+from db.job_ledger import JobLedger
+from db.shard_lease import get_shard_manager, shard_signature
 from datetime import datetime, timedelta
 
 from dotenv import load_dotenv
@@ -25,25 +32,23 @@ root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # OCR 图片目录
 ocr_root = os.getenv("OCR_IMAGES_PATH", os.path.join(root_dir, "images"))
-ocr_engine = os.getenv("OCR_ENGINE", "surya")
+# OCR 引擎在第一张图片需要识别时才启动，见 core/ocr_engine.py
 
-if ocr_engine == "PaddleOCR":
-    from core.ppocr_api import GetOcrApi
+# 配置文件见 core/settings.py（只解析一次，定时任务 / 监听模式下修改后自动重新加载）
 
-    # OCR 引擎路径
-    ocr_engine_path = os.getenv("OCR_ENGINE_PATH")
-    if not ocr_engine_path:
-        logger.error("OCR_ENGINE_PATH 环境变量未设置")
+# 按类别抽样输出的日志（见 core/logger.py）：识别失败的截图会补记完整过程
+mask_log = sampled("mask_attempt")
+result_log = sampled("ocr_result")
+file_log = sampled("file")
+user_info_log = sampled("user_info")
 
-    if not os.path.exists(ocr_engine_path):
-        logger.error(f"OCR引擎路径不存在: {ocr_engine_path}")
-    # 初始化 OCR 引擎
-    ocr = GetOcrApi(ocr_engine_path)
 
-# 读取配置文件
-config = configparser.ConfigParser()
-with open(os.path.join(root_dir, 'config.ini'), encoding='utf-8') as f:
-    config.read_file(f)
+def get_parser_key(tag, settings=None):
+    """
+    获取标签对应的排版解析器，未配置时使用 [parsers] default，再缺省则使用默认排序
+    """
+    settings = settings or get_config()
+    return settings.parsers.get(tag, settings.default_parser or DEFAULT_PARSER_KEY)
 
 
 def upscale_image(image, scale_factor=2):
@@ -57,6 +62,7 @@ def upscale_image(image, scale_factor=2):
     Returns:
         放大后的图像
     """
+    import cv2
     return cv2.resize(image, None, fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_CUBIC)
 
 
@@ -70,6 +76,7 @@ def preprocess_image(image):
     Returns:
         预处理后的图像
     """
+    import cv2
     # 转换为灰度图
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
@@ -101,11 +108,492 @@ def enhance_image(image, alpha=1.5, beta=50):
     Returns:
         增强后的图像
     """
+    import cv2
     # 使用公式：output = alpha * input + beta
     enhanced_img = cv2.convertScaleAbs(image, alpha=alpha, beta=beta)
     return enhanced_img
 
 
+def get_index_mapping(tag, settings=None):
+    """
+    从配置文件 [tags] 中获取标签对应的字段元组
+    """
+    return (settings or get_config()).get_tag_fields(tag)
+
+
+def build_post_index(directory, files):
+    """
+    构建目录内作品 JSON 的索引 {作品标题: JSON 内容}
+
+    同一作品的多张截图（top / bottom / 流量分析等）共用一个 <作品标题>.json，
+    每个目录只解析一次，且只解析有对应截图的 JSON。
+
+    :param directory: 目录路径
+    :param files: 目录内的文件名列表（os.walk 的 files）
+    """
+    file_set = set(files)
+    post_titles = {name.replace(".png", "").split('#', 1)[1]
+                   for name in files if name.endswith('.png') and '#' in name}
+    index = {}
+    for post_title in post_titles:
+        json_filename = f"{post_title}.json"
+        if json_filename not in file_set:
+            continue
+        json_file_path = os.path.join(directory, json_filename)
+        try:
+            with open(json_file_path, 'r', encoding='utf-8') as f:
+                json_data = json.load(f)
+            if not isinstance(json_data, dict):
+                raise ValueError("JSON 内容不是对象")
+            index[post_title] = json_data
+        except Exception as e:
+            logger.error(f"读取JSON文件失败: {json_file_path}, 错误: {e}")
+            index[post_title] = {}
+    return index
+
+
+def run_ocr_on_image(result_img, mask_path, file_path):
+    """
+    识别合成后的图片，返回按阅读顺序排列的文本行；识别失败返回 None
+    """
+    import cv2
+    # 放大
+    # result_img = upscale_image(result_img, scale_factor=2)
+    # result_img = enhance_image(result_img, alpha=1, beta=20)  # 增加对比度和亮度
+    # 编码为 PNG 字节流直接交给引擎，不经过共享的临时文件（多个进程 / 模式同时识别时互不覆盖）
+    ok, encoded = cv2.imencode(".png", result_img, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not ok:
+        logger.error(f"使用蒙版文件{mask_path},图片编码失败: {file_path}")
+        return None
+    image_bytes = encoded.tobytes()
+    mask_log.info(f"图片编码完成，大小: {len(image_bytes)} bytes")
+
+    if ocr_engine == "PaddleOCR":
+        engine = get_ocr_engine()
+        with OCR_CALL_SECONDS.time():
+            getObj = engine.runBytes(image_bytes)
+        if not getObj["code"] == 100:
+            logger.info(f"OCR识别结果: {getObj}")
+            logger.error(f"使用蒙版文件{mask_path},OCR识别失败: 请检查{file_path},是否为空白图片")
+            return None
+        return getObj["data"]
+    # surya ocr
+    # else:
+    #     img = Image.open(io.BytesIO(image_bytes))
+    #     img_pred = ocr(img, with_bboxes=True)
+    #     return img_pred.text_lines
+    return None
+
+
+def record_recognition(app_name, tag, attempts, ok):
+    """记录一张截图的识别指标：尝试的蒙版数、成功 / 失败"""
+    MASK_ATTEMPTS.labels(app_name).observe(attempts)
+    (IMAGES_PROCESSED if ok else IMAGES_FAILED).labels(app_name, tag).inc()
+
+
+def recognize_with_masks(file_path, filename, app_name, hard_ware, tag, image=None):
+    """
+    依次使用标签蒙版库中的蒙版识别截图，并对每次识别结果打分（见 core/mask_scoring.py）
+
+    - 行数与字段数一致且数值校验通过，或按蒙版区域对齐后字段完整且置信度足够时，直接接受
+    - 否则保留最佳候选并尝试下一个蒙版；所有蒙版都未接受时，使用缺失字段不超过
+      [scoring] max_missing_fields 的最佳候选
+
+    :param image: 已解码的截图（OpenCV 格式，如 HTTP 服务收到的图片），为 None 时从 file_path 读取
+    :return: (识别结果列表, 字段列表, 字段置信度)，识别失败返回 None
+    """
+    import numpy as np
+    settings = get_config()  # 整张截图使用同一份配置
+    mask_folder = os.path.join(root_dir, "mask", app_name, hard_ware, tag)
+    mask_log.info(f"蒙版文件夹: {mask_folder}")
+    mask_files = list_mask_files(mask_folder)
+    index_mapping_data = get_index_mapping(tag, settings)
+    normalizer = get_normalizer(app_name, tag)
+    parser_key = get_parser_key(tag, settings)
+
+    # 原图只读取一次，供所有蒙版复用
+    with stage("decode"):
+        original_img = image if image is not None or not mask_files else imread_with_pil(file_path)
+    if mask_files and original_img is None:
+        logger.error(f"原图加载失败: {file_path}")
+        record_recognition(app_name, tag, 0, False)
+        return None
+
+    best = None  # 未被直接接受的最佳候选
+    best_attempt = None  # 最佳候选对应的 (OCR输入图, 文本行, 蒙版文件)，用于调试叠加图
+    last_attempt = None
+    overlay_dir = os.path.join(app_name, tag)
+    attempts = 0
+    for mask_file in mask_files:
+        attempts += 1
+        try:
+            mask_path = os.path.join(mask_folder, mask_file)
+            mask_log.info(f"使用蒙版: {mask_file}")
+            with stage("mask"):
+                mask = load_mask(mask_path)  # 带Alpha通道的蒙版（已缓存）
+
+            # 检查蒙版图是否有效
+            if mask is None:
+                logger.error(f"蒙版图加载失败: {mask_path}")
+                continue
+
+            # 确保蒙版图与原图尺寸一致
+            if original_img.shape[:2] != mask.shape[:2]:
+                logger.warning(f"蒙版图尺寸不匹配: {mask.shape[:2]} vs {original_img.shape[:2]}")
+                continue
+
+            # 使用蒙版图合成新图片（保留蒙版区域，其他区域变黑）
+            with stage("mask"):
+                alpha = mask.alpha / 255.0  # 归一化Alpha通道
+                result_img = original_img * alpha[:, :, np.newaxis]  # 应用Alpha混合
+                result_img = result_img.astype(np.uint8)
+
+            # 执行 OCR 识别
+            mask_log.info(f"正在处理: {filename}")
+            with stage("ocr_wait"):
+                text_lines = run_ocr_on_image(result_img, mask_path, file_path)
+            if text_lines is None:
+                continue
+            with stage("normalize"):
+                sorted_lines = sort_text_lines(text_lines, parser_key)
+                last_attempt = (result_img, sorted_lines, mask_file)
+
+                # 清洗文本，保留置信度与位置
+                lines = []
+                for line in sorted_lines:
+                    text = normalizer.normalize(str(line['text']))
+                    if text:
+                        lines.append((text, line.get('score', 1.0), line['box']))
+            result_log.info(f"OCR识别结果：{[text for text, _, _ in lines]}")
+
+            if filename.startswith("note_traffic_analysis"):
+                # 流量分析：8 行两两组成 “来源:占比”，使用分隔符连接为一个字段
+                candidate = None
+                if len(lines) == 8:
+                    texts = ['|'.join([f"{lines[i][0]}:{lines[i + 1][0]}" for i in range(0, len(lines), 2)])]
+                    result_log.info(f"流量分析结果：{texts}")
+                    candidate = make_candidate(texts, [min(score for _, score, _ in lines)], index_mapping_data,
+                                               "sequence")
+            else:
+                with stage("normalize"):
+                    candidate = evaluate_lines(lines, mask.slots, index_mapping_data)
+
+            if candidate is None:
+                logger.warning(f"{filename}：识别到的数据个数不匹配，尝试使用蒙版库中其余蒙版")
+                continue
+            if is_acceptable(candidate, settings.scoring.accept_score):
+                result_log.info(f"使用蒙版库中蒙版 {mask_file} OCR识别成功（{candidate['source']}，"
+                                f"平均置信度 {candidate['score']:.3f}）")
+                overlay_writer.submit(f"{filename}_{mask_file}", result_img, sorted_lines, False, overlay_dir)
+                record_recognition(app_name, tag, attempts, True)
+                return candidate["texts"], index_mapping_data, field_confidence(candidate, index_mapping_data)
+
+            logger.warning(f"{filename}：候选结果未达到接受条件（缺失字段 {candidate['missing']}，"
+                           f"校验未通过 {candidate['invalid']}，置信度 {candidate['confidences']}），"
+                           f"尝试使用蒙版库中其余蒙版")
+            if best is None or candidate_rank(candidate) < candidate_rank(best):
+                best = candidate
+                best_attempt = last_attempt
+
+        except Exception as e:
+            logger.warning(f"使用蒙版文件 {mask_file} 处理失败: {e}")
+            continue
+
+    # 未直接接受的截图输出调试叠加图（最佳候选所用蒙版，没有候选时为最后一次识别）
+    attempt = best_attempt or last_attempt
+    if attempt is not None:
+        overlay_writer.submit(f"{filename}_{attempt[2]}", attempt[0], attempt[1], True, overlay_dir)
+
+    if best is not None and best["missing"] <= settings.scoring.max_missing_fields:
+        logger.warning(f"{filename}：所有蒙版均未直接接受，使用最佳候选结果: {best['texts']}")
+        record_recognition(app_name, tag, attempts, True)
+        return best["texts"], index_mapping_data, field_confidence(best, index_mapping_data)
+    logger.error(f"使用蒙版库中，所有蒙版，最后还是识别失败: {filename}")
+    record_recognition(app_name, tag, attempts, False)
+    return None
+
+
+def get_recent_dates(day=None):
+    """
+    最近 N 天的日期列表（YYYYMMDD），N 默认取环境变量 OCR_RECENT_DAYS
+    """
+    if day is None:
+        day = int(os.getenv("OCR_RECENT_DAYS", "2"))
+    return [(datetime.now() - timedelta(days=i)).strftime('%Y%m%d') for i in range(day)]
+
+
+def resolve_file_context(file_path, recent_dates=None):
+    """
+    根据采集目录结构解析文件的上下文：
+    <OCR目录>/xhs/<硬件>/<日期>/<设备IP#账号ID>/<文件>，
+    <OCR目录>/<tiktok|weibo>/<日期>/<设备IP#账号ID>/<文件>
+
+    :return: (所在目录, 文件名, 应用名称, 硬件名称)；不在最近 N 天的目录或结构不符时返回 None
+    """
+    parts = os.path.relpath(file_path, ocr_root).split(os.sep)
+    if parts[0] == "xhs":
+        if len(parts) < 5:
+            return None
+        app_name, hard_ware = parts[0], parts[1]
+    elif parts[0] in ("tiktok", "weibo"):
+        if len(parts) < 4:
+            return None
+        app_name, hard_ware = parts[0], None
+    else:
+        return None
+    root, filename = os.path.split(file_path)
+    if not any(date in root for date in (recent_dates or get_recent_dates())):
+        return None
+    return root, filename, app_name, hard_ware
+
+
+@staged("db")
+def save_recognition(app_name, tag, post_title, note_link, result, collect_date, ip_port_dir, account_id):
+    """
+    将 recognize_with_masks 的识别结果保存到本地库 s_<应用>_<标签>_ocr 表
+
+    :param result: (识别结果列表, 字段列表, 字段置信度)
+    """
+    ocr_texts, index_mapping_data, confidence = result
+    if app_name == "tiktok":
+        content_type = "tiktok视频"
+    else:
+        # 小红书的标签可能带序号（如 note_data_overview_top1），按去掉序号后的标签建表
+        tag = re.sub(r'\d+', '', tag)
+        if 'video' in tag:
+            content_type = "视频"
+        else:
+            content_type = "图文"
+
+    save_ocr_data(tag, post_title, note_link, content_type, ocr_texts, index_mapping_data,
+                  collect_date,
+                  ip_port_dir,
+                  account_id, app_name, field_confidence=confidence)
+
+
+def process_file(root, filename, app_name, hard_ware=None, post_index=None, user_info_batch=None):
+    """
+    处理采集目录中的单个文件（用户信息 JSON、微博数据 JSON、小红书 / tiktok 截图）
+
+    :param root: 文件所在目录，即 <日期>/<设备IP#账号ID>
+    :param filename: 文件名
+    :param app_name: 应用名称
+    :param hard_ware: 硬件名称（小红书）
+    :param post_index: 目录内作品 JSON 索引（见 build_post_index），为 None 时按需构建
+    :param user_info_batch: 用户信息批量同步（见 db/profile_cache.py），为 None 时处理完立即推送
+    :return: 截图识别失败时返回 False，其余情况返回 True
+    """
+    if post_index is None:
+        # 只解析当前截图对应的作品 JSON
+        json_files = [name for name in os.listdir(root) if name.endswith('.json')]
+        post_index = build_post_index(root, [filename] + json_files) if app_name == "xhs" else {}
+    flush_user_info = user_info_batch is None
+    if flush_user_info:
+        user_info_batch = UserInfoBatch()
+
+    # 构建图片路径
+    file_path = os.path.join(root, filename)
+    parent_dir = os.path.dirname(file_path)  # 获取图片所在目录
+    if '#' in os.path.basename(parent_dir):
+        ip_port_dir, account_id = os.path.basename(parent_dir).split('#')
+    else:
+        ip_port_dir, account_id = os.path.basename(parent_dir), '无'
+    date_dir = os.path.basename(os.path.dirname(parent_dir))  # 获取日期文件夹名
+    collect_date = date_dir
+    if filename == "user_info.json" and app_name == "tiktok":
+        file_log.info(f"\n====开始处理TK用户信息====\n{file_path}")
+        # 同步到本地数据库
+        user_info = {}
+        # 如果文件名是user_info.json 则读取文件
+        with open(file_path, 'r', encoding='utf-8') as f:
+            profile_data = json.load(f)
+            if isinstance(profile_data, dict):
+                author_profile_url = profile_data.get("share_link", "")
+                user_info['nickname'] = profile_data.get('nickname', '')
+                user_info['follows'] = profile_data.get('follow_count', '')
+                user_info['fans'] = profile_data.get('follower_count', '')
+                user_info['interaction'] = profile_data.get('like_count', '')  # 获赞与收藏
+                user_info['collect_time'] = collect_date  # 添加采集时间
+                user_info['profile_url'] = author_profile_url  # 添加个人主页链接
+
+        try:
+            # 检查是否成功获取到用户信息（判断user_info是否包含有效数据）
+            if isinstance(user_info, dict) and user_info.get('nickname'):
+                user_info_log.info(f"保存用户信息成功: {user_info}")
+                user_info_log.info(f"account_id:{account_id}")
+                # 同步到本地数据库
+                # save_userinfo_data(app_name, user_info, ip_port_dir, account_id, collect_date,
+                #                    author_profile_url)
+                # 登记到本轮批量同步（内容未变化时跳过），本轮结束时统一推送
+                user_info_batch.add(user_info, app_name, ip_port_dir, account_id)
+            else:
+                logger.error(f"获取用户信息失败: {author_profile_url}")
+        except Exception as e:
+            logger.error(f"处理用户信息失败: {author_profile_url}, 错误: {e}")
+        file_log.info(f"\n====处理TK用户信息完成====\n")
+
+    if filename == "post_data.json" and app_name == "tiktok":
+        # 读取weibo_data.json文件
+        # 直接同步到远程数据库s_xhs_data_overview_traffic_analysis
+        file_log.info(f"\n====开始处理微博数据====\n{file_path}")
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                post_data_list = json.load(f)
+
+            # 为每条微博数据添加设备IP和账号ID
+            for post_data in post_data_list:
+                post_data["device_ip"] = ip_port_dir
+                post_data['collect_time'] = collect_date
+            user_info_log.info(f"account_id:{account_id}")
+
+            sync_post_data_to_remote(post_data_list, app_name, account_id)
+        except Exception as e:
+            logger.error(f"处理weibo_data.json文件时出错: {e}")
+        file_log.info(f"\n====处理微博数据完成====\n")
+
+    if filename == "weibo_data.json" and app_name == "weibo":
+        # 读取weibo_data.json文件
+        # 直接同步到远程数据库s_xhs_data_overview_traffic_analysis
+        file_log.info(f"\n====开始处理微博数据====\n{file_path}")
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                post_data_list = json.load(f)
+
+            # 为每条微博数据添加设备IP和账号ID
+            for post_data in post_data_list:
+                post_data["device_ip"] = ip_port_dir
+                post_data['collect_time'] = collect_date
+            user_info_log.info(f"account_id:{account_id}")
+
+            sync_post_data_to_remote(post_data_list, app_name, account_id)
+        except Exception as e:
+            logger.error(f"处理weibo_data.json文件时出错: {e}")
+        file_log.info(f"\n====处理微博数据完成====\n")
+
+    if filename == "user_info.json" and app_name == "weibo":
+        file_log.info(f"\n====开始处理微博用户信息====\n{file_path}")
+        # 同步到本地数据库
+        user_info = {}
+        # 如果文件名是user_info.json 则读取文件
+        with open(file_path, 'r', encoding='utf-8') as f:
+            profile_data = json.load(f)
+            if isinstance(profile_data, dict):
+                author_profile_url = profile_data.get("share_link", "")
+                user_info['nickname'] = profile_data.get('nickname', '')
+                user_info['follows'] = profile_data.get('follow_count', '')
+                user_info['fans'] = profile_data.get('follower_count', '')
+                # user_info['interaction'] = ''  # 获赞与收藏(微博没有这个数据)
+                user_info['collect_time'] = collect_date  # 添加采集时间
+                user_info['profile_url'] = author_profile_url  # 添加个人主页链接
+
+        try:
+            # 检查是否成功获取到用户信息（判断user_info是否包含有效数据）
+            if isinstance(user_info, dict) and user_info.get('nickname'):
+                user_info_log.info(f"保存用户信息成功: {user_info}")
+                user_info_log.info(f"account_id:{account_id}")
+                # 同步到本地数据库
+                # save_userinfo_data(app_name, user_info, ip_port_dir, account_id, collect_date,
+                #                    author_profile_url)
+                # 登记到本轮批量同步（内容未变化时跳过），本轮结束时统一推送
+                user_info_batch.add(user_info, app_name, ip_port_dir, account_id)
+            else:
+                logger.error(f"获取用户信息失败: {author_profile_url}")
+        except Exception as e:
+            logger.error(f"处理用户信息失败: {author_profile_url}, 错误: {e}")
+        file_log.info(f"\n====处理微博用户信息完成====\n")
+    # 处理小红书用户信息文件 (profile_url.json)
+    if filename == "profile_url.json" and app_name == "xhs":
+        file_log.info(f"\n====开始处理小红书用户信息====\n{file_path}")
+        # 同步到本地数据库
+        user_info = {}
+        # 如果文件名是profile_url.json 则读取文件
+        with open(file_path, 'r', encoding='utf-8') as f:
+            profile_data = json.load(f)
+            if isinstance(profile_data, dict):
+                author_profile_url = profile_data.get("user_profile_url", "")
+                user_info['nickname'] = profile_data.get('nickname', '')
+                user_info['follows'] = convert_chinese_numbers(
+                    profile_data.get('following_count', ''))
+                user_info['fans'] = convert_chinese_numbers(profile_data.get('fans', ''))
+                user_info['interaction'] = convert_chinese_numbers(
+                    profile_data.get('likes_collect_count', ''))  # 获赞与收藏
+                user_info['collect_time'] = collect_date  # 添加采集时间
+                user_info['profile_url'] = author_profile_url  # 添加个人主页链接
+
+        try:
+            # 检查是否成功获取到用户信息（判断user_info是否包含有效数据）
+            if isinstance(user_info, dict) and user_info.get('nickname'):
+                user_info_log.info(f"保存用户信息成功: {user_info}")
+                # 同步到本地数据库
+                # save_userinfo_data(app_name, user_info, ip_port_dir, account_id, collect_date,
+                #                    author_profile_url)
+                # 登记到本轮批量同步（内容未变化时跳过），本轮结束时统一推送
+                user_info_batch.add(user_info, app_name, ip_port_dir, account_id)
+            else:
+                logger.error(f"获取用户信息失败: {author_profile_url}")
+        except Exception as e:
+            logger.error(f"处理用户信息失败: {author_profile_url}, 错误: {e}")
+        file_log.info(f"\n====处理小红书用户信息完成====\n")
+    elif filename.endswith('.png') and app_name in ("xhs"):
+        file_log.info(f"\n====开始处理小红书图片====\n{file_path}")
+        tag, post_title = os.path.basename(filename).replace(".png", "").split('#')
+        json_file_path = os.path.join(root, f"{post_title}.json")
+        json_data = post_index.get(post_title)
+        if json_data is None:
+            logger.warning(f"JSON文件不存在: {json_file_path}")
+            json_data = {}
+        note_link = json_data.get("note_link", "")
+        # post_content = json_data.get("post_content", "")
+        # clean_title = json_data.get("clean_title", "")
+
+        file_log.info(f"处理图片: {filename}, 日期: {date_dir}, 设备: {ip_port_dir}")
+
+        result = recognize_with_masks(file_path, filename, app_name, hard_ware, tag)
+        if result is None:
+            return False
+        # 保存数据到数据库
+        save_recognition(app_name, tag, post_title, note_link, result, collect_date, ip_port_dir, account_id)
+    elif filename.endswith('.png') and app_name in ("tiktok"):
+        file_log.info(f"\n====开始处理tiktok图片====\n{file_path}")
+        tag, note_link = os.path.basename(filename).replace(".png", "").split('#')
+        # tiktok 采集目录下没有硬件层级，蒙版统一放在 aibox 下
+        result = recognize_with_masks(file_path, filename, app_name, "aibox", tag)
+        if result is None:
+            return False
+        note_link = note_link.replace('*', "/")
+
+        save_recognition(app_name, tag, '', note_link, result, collect_date, ip_port_dir, account_id)
+
+    if flush_user_info:
+        user_info_batch.flush()
+        user_info_batch.close()
+    return True
+
+
+def process_job(ledger, root, filename, app_name, hard_ware=None, post_index=None, user_info_batch=None):
+    """
+    按任务台账（见 db/job_ledger.py）处理单个文件：截图已识别成功或已隔离时跳过，
+    识别前后记录状态，进程中途退出后下次运行从未完成的截图继续；JSON 文件不记入台账，每次都处理
+
+    :param ledger: JobLedger，为 None 时直接处理
+    """
+    if ledger is None or not filename.endswith('.png'):
+        with job_context(os.path.join(root, filename)):
+            return process_file(root, filename, app_name, hard_ware, post_index, user_info_batch)
+    file_path = os.path.join(root, filename)
+    if not ledger.claim(file_path, app_name):
+        return None
+    with job_context(file_path):
+        try:
+            ok = process_file(root, filename, app_name, hard_ware, post_index, user_info_batch)
+            ledger.finish(file_path, ok, None if ok else "所有蒙版均未识别成功")
+        except Exception as e:
+            logger.error(f"处理截图出错: {file_path}, 错误: {e}")
+            ledger.finish(file_path, False, str(e))
+            ok = False
+    return ok
+
+
 def process_images():
     # try:
     #     import subprocess
@@ -121,20 +609,11 @@ def process_images():
     """
     处理OCR目录下的所有图片
     """
-    if ocr_engine == "PaddleOCR":
-        if ocr.getRunningMode() == "local":
-            logger.info(f"初始化OCR成功，进程号为{ocr.ret.pid}")
-        elif ocr.getRunningMode() == "remote":
-            logger.info(f"连接远程OCR引擎成功，ip：{ocr.ip}，port：{ocr.port}")
-
     # 遍历 OCR 目录下的所有图片
 
     # 获取最近2天的日期列表
-    recent_dates = []
     day = int(os.getenv("OCR_RECENT_DAYS", "2"))
-    for i in range(day):
-        date_str = (datetime.now() - timedelta(days=i)).strftime('%Y%m%d')
-        recent_dates.append(date_str)
+    recent_dates = get_recent_dates(day)
     logger.info(f"最近{day}天日期: {recent_dates}")
     # logger.info(f"开始扫描ocr目录：{ocr_dir}")
 
@@ -143,6 +622,14 @@ def process_images():
         logger.error(f"OCR目录不存在: {ocr_root}")
         return
 
+    # 用户信息在本轮内去重合并，结束时批量同步
+    user_info_batch = UserInfoBatch()
+    # 截图识别台账：上次中途退出时，已识别成功的截图不再重复识别
+    ledger = JobLedger()
+    ledger.prune()
+    # 多节点分片：未启用（OCR_SHARD_BACKEND=off）时为 None，由本进程处理全部目录
+    shards = get_shard_manager()
+
     # 第一步：只扫描一级目录
     level_one_dirs = []
     for item in os.listdir(ocr_root):
@@ -162,6 +649,7 @@ def process_images():
             if os.path.isdir(item_path):
                 # logger.info(f"  二级目录: {level_one_dir}/{item}")
 
+                hard_ware = None
                 if app_name == "xhs":
                     logger.info(f"\n======硬件名称： {item}======\n")
                     hard_ware = item
@@ -194,462 +682,48 @@ def process_images():
                         # logger.info(f"跳过目录(非最近{day}天): {root}")
                         continue
 
+                    # 日期等只含子目录的中间层级没有需要处理的文件
+                    if not files:
+                        continue
+
+                    # 每个 (应用, 硬件, 日期, 设备) 目录是一个分片，由领取到租约的节点处理
+                    shard_key = os.path.relpath(root, ocr_root).replace(os.sep, '/')
+                    if shards is not None and not shards.acquire(shard_key, shard_signature(root, files)):
+                        logger.info(f"目录由其它节点处理或已处理完成，跳过: {root}")
+                        continue
+
                     logger.info(f"处理最近{day}天的目录: {root}")
-                    for filename in files:
-                        # 构建图片路径
-                        file_path = os.path.join(root, filename)
-                        parent_dir = os.path.dirname(file_path)  # 获取图片所在目录
-                        if '#' in os.path.basename(parent_dir):
-                            ip_port_dir, account_id = os.path.basename(parent_dir).split('#')
+                    completed = False
+                    try:
+                        with stage("scan"):
+                            # 小红书作品 JSON 索引，每个目录只构建一次
+                            post_index = build_post_index(root, files) if app_name == "xhs" else {}
+                            ledger.discover([os.path.join(root, name) for name in files if name.endswith('.png')],
+                                            app_name)
+                            for name in files:
+                                if name.endswith('.png'):
+                                    IMAGES_DISCOVERED.labels(app_name, name.split('#')[0]).inc()
+                        for filename in files:
+                            if shards is not None and shards.lost(shard_key):
+                                break
+                            process_job(ledger, root, filename, app_name, hard_ware, post_index, user_info_batch)
                         else:
-                            ip_port_dir, account_id = os.path.basename(parent_dir), '无'
-                        date_dir = os.path.basename(os.path.dirname(parent_dir))  # 获取日期文件夹名
-                        collect_date = date_dir
-                        if filename == "user_info.json" and app_name == "tiktok":
-                            logger.info(f"\n====开始处理TK用户信息====\n{file_path}")
-                            # 同步到本地数据库
-                            user_info = {}
-                            # 如果文件名是user_info.json 则读取文件
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                profile_data = json.load(f)
-                                if isinstance(profile_data, dict):
-                                    author_profile_url = profile_data.get("share_link", "")
-                                    user_info['nickname'] = profile_data.get('nickname', '')
-                                    user_info['follows'] = profile_data.get('follow_count', '')
-                                    user_info['fans'] = profile_data.get('follower_count', '')
-                                    user_info['interaction'] = profile_data.get('like_count', '')  # 获赞与收藏
-                                    user_info['collect_time'] = collect_date  # 添加采集时间
-                                    user_info['profile_url'] = author_profile_url  # 添加个人主页链接
-
-                            try:
-                                # 检查是否成功获取到用户信息（判断user_info是否包含有效数据）
-                                if isinstance(user_info, dict) and user_info.get('nickname'):
-                                    logger.info(f"保存用户信息成功: {user_info}")
-                                    logger.info(f"account_id:{account_id}")
-                                    # 同步到本地数据库
-                                    # save_userinfo_data(app_name, user_info, ip_port_dir, account_id, collect_date,
-                                    #                    author_profile_url)
-                                    # 同步到远程数据库
-                                    sync_user_info_to_remote([user_info], app_name, ip_port_dir, account_id)
-                                else:
-                                    logger.error(f"获取用户信息失败: {author_profile_url}")
-                            except Exception as e:
-                                logger.error(f"处理用户信息失败: {author_profile_url}, 错误: {e}")
-                            logger.info(f"\n====处理TK用户信息完成====\n")
-
-                        if filename == "post_data.json" and app_name == "tiktok":
-                            # 读取weibo_data.json文件
-                            # 直接同步到远程数据库s_xhs_data_overview_traffic_analysis
-                            logger.info(f"\n====开始处理微博数据====\n{file_path}")
-                            try:
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    post_data_list = json.load(f)
-
-                                # 为每条微博数据添加设备IP和账号ID
-                                for post_data in post_data_list:
-                                    post_data["device_ip"] = ip_port_dir
-                                    post_data['collect_time'] = collect_date
-                                logger.info(f"account_id:{account_id}")
-
-                                sync_post_data_to_remote(post_data_list, app_name, account_id)
-                            except Exception as e:
-                                logger.error(f"处理weibo_data.json文件时出错: {e}")
-                            logger.info(f"\n====处理微博数据完成====\n")
-
-                        if filename == "weibo_data.json" and app_name == "weibo":
-                            # 读取weibo_data.json文件
-                            # 直接同步到远程数据库s_xhs_data_overview_traffic_analysis
-                            logger.info(f"\n====开始处理微博数据====\n{file_path}")
-                            try:
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    post_data_list = json.load(f)
-
-                                # 为每条微博数据添加设备IP和账号ID
-                                for post_data in post_data_list:
-                                    post_data["device_ip"] = ip_port_dir
-                                    post_data['collect_time'] = collect_date
-                                logger.info(f"account_id:{account_id}")
-
-                                sync_post_data_to_remote(post_data_list, app_name, account_id)
-                            except Exception as e:
-                                logger.error(f"处理weibo_data.json文件时出错: {e}")
-                            logger.info(f"\n====处理微博数据完成====\n")
-
-                        if filename == "user_info.json" and app_name == "weibo":
-                            logger.info(f"\n====开始处理微博用户信息====\n{file_path}")
-                            # 同步到本地数据库
-                            user_info = {}
-                            # 如果文件名是user_info.json 则读取文件
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                profile_data = json.load(f)
-                                if isinstance(profile_data, dict):
-                                    author_profile_url = profile_data.get("share_link", "")
-                                    user_info['nickname'] = profile_data.get('nickname', '')
-                                    user_info['follows'] = profile_data.get('follow_count', '')
-                                    user_info['fans'] = profile_data.get('follower_count', '')
-                                    # user_info['interaction'] = ''  # 获赞与收藏(微博没有这个数据)
-                                    user_info['collect_time'] = collect_date  # 添加采集时间
-                                    user_info['profile_url'] = author_profile_url  # 添加个人主页链接
-
-                            try:
-                                # 检查是否成功获取到用户信息（判断user_info是否包含有效数据）
-                                if isinstance(user_info, dict) and user_info.get('nickname'):
-                                    logger.info(f"保存用户信息成功: {user_info}")
-                                    logger.info(f"account_id:{account_id}")
-                                    # 同步到本地数据库
-                                    # save_userinfo_data(app_name, user_info, ip_port_dir, account_id, collect_date,
-                                    #                    author_profile_url)
-                                    # 同步到远程数据库
-                                    sync_user_info_to_remote([user_info], app_name, ip_port_dir, account_id)
-                                else:
-                                    logger.error(f"获取用户信息失败: {author_profile_url}")
-                            except Exception as e:
-                                logger.error(f"处理用户信息失败: {author_profile_url}, 错误: {e}")
-                            logger.info(f"\n====处理微博用户信息完成====\n")
-                        # 处理小红书用户信息文件 (profile_url.json)
-                        if filename == "profile_url.json" and app_name == "xhs":
-                            logger.info(f"\n====开始处理小红书用户信息====\n{file_path}")
-                            # 同步到本地数据库
-                            user_info = {}
-                            # 如果文件名是profile_url.json 则读取文件
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                profile_data = json.load(f)
-                                if isinstance(profile_data, dict):
-                                    author_profile_url = profile_data.get("user_profile_url", "")
-                                    user_info['nickname'] = profile_data.get('nickname', '')
-                                    user_info['follows'] = convert_chinese_numbers(
-                                        profile_data.get('following_count', ''))
-                                    user_info['fans'] = convert_chinese_numbers(profile_data.get('fans', ''))
-                                    user_info['interaction'] = convert_chinese_numbers(
-                                        profile_data.get('likes_collect_count', ''))  # 获赞与收藏
-                                    user_info['collect_time'] = collect_date  # 添加采集时间
-                                    user_info['profile_url'] = author_profile_url  # 添加个人主页链接
-
-                            try:
-                                # 检查是否成功获取到用户信息（判断user_info是否包含有效数据）
-                                if isinstance(user_info, dict) and user_info.get('nickname'):
-                                    logger.info(f"保存用户信息成功: {user_info}")
-                                    # 同步到本地数据库
-                                    # save_userinfo_data(app_name, user_info, ip_port_dir, account_id, collect_date,
-                                    #                    author_profile_url)
-                                    # 同步到远程数据库
-                                    sync_user_info_to_remote([user_info], app_name, ip_port_dir, account_id)
-                                else:
-                                    logger.error(f"获取用户信息失败: {author_profile_url}")
-                            except Exception as e:
-                                logger.error(f"处理用户信息失败: {author_profile_url}, 错误: {e}")
-                            logger.info(f"\n====处理小红书用户信息完成====\n")
-                        elif filename.endswith('.png') and app_name in ("xhs"):
-                            logger.info(f"\n====开始处理小红书图片====\n{file_path}")
-                            tag, post_title = os.path.basename(filename).replace(".png", "").split('#')
-                            json_filename = f"{post_title}.json"
-                            json_file_path = os.path.join(root, json_filename)
-                            logger.info(f"处理文件: {json_file_path}")
-                            note_link = ""
-                            if os.path.exists(json_file_path):
-                                try:
-                                    with open(json_file_path, 'r', encoding='utf-8') as f:
-                                        json_data = json.load(f)
-                                        note_link = json_data.get("note_link", "")
-                                        # post_content = json_data.get("post_content", "")
-                                        # clean_title = json_data.get("clean_title", "")
-                                except Exception as e:
-                                    logger.error(f"读取JSON文件失败: {json_file_path}, 错误: {e}")
-                            else:
-                                logger.warning(f"JSON文件不存在: {json_file_path}")
-
-                            logger.info(f"处理图片: {filename}, 日期: {date_dir}, 设备: {ip_port_dir}")
-
-                            # 查找tag文件夹中的所有蒙版文件
-                            mask_folder = os.path.join(root_dir, "mask", app_name, hard_ware, tag)
-                            logger.info(f"蒙版文件夹: {mask_folder}")
-                            mask_files = []
-
-                            if os.path.exists(mask_folder) and os.path.isdir(mask_folder):
-                                # 获取文件夹内所有png文件
-                                for file in os.listdir(mask_folder):
-                                    if file.lower().endswith('.png'):
-                                        mask_files.append(file)
-                                mask_files.sort()  # 排序确保处理顺序一致性
-
-                            # 依次尝试每个蒙版文件
-                            ocr_success = False
-                            for mask_file in mask_files:
-                                try:
-                                    mask_path = os.path.join(mask_folder, mask_file)
-                                    logger.info(f"使用蒙版: {mask_file}")
-                                    # 读取原图和蒙版图
-                                    original_img = imread_with_pil(file_path)
-                                    mask_img = imread_with_pil(mask_path)  # 读取带Alpha通道的蒙版图
-
-                                    # 检查原图是否有效
-                                    if original_img is None:
-                                        logger.error(f"原图加载失败: {file_path}")
-                                        continue
-
-                                    # 检查蒙版图是否有效
-                                    if mask_img is None:
-                                        logger.error(f"蒙版图加载失败: {mask_path}")
-                                        continue
-
-                                    # 确保蒙版图与原图尺寸一致
-                                    if original_img.shape[:2] != mask_img.shape[:2]:
-                                        logger.warning(
-                                            f"蒙版图尺寸不匹配: {mask_img.shape[:2]} vs {original_img.shape[:2]}")
-                                        continue
-
-                                    # 使用蒙版图合成新图片（保留蒙版区域，其他区域变黑）
-                                    alpha = mask_img[:, :, 3] / 255.0  # 提取Alpha通道并归一化
-                                    result_img = original_img * alpha[:, :, np.newaxis]  # 应用Alpha混合
-                                    result_img = result_img.astype(np.uint8)
-
-                                    # 将结果保存为临时文件
-                                    temp_output_path = os.path.join(root_dir, "tmp", "temp_ocr_input.png")
-                                    # temp_output_path = os.path.join(root_dir, r"tmp", f"{time.time()}.png")
-                                    # 放大
-                                    # result_img = upscale_image(result_img, scale_factor=2)
-                                    # result_img = enhance_image(result_img, alpha=1, beta=20)  # 增加对比度和亮度
-                                    cv2.imwrite(temp_output_path, result_img, [cv2.IMWRITE_PNG_COMPRESSION, 1])
-
-                                    # 等待文件写入完成并验证
-                                    timeout = 5  # 超时时间（秒）
-                                    start_time = time.time()
-                                    while not os.path.exists(temp_output_path):
-                                        if time.time() - start_time > timeout:
-                                            logger.error(f"文件写入超时: {temp_output_path}")
-                                            break
-                                        time.sleep(0.1)
-
-                                    # 验证文件是否写入成功
-                                    if os.path.exists(temp_output_path):
-                                        file_size = os.path.getsize(temp_output_path)
-                                        if file_size > 0:
-                                            logger.info(f"临时文件保存完成，大小: {file_size} bytes")
-                                        else:
-                                            logger.warning(f"临时文件写入完成但大小为0: {temp_output_path}")
-                                    else:
-                                        logger.error(f"临时文件保存失败: {temp_output_path}")
-
-                                    # 从配置文件中获取index_mapping_data
-                                    index_mapping_data = []
-                                    if config.has_section('tags') and config.has_option('tags', tag):
-                                        index_mapping_data_str = config.get('tags', tag)
-                                        index_mapping_data = [item.strip() for item in
-                                                              index_mapping_data_str.split(',')]
-                                    # 执行 OCR 识别
-                                    # 使用快速的蒙版识别方式，使用VLM OCR方式
-                                    logger.info(f"正在处理: {filename}")
-
-                                    if ocr_engine == "PaddleOCR":
-                                        getObj = ocr.run(temp_output_path)
-                                        # print(getObj)
-                                        if not getObj["code"] == 100:
-                                            logger.info(f"OCR识别结果: {getObj}")
-                                            logger.error(
-                                                f"使用蒙版文件{mask_path},OCR识别失败: 请检查{file_path},是否为空白图片")
-                                            continue
-                                        # sorted_lines = getObj["data"]
-                                        # 这里也增加从左到右 从上到下的排序功能
-                                        # print("排序前:", getObj["data"])
-                                        sorted_lines = sort_text_lines_by_paddle_position(getObj["data"])
-                                    # surya ocr
-                                    # else:
-                                    #     # 执行OCR
-                                    #     img = Image.open(temp_output_path)
-                                    #     img_pred = ocr(img, with_bboxes=True)
-                                    #     sorted_lines = sort_text_lines_by_surya_position(img_pred.text_lines)
-
-                                    ocr_texts = []
-                                    for line in sorted_lines:
-                                        if ocr_engine == "PaddleOCR":
-                                            text = str(line['text'])
-                                        else:
-                                            text = line.text
-                                        if not filename.startswith("note_traffic_analysis"):
-                                            text = re.sub(r'[\u4e00-\u9fff]+', '', text)
-                                        text = (text.replace('秒', '')
-                                                .replace(' ', '')
-                                                .replace('o', '0')
-                                                .replace('<b>', '')
-                                                .replace('</b>', ''))
-                                        if text:
-                                            ocr_texts.append(text)
-                                    logger.info(f"OCR识别结果：{ocr_texts}")
-                                    if filename.startswith("note_traffic_analysis"):
-                                        if len(ocr_texts) == 8:
-                                            # 使用分隔符连接
-                                            ocr_texts = ['|'.join([f"{ocr_texts[i]}:{ocr_texts[i + 1]}"
-                                                                   for i in range(0, len(ocr_texts), 2)])]
-                                            logger.info(f"流量分析结果：{ocr_texts}")
-                                        else:
-                                            ocr_texts = []
-                                    if len(ocr_texts) != len(index_mapping_data):
-                                        logger.warning(
-                                            f"{filename}：识别到的数据个数不匹配，尝试使用蒙版库中其余蒙版")
-                                        # logger.info(f"{index_mapping_data}")
-                                        continue
-                                    ocr_success = True
-                                    logger.info(f"使用蒙版库中蒙版 {mask_file} OCR识别成功")
-                                    break
-
-                                except Exception as e:
-                                    logger.warning(f"使用蒙版文件 {mask_file} 处理失败: {e}")
-                                    continue
-
-                            if not ocr_success:
-                                logger.error(f"使用蒙版库中，所有蒙版，最后还是识别失败: {filename}")
-                                continue
-
-                            # 保存数据到数据库
-                            tag = re.sub(r'\d+', '', tag)
-                            # if note_link:
-                            if 'video' in tag:
-                                content_type = "视频"
-                            else:
-                                content_type = "图文"
-
-                            save_ocr_data(tag, post_title, note_link, content_type, ocr_texts, index_mapping_data,
-                                          collect_date,
-                                          ip_port_dir,
-                                          account_id, app_name)
-                        elif filename.endswith('.png') and app_name in ("tiktok"):
-                            logger.info(f"\n====开始处理tiktok图片====\n{file_path}")
-                            tag, note_link = os.path.basename(filename).replace(".png", "").split('#')
-                            # 查找tag文件夹中的所有蒙版文件
-                            mask_folder = os.path.join(root_dir, "mask", app_name, hard_ware, tag)
-                            logger.info(f"蒙版文件夹: {mask_folder}")
-                            mask_files = []
-
-                            if os.path.exists(mask_folder) and os.path.isdir(mask_folder):
-                                # 获取文件夹内所有png文件
-                                for file in os.listdir(mask_folder):
-                                    if file.lower().endswith('.png'):
-                                        mask_files.append(file)
-                                mask_files.sort()  # 排序确保处理顺序一致性
-                                # 依次尝试每个蒙版文件
-                                ocr_success = False
-                                for mask_file in mask_files:
-                                    try:
-                                        mask_path = os.path.join(mask_folder, mask_file)
-                                        logger.info(f"使用蒙版: {mask_file}")
-                                        # 读取原图和蒙版图
-                                        original_img = imread_with_pil(file_path)
-                                        mask_img = imread_with_pil(mask_path)  # 读取带Alpha通道的蒙版图
-
-                                        # 检查原图是否有效
-                                        if original_img is None:
-                                            logger.error(f"原图加载失败: {file_path}")
-                                            continue
-
-                                        # 检查蒙版图是否有效
-                                        if mask_img is None:
-                                            logger.error(f"蒙版图加载失败: {mask_path}")
-                                            continue
-
-                                        # 确保蒙版图与原图尺寸一致
-                                        if original_img.shape[:2] != mask_img.shape[:2]:
-                                            logger.warning(
-                                                f"蒙版图尺寸不匹配: {mask_img.shape[:2]} vs {original_img.shape[:2]}")
-                                            continue
-
-                                        # 使用蒙版图合成新图片（保留蒙版区域，其他区域变黑）
-                                        alpha = mask_img[:, :, 3] / 255.0  # 提取Alpha通道并归一化
-                                        result_img = original_img * alpha[:, :, np.newaxis]  # 应用Alpha混合
-                                        result_img = result_img.astype(np.uint8)
-
-                                        # 将结果保存为临时文件
-                                        temp_output_path = os.path.join(root_dir, "tmp", "temp_ocr_input.png")
-                                        # temp_output_path = os.path.join(root_dir, r"tmp", f"{time.time()}.png")
-                                        # 放大
-                                        # result_img = upscale_image(result_img, scale_factor=2)
-                                        # result_img = enhance_image(result_img, alpha=1, beta=20)  # 增加对比度和亮度
-                                        cv2.imwrite(temp_output_path, result_img, [cv2.IMWRITE_PNG_COMPRESSION, 1])
-
-                                        # 等待文件写入完成并验证
-                                        timeout = 5  # 超时时间（秒）
-                                        start_time = time.time()
-                                        while not os.path.exists(temp_output_path):
-                                            if time.time() - start_time > timeout:
-                                                logger.error(f"文件写入超时: {temp_output_path}")
-                                                break
-                                            time.sleep(0.1)
-
-                                        # 验证文件是否写入成功
-                                        if os.path.exists(temp_output_path):
-                                            file_size = os.path.getsize(temp_output_path)
-                                            if file_size > 0:
-                                                logger.info(f"临时文件保存完成，大小: {file_size} bytes")
-                                            else:
-                                                logger.warning(f"临时文件写入完成但大小为0: {temp_output_path}")
-                                        else:
-                                            logger.error(f"临时文件保存失败: {temp_output_path}")
-
-                                        # 从配置文件中获取index_mapping_data
-                                        index_mapping_data = []
-                                        if config.has_section('tags') and config.has_option('tags', tag):
-                                            index_mapping_data_str = config.get('tags', tag)
-                                            index_mapping_data = [item.strip() for item in
-                                                                  index_mapping_data_str.split(',')]
-                                        # 执行 OCR 识别
-                                        # 使用快速的蒙版识别方式，使用VLM OCR方式
-                                        logger.info(f"正在处理: {filename}")
-
-                                        if ocr_engine == "PaddleOCR":
-                                            getObj = ocr.run(temp_output_path)
-                                            # print(getObj)
-                                            if not getObj["code"] == 100:
-                                                logger.info(f"OCR识别结果: {getObj}")
-                                                logger.error(
-                                                    f"使用蒙版文件{mask_path},OCR识别失败: 请检查{file_path},是否为空白图片")
-                                                continue
-                                            # sorted_lines = getObj["data"]
-                                            # 这里也增加从左到右 从上到下的排序功能
-                                            # print("排序前:", getObj["data"])
-                                            sorted_lines = sort_text_lines_by_paddle_position(getObj["data"])
-                                        # surya ocr
-                                        # else:
-                                        #     # 执行OCR
-                                        #     img = Image.open(temp_output_path)
-                                        #     img_pred = ocr(img, with_bboxes=True)
-                                        #     sorted_lines = sort_text_lines_by_surya_position(img_pred.text_lines)
-
-                                        ocr_texts = []
-                                        for line in sorted_lines:
-                                            if ocr_engine == "PaddleOCR":
-                                                text = str(line['text'])
-                                            else:
-                                                text = line.text
-                                            text = (text.replace('秒', '')
-                                                    .replace('s', '')
-                                                    .replace(' ', '')
-                                                    .replace('o', '0')
-                                                    .replace('<b>', '')
-                                                    .replace('</b>', ''))
-                                            if text:
-                                                ocr_texts.append(text)
-                                        logger.info(f"OCR识别结果：{ocr_texts}")
-                                        if len(ocr_texts) != len(index_mapping_data):
-                                            logger.warning(
-                                                f"{filename}：识别到的数据个数不匹配，尝试使用蒙版库中其余蒙版")
-                                            # logger.info(f"{index_mapping_data}")
-                                            continue
-                                        ocr_success = True
-                                        logger.info(f"使用蒙版库中蒙版 {mask_file} OCR识别成功")
-                                        break
-
-                                    except Exception as e:
-                                        logger.warning(f"使用蒙版文件 {mask_file} 处理失败: {e}")
-                                        continue
-
-                                if not ocr_success:
-                                    logger.error(f"使用蒙版库中，所有蒙版，最后还是识别失败: {filename}")
-                                    continue
-                                note_link = note_link.replace('*', "/")
-
-                                save_ocr_data(tag, '', note_link, "tiktok视频", ocr_texts, index_mapping_data,
-                                              collect_date,
-                                              ip_port_dir,
-                                              account_id, app_name)
+                            completed = True
+                    finally:
+                        if shards is not None:
+                            shards.release(shard_key, done=completed)
+
+    logger.info(f"本轮识别截图 {ledger.claimed_count} 张，已完成或已隔离跳过 {ledger.skipped_count} 张，"
+                f"台账状态: {ledger.status_counts()}")
+    ledger.close()
+    if shards is not None:
+        shards.close()
+    # 批量同步本轮有变化的用户信息
+    user_info_batch.flush()
+    user_info_batch.close()
+    # 等待调试叠加图写完
+    overlay_writer.flush()
+    maybe_write_textfile(force=True)
 
 
 # 结束 OCR 引擎
@@ -658,6 +732,9 @@ def process_images():
 
 
 def imread_with_pil(path):
+    import cv2
+    import numpy as np
+    from PIL import Image
     try:
         pil_image = Image.open(path)
         # 转换为OpenCV格式
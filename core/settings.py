@@ -0,0 +1,204 @@
+"""
+config.ini 的编译结果
+
+config.ini 只解析一次，编译为不可变的 AppConfig，core 与 db 共用：
+- 标签 -> 字段元组、中文字段 -> 英文列名、字段类型
+- 排版解析器、文本清洗、打分、调试叠加图各段的设置
+- 蒙版文件夹的 png 列表（按目录修改时间缓存）
+
+定时任务 / 监听模式下循环调用 reload_config_if_changed()：config.ini 修改后重新编译并整体替换，
+编译失败时继续使用旧配置。正在识别的截图使用开始时取到的配置，不会读到一半新一半旧的设置。
+"""
+
+import configparser
+import os
+import threading
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+
+from core.logger import logger
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(root_dir, 'config.ini')
+
+
+@dataclass(frozen=True)
+class NormalizeSettings:
+    """[normalize] 段：OCR 文本清洗规则（见 core/normalize.py）"""
+    strip_cjk_apps: tuple = ()
+    keep_cjk_tags: tuple = ()
+    remove_chars: tuple = ()  # ((应用, 额外删除的字符), ...)
+
+    def app_remove_chars(self, app_name):
+        return dict(self.remove_chars).get(app_name, '')
+
+
+@dataclass(frozen=True)
+class ScoringSettings:
+    """[scoring] 段：识别结果打分（见 core/mask_scoring.py）"""
+    accept_score: float = 0.85
+    max_missing_fields: int = 0
+
+
+@dataclass(frozen=True)
+class OverlaySettings:
+    """[debug_overlay] 段：调试叠加图（见 core/debug_overlay.py）"""
+    mode: str = 'off'
+    sample_rate: float = 0.0
+    max_size: int = 1280
+    max_pending: int = 16
+    output_dir: str = os.path.join(root_dir, 'logs', 'debug_overlay')
+
+
+@dataclass(frozen=True, eq=False)
+class AppConfig:
+    """
+    编译后的 config.ini（不可变）
+
+    按对象本身比较与哈希，可作为缓存键：配置重新加载后是新对象，旧缓存自然失效
+    """
+    path: str
+    mtime: float
+    tag_fields: MappingProxyType  # {标签: (字段, ...)}
+    field_mapping: MappingProxyType  # {中文字段: 英文列名}
+    field_types: MappingProxyType  # {字段: count / percent / duration}
+    parsers: MappingProxyType  # {标签: 排版解析器}
+    default_parser: str = None
+    normalize: NormalizeSettings = NormalizeSettings()
+    scoring: ScoringSettings = ScoringSettings()
+    debug_overlay: OverlaySettings = OverlaySettings()
+
+    def get_tag_fields(self, tag):
+        """标签对应的字段元组，未配置时为空元组"""
+        return self.tag_fields.get(tag, ())
+
+
+def _split(value):
+    return tuple(item.strip() for item in value.split(',') if item.strip())
+
+
+def load_config(path=CONFIG_PATH):
+    """
+    读取并编译 config.ini
+    """
+    mtime = os.path.getmtime(path)
+    parser = configparser.ConfigParser()
+    with open(path, encoding='utf-8') as f:
+        parser.read_file(f)
+
+    tag_fields = {tag: _split(value) for tag, value in parser.items('tags')} if parser.has_section('tags') else {}
+
+    field_mapping = {}
+    for section in parser.sections():
+        if section.startswith('fields'):
+            for key, value in parser.items(section):
+                field_mapping[value] = key  # 中文 -> 英文
+
+    field_types = dict(parser.items('field_types')) if parser.has_section('field_types') else {}
+
+    parsers = dict(parser.items('parsers')) if parser.has_section('parsers') else {}
+    default_parser = parsers.pop('default', None)
+
+    remove_chars = []
+    if parser.has_section('normalize'):
+        for key, value in parser.items('normalize'):
+            if key.endswith('_remove_chars'):
+                remove_chars.append((key[:-len('_remove_chars')], value.strip()))
+    normalize = NormalizeSettings(
+        strip_cjk_apps=_split(parser.get('normalize', 'strip_cjk_apps', fallback='')),
+        keep_cjk_tags=_split(parser.get('normalize', 'keep_cjk_tags', fallback='')),
+        remove_chars=tuple(remove_chars),
+    )
+
+    scoring = ScoringSettings(
+        accept_score=parser.getfloat('scoring', 'accept_score', fallback=0.85),
+        max_missing_fields=parser.getint('scoring', 'max_missing_fields', fallback=0),
+    )
+
+    debug_overlay = OverlaySettings(
+        mode=parser.get('debug_overlay', 'mode', fallback='off').strip().lower(),
+        sample_rate=parser.getfloat('debug_overlay', 'sample_rate', fallback=0.0),
+        max_size=parser.getint('debug_overlay', 'max_size', fallback=1280),
+        max_pending=parser.getint('debug_overlay', 'max_pending', fallback=16),
+        output_dir=os.path.join(root_dir, parser.get('debug_overlay', 'output_dir', fallback='logs/debug_overlay')),
+    )
+
+    return AppConfig(
+        path=path,
+        mtime=mtime,
+        tag_fields=MappingProxyType(tag_fields),
+        field_mapping=MappingProxyType(field_mapping),
+        field_types=MappingProxyType(field_types),
+        parsers=MappingProxyType(parsers),
+        default_parser=default_parser,
+        normalize=normalize,
+        scoring=scoring,
+        debug_overlay=debug_overlay,
+    )
+
+
+_config = None
+_lock = threading.Lock()
+
+
+def get_config():
+    """
+    获取当前配置（首次调用时加载）
+    """
+    global _config
+    if _config is None:
+        with _lock:
+            if _config is None:
+                _config = load_config()
+    return _config
+
+
+def reload_config_if_changed():
+    """
+    config.ini 修改时间变化时重新加载
+
+    :return: 是否重新加载了配置
+    """
+    global _config
+    current = get_config()
+    try:
+        mtime = os.path.getmtime(current.path)
+    except OSError as e:
+        logger.warning(f"无法读取配置文件修改时间: {current.path}, 错误: {e}")
+        return False
+    if mtime == current.mtime:
+        return False
+    with _lock:
+        if _config is not current:
+            return False
+        try:
+            _config = load_config(current.path)
+        except Exception as e:
+            logger.error(f"配置文件重新加载失败，继续使用旧配置: {e}")
+            # 记录本次修改时间，文件再次修改前不重复尝试
+            _config = replace(current, mtime=mtime)
+            return False
+    logger.info(f"配置文件已重新加载: {current.path}")
+    return True
+
+
+# 蒙版文件夹 png 列表缓存 {文件夹: (目录修改时间, (文件名, ...))}
+_mask_listings = {}
+
+
+def list_mask_files(mask_folder):
+    """
+    获取蒙版文件夹内所有 png 蒙版（排序，确保处理顺序一致）
+
+    按目录修改时间缓存，蒙版增删后自动重新列出
+    """
+    try:
+        mtime = os.stat(mask_folder).st_mtime_ns
+    except OSError:
+        return ()
+    cached = _mask_listings.get(mask_folder)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    files = tuple(sorted(file for file in os.listdir(mask_folder) if file.lower().endswith('.png')))
+    _mask_listings[mask_folder] = (mtime, files)
+    return files
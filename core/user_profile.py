@@ -1,70 +1,253 @@
+"""
+小红书用户主页资料抓取
+
+ProfileFetcher 在整个批次中只启动一个浏览器，复用有限个 context（cookie 只注入一次），
+通过信号量 + asyncio.gather 并发抓取多个主页：
+- 等待页面上的 window.__INITIAL_STATE__ 用户数据就绪，而不是固定等待 10 秒
+- 抓取结果按 (日期, 主页地址) 缓存：同一天内重复抓取同一主页直接返回缓存，
+  缓存同时写入 tmp/profile_cache_<日期>.json，进程重启后当天仍然有效
+
+示例：
+    async with ProfileFetcher(max_contexts=3) as fetcher:
+        results = await fetcher.fetch_many(urls)
+
+本地静态页面的演示见 test/demo/profile_fetcher_demo.py。
+"""
+
 import asyncio
+import json
 import os
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urlsplit
 
 from core.logger import logger
 from dotenv import load_dotenv
+
 # 加载环境变量
 load_dotenv()
-async def get_user_profile_data(author_profile_url):
-    from playwright.async_api import async_playwright
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,  # 保持headless模式
-            args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage']
-        )
-        context = await browser.new_context()
-        # 从环境变量中获取cookie
-        cookie_str = os.getenv("COOKIE_STRING")
-        if cookie_str:
-            # 解析 cookie 字符串为字典
-            cookies_dict = {}
-            for cookie in cookie_str.split('; '):
-                key, value = cookie.split('=', 1)
-                cookies_dict[key] = value
-
-            # 转换为 cookie 对象数组
-            cookies = [
-                {"name": name, "value": value, "domain": ".xiaohongshu.com", "path": "/"}
-                for name, value in cookies_dict.items()
-            ]
-            await context.add_cookies(cookies)
-        # 使用 context 变量，例如创建页面
-        page = await context.new_page()
-        # 这里可以添加获取用户资料的具体逻辑
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 同时打开的浏览器 context 数量（即最大并发数）
+PROFILE_MAX_CONTEXTS = int(os.getenv("PROFILE_MAX_CONTEXTS", "3"))
+# 页面打开与等待用户数据的超时时间（毫秒）
+PROFILE_TIMEOUT_MS = int(os.getenv("PROFILE_TIMEOUT_MS", "30000"))
+
+BROWSER_ARGS = ['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage']
+USER_DATA_SCRIPT = '() => window.__INITIAL_STATE__?.user?.userPageData?._rawValue'
+USER_DATA_READY_SCRIPT = '() => !!window.__INITIAL_STATE__?.user?.userPageData?._rawValue?.basicInfo'
+
+
+@lru_cache(maxsize=None)
+def parse_cookie_string(cookie_str, domain=".xiaohongshu.com"):
+    """
+    将 COOKIE_STRING（"k1=v1; k2=v2"）解析为 Playwright cookie 对象列表（按参数缓存）
+    """
+    cookies = []
+    for cookie in cookie_str.split('; '):
+        if '=' not in cookie:
+            continue
+        key, value = cookie.split('=', 1)
+        cookies.append({"name": key, "value": value, "domain": domain, "path": "/"})
+    return tuple(cookies)
+
+
+def parse_user_page_data(user_data):
+    """
+    从 __INITIAL_STATE__.user.userPageData 中提取用户信息，无数据时返回空字典
+    """
+    user_info = {}
+    if user_data:
+        basicInfo = user_data.get('basicInfo', {})
+        # 提取用户信息
+        user_info['desc'] = basicInfo.get('desc', '')
+        user_info['images'] = basicInfo.get('images', '')
+        user_info['nickname'] = basicInfo.get('nickname', '')
+        user_info['red_id'] = basicInfo.get('redId', '')
+
+        # 提取互动数据
+        interactions = user_data.get('interactions', [])
+        user_info['follows'] = next(
+            (item['count'] for item in interactions if item['type'] == 'follows'), 0)
+        user_info['fans'] = next((item['count'] for item in interactions if item['type'] == 'fans'), 0)
+        user_info['interaction'] = next(
+            (item['count'] for item in interactions if item['type'] == 'interaction'), 0)
+    return user_info
+
+
+def profile_cache_key(url):
+    """缓存键：去掉查询参数（xsec_token、分享参数等每次都不同）的主页地址"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class ProfileCache:
+    """按天缓存用户资料，内存 + JSON 文件"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.path.join(root_dir, "tmp")
+        self.date = None
+        self.entries = {}
+
+    def _path(self):
+        return os.path.join(self.cache_dir, f"profile_cache_{self.date}.json")
+
+    def _roll_date(self):
+        today = datetime.now().strftime('%Y%m%d')
+        if today == self.date:
+            return
+        # 跨天后重新加载当天的缓存
+        self.date = today
+        self.entries = {}
         try:
-            await page.goto(author_profile_url, timeout=30000)
-            await page.wait_for_timeout(10000)
-
-            # 获取用户基本信息
-            user_data = await page.evaluate('() => window.__INITIAL_STATE__?.user.userPageData._rawValue')
-            user_info = {}
-            # if not user_data or len(user_data) == 0 or not user_data['basicInfo'] or user_data[
-            #     'basicInfo'] == {}:
-            if user_data:
-                basicInfo = user_data.get('basicInfo', {})
-                # 提取用户信息
-                user_info['desc'] = basicInfo.get('desc', '')
-                user_info['images'] = basicInfo.get('images', '')
-                user_info['nickname'] = basicInfo.get('nickname', '')
-                user_info['red_id'] = basicInfo.get('redId', '')
-
-                # 提取互动数据
-                interactions = user_data.get('interactions', [])
-                user_info['follows'] = next(
-                    (item['count'] for item in interactions if item['type'] == 'follows'), 0)
-                user_info['fans'] = next((item['count'] for item in interactions if item['type'] == 'fans'), 0)
-                user_info['interaction'] = next(
-                    (item['count'] for item in interactions if item['type'] == 'interaction'), 0)
+            with open(self._path(), 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
         except Exception as e:
-            logger.info(f"处理页面时出错: {author_profile_url}, 错误: {str(e)}")
+            logger.warning(f"读取用户资料缓存失败: {self._path()}, 错误: {e}")
 
-        await browser.close()
+    def get(self, url):
+        self._roll_date()
+        return self.entries.get(profile_cache_key(url))
 
-        # 函数结束时返回需要的数据
-        # 注意：使用 async with 时，browser 会自动关闭
+    def put(self, url, user_info):
+        self._roll_date()
+        self.entries[profile_cache_key(url)] = user_info
+
+    def save(self):
+        if self.date is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._path(), 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"保存用户资料缓存失败: {self._path()}, 错误: {e}")
+
+
+class ProfileFetcher:
+    """
+    复用同一个浏览器与有限个 context 并发抓取用户主页资料
+    """
+
+    def __init__(self, max_contexts=PROFILE_MAX_CONTEXTS, cookie_str=None, timeout=PROFILE_TIMEOUT_MS,
+                 cache=None, use_cache=True):
+        """
+        :param max_contexts: 浏览器 context 数量上限，即最大并发数
+        :param cookie_str: cookie 字符串，默认读取环境变量 COOKIE_STRING
+        :param timeout: 打开页面与等待用户数据的超时时间（毫秒）
+        :param cache: ProfileCache 实例，默认缓存到 tmp/ 目录
+        :param use_cache: 为 False 时不读写缓存
+        """
+        self.max_contexts = max(1, max_contexts)
+        self.cookie_str = cookie_str if cookie_str is not None else os.getenv("COOKIE_STRING")
+        self.timeout = timeout
+        self.cache = (cache or ProfileCache()) if use_cache else None
+        self._playwright = None
+        self._browser = None
+        self._semaphore = None
+        # 并发的 fetch 各自调用 start()，启动浏览器期间会让出事件循环，加锁保证只启动一个浏览器
+        self._start_lock = asyncio.Lock()
+        self._idle_contexts = []  # 空闲的 context，用完放回
+        self._contexts = []  # 已创建的全部 context，关闭时释放
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """启动浏览器（整个批次只启动一次）"""
+        async with self._start_lock:
+            if self._browser is not None:
+                return
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+            self._semaphore = asyncio.Semaphore(self.max_contexts)
+            logger.info(f"用户资料抓取浏览器已启动，最大并发数: {self.max_contexts}")
+
+    async def close(self):
+        """关闭所有 context 与浏览器，并保存缓存"""
+        for context in self._contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        self._contexts = []
+        self._idle_contexts = []
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        if self.cache is not None:
+            self.cache.save()
+
+    async def _acquire_context(self):
+        if self._idle_contexts:
+            return self._idle_contexts.pop()
+        context = await self._browser.new_context()
+        if self.cookie_str:
+            await context.add_cookies(list(parse_cookie_string(self.cookie_str)))
+        self._contexts.append(context)
+        return context
+
+    async def fetch(self, author_profile_url):
+        """
+        抓取单个用户主页资料，失败时返回空字典
+        """
+        if self.cache is not None:
+            cached = self.cache.get(author_profile_url)
+            if cached:
+                logger.info(f"使用当天缓存的用户资料: {author_profile_url}")
+                return cached
+
+        await self.start()
+        user_info = {}
+        async with self._semaphore:
+            context = await self._acquire_context()
+            page = await context.new_page()
+            try:
+                await page.goto(author_profile_url, timeout=self.timeout, wait_until="domcontentloaded")
+                # 等待用户数据就绪
+                await page.wait_for_function(USER_DATA_READY_SCRIPT, timeout=self.timeout)
+                user_data = await page.evaluate(USER_DATA_SCRIPT)
+                user_info = parse_user_page_data(user_data)
+            except Exception as e:
+                logger.info(f"处理页面时出错: {author_profile_url}, 错误: {str(e)}")
+            finally:
+                await page.close()
+                self._idle_contexts.append(context)
+
+        if user_info and self.cache is not None:
+            self.cache.put(author_profile_url, user_info)
         return user_info
 
-if  __name__  == '__main__':
+    async def fetch_many(self, urls):
+        """
+        并发抓取多个用户主页资料
+
+        :return: {主页地址: 用户信息}，失败的主页对应空字典
+        """
+        urls = list(dict.fromkeys(urls))  # 去重并保持顺序
+        results = await asyncio.gather(*(self.fetch(url) for url in urls))
+        return dict(zip(urls, results))
+
+
+async def get_user_profile_data(author_profile_url):
+    """
+    抓取单个用户主页资料（兼容旧接口）；批量抓取请使用 ProfileFetcher.fetch_many
+    """
+    async with ProfileFetcher(max_contexts=1) as fetcher:
+        return await fetcher.fetch(author_profile_url)
+
+
+if __name__ == '__main__':
     url = "https://www.xiaohongshu.com/user/profile/68d8e1c9000000002101f4b8?xsec_token=YBzk7Jd_rvoQ8JmejzaAucR2j8YFJN9xo1pNZ_odqZp8A%3D&xsec_source=app_share&xhsshare=CopyLink&shareRedId=OD5GOEg2R0I2NzUyOTgwNjg0OThKOUhB&apptime=1762920020&share_id=f320b7826926475a8b6fe73510411dd0&share_channel=copy_link"
     user_info = asyncio.run(get_user_profile_data(url))
-    print(user_info)
\ No newline at end of file
+    print(user_info)
@@ -0,0 +1,172 @@
+"""
+OCR 目录监听（--mode watch）
+
+监听 OCR_IMAGES_PATH 下新落地的截图与用户信息 JSON，文件停止增长后再交给 OCR 流程：
+- 优先使用 watchdog（Linux 下为 inotify）；未安装 watchdog 时退化为定时扫描最近 N 天的目录
+- 去抖：文件大小与修改时间在 debounce 秒内不再变化才视为写入完成
+- 小红书截图还会等待同名作品 JSON（最多 json_wait 秒），保证能读到作品链接
+"""
+
+import os
+import threading
+import time
+
+from core.logger import logger
+
+# 需要处理的 JSON 文件（截图之外）
+WATCHED_JSON_FILES = ("user_info.json", "profile_url.json", "weibo_data.json")
+
+
+def is_watched_file(path):
+    filename = os.path.basename(path)
+    return filename.endswith('.png') or filename in WATCHED_JSON_FILES
+
+
+def companion_json_path(path):
+    """小红书截图对应的作品 JSON 路径，其它文件返回 None"""
+    filename = os.path.basename(path)
+    if not filename.endswith('.png') or '#' not in filename:
+        return None
+    parts = os.path.normpath(path).split(os.sep)
+    if "xhs" not in parts:
+        return None
+    post_title = filename.replace(".png", "").split('#', 1)[1]
+    return os.path.join(os.path.dirname(path), f"{post_title}.json")
+
+
+class ImageWatcher:
+    """
+    收集新文件并在写入完成后返回
+
+    用法：
+        watcher = ImageWatcher(ocr_root, recent_dates_func)
+        watcher.start()
+        while True:
+            for path in watcher.pop_ready():
+                ...
+    """
+
+    def __init__(self, path, recent_dates_func, debounce=5, poll_interval=10, json_wait=60):
+        """
+        :param path: 监听的根目录
+        :param recent_dates_func: 返回最近 N 天日期列表的函数，只处理这些日期目录下的文件
+        :param debounce: 文件停止变化多少秒后视为写入完成
+        :param poll_interval: 未安装 watchdog 时的扫描间隔（秒）
+        :param json_wait: 小红书截图等待作品 JSON 的最长时间（秒）
+        """
+        self.path = path
+        self.recent_dates_func = recent_dates_func
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.json_wait = json_wait
+        self._pending = {}  # {路径: [大小, 修改时间, 最近变化时间, 首次发现时间]}
+        self._lock = threading.Lock()
+        self._observer = None
+        self._scanned = {}  # 扫描模式下已见过的文件 {路径: (大小, 修改时间)}
+        self._last_scan = 0
+
+    # ======================= 启动与停止 =====================
+
+    def start(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.warning(f"未安装 watchdog，改为每 {self.poll_interval} 秒扫描一次目录: {self.path}")
+            self._scan(record_only=True)  # 已有文件由启动时的全量处理负责
+            return
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher.touch(event.src_path)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    watcher.touch(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    watcher.touch(event.dest_path)
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.path, recursive=True)
+        self._observer.start()
+        logger.info(f"开始监听目录: {self.path}")
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    # ======================= 文件收集 =====================
+
+    def touch(self, path):
+        """登记一个新建或修改的文件（watchdog 线程与扫描共用）"""
+        if not is_watched_file(path):
+            return
+        now = time.time()
+        with self._lock:
+            entry = self._pending.get(path)
+            if entry is None:
+                self._pending[path] = [None, None, now, now]
+            else:
+                entry[2] = now
+
+    def _scan(self, record_only=False):
+        """扫描最近 N 天的日期目录，登记新增或变化的文件"""
+        recent_dates = set(self.recent_dates_func())
+        for root, dirs, files in os.walk(self.path):
+            # 跳过非最近 N 天的日期目录（YYYYMMDD）
+            dirs[:] = [d for d in dirs if not (len(d) == 8 and d.isdigit()) or d in recent_dates]
+            for filename in files:
+                path = os.path.join(root, filename)
+                if not is_watched_file(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime)
+                if self._scanned.get(path) != signature:
+                    self._scanned[path] = signature
+                    if not record_only:
+                        self.touch(path)
+        self._last_scan = time.time()
+
+    def pop_ready(self):
+        """
+        返回已写入完成的文件路径列表（按发现顺序），并将其移出待处理集合
+        """
+        if self._observer is None and time.time() - self._last_scan >= self.poll_interval:
+            self._scan()
+
+        now = time.time()
+        ready = []
+        with self._lock:
+            for path, entry in list(self._pending.items()):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # 文件已删除或被移走
+                    del self._pending[path]
+                    continue
+                if (stat.st_size, stat.st_mtime) != (entry[0], entry[1]):
+                    entry[0], entry[1], entry[2] = stat.st_size, stat.st_mtime, now
+                    continue
+                if stat.st_size == 0 or now - entry[2] < self.debounce:
+                    continue
+                json_path = companion_json_path(path)
+                if json_path and not os.path.exists(json_path) and now - entry[3] < self.json_wait:
+                    continue
+                ready.append((entry[3], path))
+                del self._pending[path]
+        return [path for _, path in sorted(ready)]
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
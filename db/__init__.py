@@ -14,15 +14,25 @@ XHS OCR 数据库处理模块
 - run_partial_pipeline: 运行部分数据处理流水线
 """
 
+import json
 import sqlite3
 import os
 from typing import List
 
+from core.metrics import SQLITE_COMMIT_SECONDS
+
 # 获取当前文件所在目录
 current_dir = os.path.dirname(os.path.abspath(__file__))
 # 数据库文件路径
 db_path = os.path.join(current_dir, 'ocr_data.db')
 
+# 字段置信度（JSON），仅用于本地排查识别质量，不参与融合与远程同步
+FIELD_CONFIDENCE_COLUMN = "字段置信度"
+LOCAL_ONLY_COLUMNS = (FIELD_CONFIDENCE_COLUMN,)
+
+# 本进程内已建表（并补充过字段置信度列）的 OCR 表，每张表只检查一次
+_prepared_ocr_tables = set()
+
 
 def save_userinfo_data(app_name, user_info, ip_port_dir, account_id, collect_time, author_profile_url):
     conn = sqlite3.connect(db_path)
@@ -66,7 +76,7 @@ def save_userinfo_data(app_name, user_info, ip_port_dir, account_id, collect_tim
 
 def save_ocr_data(tag, post_title: str, note_link: str, content_type: str, ocr_data: List[str], index_mapping_data,
                   date_dir,
-                  ip_port_dir, account_id: str, app_name):
+                  ip_port_dir, account_id: str, app_name, field_confidence=None):
     """
     保存OCR识别数据到数据库
     :param tag: 标签名称
@@ -74,6 +84,7 @@ def save_ocr_data(tag, post_title: str, note_link: str, content_type: str, ocr_d
     :param content_type: 内容类型
     :param ocr_data: OCR识别的数据列表
     :param index_mapping_data: 字段名列表
+    :param field_confidence: 字段置信度 {字段名: 置信度}，写入“字段置信度”列
     """
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
@@ -94,12 +105,20 @@ def save_ocr_data(tag, post_title: str, note_link: str, content_type: str, ocr_d
             "采集日期" DATE,
             "内容类型" TEXT,
             {(' TEXT, '.join(escaped_fields)) + ' TEXT' if escaped_fields else ''},
+            "{FIELD_CONFIDENCE_COLUMN}" TEXT,
             UNIQUE("作品标题", "链接","采集日期")
         )
     '''
 
-    cursor.execute(create_table_sql)
-    conn.commit()
+    table_name = f"s_{app_name}_{tag}_ocr"
+    if table_name not in _prepared_ocr_tables:
+        cursor.execute(create_table_sql)
+        # 旧表补充字段置信度列
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        if FIELD_CONFIDENCE_COLUMN not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table_name} ADD COLUMN "{FIELD_CONFIDENCE_COLUMN}" TEXT')
+        conn.commit()
+        _prepared_ocr_tables.add(table_name)
     if app_name == "xhs":
         source_type = "1894230222988058625"
     elif app_name == "weibo":
@@ -108,16 +127,19 @@ def save_ocr_data(tag, post_title: str, note_link: str, content_type: str, ocr_d
         source_type = "1866687481668411393"
 
     # 使用 INSERT OR IGNORE 语句，当作品标题和OCR采集时间都相同时不插入
-    table_len = len(index_mapping_data) + 7  # 4 是指"设备IP","数据来源","账号ID","作品标题", "截图采集日期","OCR采集时间"（这个4个字段）
+    table_len = len(index_mapping_data) + 8  # 8 是指"设备IP","数据来源","账号ID","作品标题","链接","采集日期","内容类型","字段置信度"
     sql_str = f"""
         INSERT OR IGNORE INTO s_{app_name}_{tag}_ocr (
-            "设备IP","数据来源","账号ID","作品标题", "链接","采集日期","内容类型", {','.join(escaped_fields)}
+            "设备IP","数据来源","账号ID","作品标题", "链接","采集日期","内容类型", {','.join(escaped_fields)},
+            "{FIELD_CONFIDENCE_COLUMN}"
         ) VALUES ({','.join(['?' for _ in range(table_len)])})
     """
     cursor.execute(sql_str, (
         ip_port_dir, source_type, account_id, post_title, note_link, date_dir, content_type,
-        *[ocr_data[i] if len(ocr_data) > i else '' for i in range(len(ocr_data))]
+        *[ocr_data[i] if len(ocr_data) > i else '' for i in range(len(ocr_data))],
+        json.dumps(field_confidence, ensure_ascii=False) if field_confidence else ''
     ))
 
-    conn.commit()
+    with SQLITE_COMMIT_SECONDS.labels("save_ocr_data").time():
+        conn.commit()
     conn.close()
@@ -1,25 +1,12 @@
-import configparser
 import os
 import sqlite3
 from dotenv import load_dotenv
-import pymysql
 from datetime import datetime, timedelta
 from core.logger import logger
+from db import LOCAL_ONLY_COLUMNS
 
 load_dotenv()
 current_dir = os.path.dirname(os.path.abspath(__file__))
-# 加载 config.ini
-config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.ini')
-config = configparser.ConfigParser()
-config.read(config_file, encoding='utf-8')
-
-# 获取字段映射
-FIELD_MAPPING = {}
-for section in config.sections():
-    if section.startswith('fields'):
-        for key, value in config.items(section):
-            FIELD_MAPPING[value] = key  # 中文 -> 英文
-
 
 def sync_explore_data_merge_to_remote(table_name_list=None,
                                       merged_table_name="s_xhs_merged_data_ocr",
@@ -130,7 +117,8 @@ def sync_explore_data_merge_to_remote(table_name_list=None,
                 logger.debug(f"表 {table_name} 总行数: {total_count}")
 
         # 根据融合类型构建数据
-        merged_columns = list(all_columns)
+        # 仅本地保存的列（如字段置信度）不参与融合
+        merged_columns = [col for col in all_columns if col not in LOCAL_ONLY_COLUMNS]
 
         # 记录融合前的信息
         related_key_desc = related_key if isinstance(related_key, str) else ", ".join(related_key) if isinstance(
@@ -1,47 +1,209 @@
-import configparser
+import hashlib
+import json
 import os
+import time
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from functools import lru_cache
 from core.logger import logger
+from core.metrics import MYSQL_ROWS_UPSERTED
+from core.profiler import staged
+from core.settings import get_config
+from db import LOCAL_ONLY_COLUMNS
+from db.mysql_pool import get_mysql_config, get_mysql_pool, is_mysql_configured
 
 load_dotenv()
 current_dir = os.path.dirname(os.path.abspath(__file__))
-# 加载 config.ini
-config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.ini')
-config = configparser.ConfigParser()
-config.read(config_file, encoding='utf-8')
+# 字段映射（中文 -> 英文）取自 config.ini [fields]，见 core/settings.py
 
-# 获取字段映射
-FIELD_MAPPING = {}
-for section in config.sections():
-    if section.startswith('fields'):
-        for key, value in config.items(section):
-            FIELD_MAPPING[value] = key  # 中文 -> 英文
+
+# 本地断点表：记录流式同步已成功写入远程的最大 rowid
+CHECKPOINT_TABLE = "s_sync_checkpoint"
+
+
+def ensure_checkpoint_table(conn):
+    """
+    创建本地同步断点表（如不存在）
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            "本地表" TEXT,
+            "远程表" TEXT,
+            "筛选条件" TEXT,
+            "最后rowid" INTEGER,
+            "已同步行数" INTEGER,
+            "更新时间" TEXT,
+            UNIQUE("本地表", "远程表", "筛选条件")
+        )
+    """)
+    conn.commit()
+
+
+def load_checkpoint(conn, table_name, remote_table_name, filter_key):
+    """
+    读取断点，返回 (最后rowid, 已同步行数)，无断点时返回 (0, 0)
+    """
+    row = conn.execute(
+        f'SELECT "最后rowid", "已同步行数" FROM {CHECKPOINT_TABLE} '
+        f'WHERE "本地表" = ? AND "远程表" = ? AND "筛选条件" = ?',
+        (table_name, remote_table_name, filter_key)).fetchone()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+def save_checkpoint(conn, table_name, remote_table_name, filter_key, last_rowid, synced_count):
+    """
+    保存断点（每块远程提交成功后调用）
+    """
+    conn.execute(
+        f'INSERT INTO {CHECKPOINT_TABLE} ("本地表", "远程表", "筛选条件", "最后rowid", "已同步行数", "更新时间") '
+        f'VALUES (?, ?, ?, ?, ?, ?) '
+        f'ON CONFLICT ("本地表", "远程表", "筛选条件") '
+        f'DO UPDATE SET "最后rowid" = excluded."最后rowid", "已同步行数" = excluded."已同步行数", '
+        f'"更新时间" = excluded."更新时间"',
+        (table_name, remote_table_name, filter_key, last_rowid, synced_count,
+         datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    conn.commit()
+
+
+def clear_checkpoint(conn, table_name, remote_table_name, filter_key):
+    """
+    同步完成后清除断点
+    """
+    conn.execute(
+        f'DELETE FROM {CHECKPOINT_TABLE} WHERE "本地表" = ? AND "远程表" = ? AND "筛选条件" = ?',
+        (table_name, remote_table_name, filter_key))
+    conn.commit()
+
+
+def prune_checkpoints(conn, table_name, remote_table_name, filter_key):
+    """
+    删除同一对表上筛选条件与本次不同的断点（如筛选天数已修改、增量与全量模式切换、旧版本按截止日期记录的断点），
+    这些断点不会再被读取，也不会被 clear_checkpoint 清除
+
+    :return: 删除的条数
+    """
+    cursor = conn.execute(
+        f'DELETE FROM {CHECKPOINT_TABLE} WHERE "本地表" = ? AND "远程表" = ? AND "筛选条件" != ?',
+        (table_name, remote_table_name, filter_key))
+    conn.commit()
+    return cursor.rowcount
+
+
+# 本地同步状态表：记录每个远程唯一键最近一次成功推送的行哈希，用于增量同步
+SYNC_STATE_TABLE = "s_sync_state"
+
+
+def ensure_sync_state_table(conn):
+    """
+    创建本地同步状态表（如不存在）
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SYNC_STATE_TABLE} (
+            "远程表" TEXT,
+            "唯一键" TEXT,
+            "行哈希" TEXT,
+            "同步时间" TEXT,
+            UNIQUE("远程表", "唯一键")
+        )
+    """)
+    conn.commit()
+
+
+def load_sync_state(conn, remote_table_name):
+    """
+    读取远程表已同步行的哈希，返回 {唯一键: 行哈希}
+    """
+    rows = conn.execute(
+        f'SELECT "唯一键", "行哈希" FROM {SYNC_STATE_TABLE} WHERE "远程表" = ?',
+        (remote_table_name,)).fetchall()
+    return dict(rows)
+
+
+def save_sync_state(conn, remote_table_name, entries):
+    """
+    记录已成功推送行的哈希（不提交，随断点一起提交）
+
+    :param entries: [(唯一键, 行哈希), ...]
+    """
+    synced_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany(
+        f'INSERT INTO {SYNC_STATE_TABLE} ("远程表", "唯一键", "行哈希", "同步时间") VALUES (?, ?, ?, ?) '
+        f'ON CONFLICT ("远程表", "唯一键") '
+        f'DO UPDATE SET "行哈希" = excluded."行哈希", "同步时间" = excluded."同步时间"',
+        [(remote_table_name, key, row_hash, synced_at) for key, row_hash in entries])
+
+
+def resolve_delta_key_indices(schema, cursor, remote_table_name, column_names, unique_constraints=None):
+    """
+    确定增量同步使用的唯一键，返回唯一键各列在 column_names 中的下标
+
+    优先使用远程表上的唯一索引（主键 id 除外），其次使用传入的 unique_constraints；
+    都无法对应到待同步列时返回 None，此时不做增量过滤。
+
+    :param column_names: 待同步的本地列名（中文）
+    """
+    field_mapping = get_config().field_mapping
+    mapped_column_names = map_column_names(tuple(column_names))
+    candidates = [cols for index_name, cols in schema.get_unique_keys(cursor, remote_table_name).items()
+                  if index_name != "PRIMARY"]
+    if unique_constraints:
+        constraint_cols = [unique_constraints] if isinstance(unique_constraints, str) else unique_constraints
+        candidates.append([field_mapping.get(col, col) for col in constraint_cols])
+    for cols in candidates:
+        if cols and all(col in mapped_column_names for col in cols):
+            return [mapped_column_names.index(col) for col in cols]
+    return None
+
+
+def compute_row_hash(column_names, row):
+    """
+    计算一行数据的哈希（包含列名，列集合变化时视为变更）
+    """
+    payload = json.dumps([column_names, row], ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def reset_remote_schema_cache():
+    """
+    清空远程表结构缓存，每次同步运行开始时调用；
+    定时任务、监听模式等长驻进程在下一次运行时重新加载，能看到运行之间远程表结构的变化
+    """
+    pool = get_mysql_pool()
+    if pool is not None:
+        pool.schema.invalidate()
 
 
 # 添加数据库同步功能
-def sync_explore_data_to_remote(table_name=None, remote_table_name=None,time_filter=None, unique_constraints=None):
+def sync_explore_data_to_remote(table_name=None, remote_table_name=None, time_filter=None, unique_constraints=None,
+                                chunk_size=None, full_resync=False):
     """
-    将Download文件夹下的ExploreData.db sqlite数据同步到远程MySQL数据库中
-    
+    将本地 ocr_data.db 中的表数据流式同步到远程MySQL数据库中
+
+    按 rowid 顺序使用 fetchmany 分块读取，每块写入远程并提交后记录断点；
+    写入失败会重连重试，仍失败则保留断点并抛出异常，下次运行从断点继续，而不必从头同步。
+    未配置远程库、本地库或本地表不存在时跳过；同步出错（含部分行写入失败）时记录日志并抛出异常，
+    由调用方（run_sync_task）将本次运行记为失败。
+
+    增量同步：按远程唯一键在本地 s_sync_state 表中记录上次成功推送的行哈希，
+    只推送哈希发生变化的行；同一唯一键在窗口内有多行时只取最后一行（与整批覆盖写入的最终结果一致）。
+    full_resync=True 时忽略已记录的哈希，全量重新推送。
+
     参数:
-    table_name_list: 要同步的表名列表
+    table_name: 要同步的本地表名
+    remote_table_name: 远程表名
     time_filter: 时间筛选条件，格式为字典{"column": "采集时间", "days": 3}表示最近3天数据
     unique_constraints: 唯一约束定义，格式为字典{表名: [约束字段列表]}
                         例如: {"table1": ["采集时间"], "table2": [["字段1", "字段2"]]}
+    chunk_size: 每块行数，默认取环境变量 MYSQL_SYNC_CHUNK_SIZE（500）
+    full_resync: 是否全量重新同步
     """
+    conn = None
     try:
         # 从环境变量获取数据库配置
-        db_config = {
-            "host": os.getenv("MYSQL_HOST", "localhost"),
-            "port": int(os.getenv("MYSQL_PORT", 3306)),
-            "user": os.getenv("MYSQL_USER", ""),
-            "password": os.getenv("MYSQL_PASSWORD", ""),
-            "database": os.getenv("MYSQL_DATABASE", "")
-        }
+        db_config = get_mysql_config()
 
         # 如果没有配置数据库，则跳过同步
-        if not all([db_config["host"], db_config["user"], db_config["password"], db_config["database"]]):
+        if not is_mysql_configured(db_config):
             logger.warning("未配置远程数据库，跳过数据同步")
             return
 
@@ -53,124 +215,288 @@ def sync_explore_data_to_remote(table_name=None, remote_table_name=None,time_fil
             logger.info("ocr_data.db 文件不存在，跳过数据同步")
             return
 
+        chunk_size = chunk_size or int(os.getenv("MYSQL_SYNC_CHUNK_SIZE", "500"))
+
         # 连接本地SQLite数据库
         import sqlite3
         conn = sqlite3.connect(db_path)
+        ensure_checkpoint_table(conn)
+        ensure_sync_state_table(conn)
         cursor = conn.cursor()
 
-        # 构建查询语句
+        # 获取本地列名
+        local_column_names = [row[1] for row in cursor.execute(f"PRAGMA table_info({table_name})").fetchall()]
+        if not local_column_names:
+            logger.warning(f"本地表 {table_name} 不存在，跳过数据同步")
+            return
+        # 替换 '采集日期' 为 '采集时间'
+        column_names = ["采集时间" if col == "采集日期" else col for col in local_column_names]
+        # 仅本地保存的列（如字段置信度）不同步
+        sync_indices = [i for i, col in enumerate(local_column_names) if col not in LOCAL_ONLY_COLUMNS]
+
+        logger.debug(f"列名: {column_names}")
+
+        # 确保远程表存在，并确定增量同步的唯一键
+        pool = get_mysql_pool(db_config)
+        table_unique_constraints = unique_constraints.get(table_name, []) if unique_constraints else []
+        with pool.connection() as mysql_conn:
+            with mysql_conn.cursor() as mysql_cursor:
+                kept_indices = prepare_remote_table(pool.schema, mysql_cursor, remote_table_name,
+                                                    [column_names[i] for i in sync_indices], table_unique_constraints)
+                kept_indices = [sync_indices[i] for i in kept_indices]
+                kept_column_names = tuple(column_names[i] for i in kept_indices)
+                key_indices = resolve_delta_key_indices(pool.schema, mysql_cursor, remote_table_name,
+                                                        kept_column_names, table_unique_constraints)
+            mysql_conn.commit()
+        insert_sql = build_upsert_sql(remote_table_name, kept_column_names)
+        logger.debug(f'insert_sql:\n{insert_sql}')
+
+        if key_indices is None:
+            logger.warning(f"远程表 {remote_table_name} 没有可用的唯一键，表 {table_name} 不做增量过滤")
+            delta_enabled = False
+        else:
+            delta_enabled = True
+            logger.info(f"表 {table_name} 增量同步唯一键: {[kept_column_names[i] for i in key_indices]}"
+                        f"{'（全量重新同步）' if full_resync else ''}")
+        synced_hashes = load_sync_state(conn, remote_table_name) if delta_enabled and not full_resync else {}
+
+        # 构建查询条件
+        time_conditions = []
+        time_params = []
         if time_filter and time_filter.get("column") and time_filter.get("days"):
             # 如果有时间筛选条件，则只查询最近N天的数据
             time_column = time_filter["column"]
             days = time_filter["days"]
             cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
-            query = f"SELECT * FROM {table_name} WHERE {time_column} >= ?"
-            cursor.execute(query, (cutoff_date,))
-            logger.info(f"执行查询: {query} 参数: {cutoff_date}")
+            time_conditions.append(f"{time_column} >= ?")
+            time_params.append(cutoff_date)
+            # 断点按筛选列与天数记录，而不是按每天变化的截止日期：次日运行仍能从断点继续
+            # （rowid 之前的行已推送，截止日期后移只会缩小范围）
+            filter_key = f"{time_column}:最近{days}天"
         else:
-            # 查询所有数据
-            cursor.execute(f"SELECT * FROM {table_name}")
-            logger.info(f"执行查询: SELECT * FROM {table_name}")
+            filter_key = "全部"
+        # 增量与全量查询的行集合不同（增量只取每个唯一键的最后一行），断点按模式分别记录：
+        # 全量重新同步不会从增量运行留下的断点继续而漏推 rowid 之前的行，反之亦然
+        filter_key += ":增量" if delta_enabled and not full_resync else ":全量"
+        if prune_checkpoints(conn, table_name, remote_table_name, filter_key):
+            logger.info(f"表 {table_name} 已清理筛选条件不再匹配的过期断点")
+
+        # 读取断点，从上次成功提交的位置继续
+        last_rowid, synced_count = load_checkpoint(conn, table_name, remote_table_name, filter_key)
+        if last_rowid:
+            logger.info(f"表 {table_name} 从断点继续同步: rowid > {last_rowid}，此前已同步 {synced_count} 行")
+        conditions = time_conditions + ["rowid > ?"]
+        params = time_params + [last_rowid]
+
+        if delta_enabled and not full_resync:
+            # 同一唯一键只取最后一行，较早的行写入远程后也会被覆盖
+            key_columns = ", ".join(f'"{local_column_names[kept_indices[i]]}"' for i in key_indices)
+            time_where = f"WHERE {' AND '.join(time_conditions)} " if time_conditions else ""
+            conditions.append(f"rowid IN (SELECT MAX(rowid) FROM {table_name} {time_where}GROUP BY {key_columns})")
+            params += time_params
+
+        query = f"SELECT rowid, * FROM {table_name} WHERE {' AND '.join(conditions)} ORDER BY rowid"
+        cursor.execute(query, params)
+        logger.info(f"执行查询: {query} 参数: {params}")
+
+        # 流式分块同步
+        chunk_index = 0
+        skipped_count = 0
+        failed_count = 0
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            chunk_index += 1
+            rows = project_rows([row[1:] for row in chunk], kept_indices, len(column_names))
+
+            # 过滤未变化的行
+            state_entries = []
+            if delta_enabled:
+                changed_rows = []
+                for row in rows:
+                    key = json.dumps([row[i] for i in key_indices], ensure_ascii=False, default=str)
+                    row_hash = compute_row_hash(kept_column_names, row)
+                    if synced_hashes.get(key) != row_hash:
+                        changed_rows.append(row)
+                        state_entries.append((key, row_hash))
+                skipped_count += len(rows) - len(changed_rows)
+                rows = changed_rows
+
+            if rows:
+                failed_rows = []
+                if not upsert_chunk_with_retry(pool, insert_sql, rows, label=f"表 {table_name} 第 {chunk_index} 块",
+                                               failed_rows=failed_rows):
+                    raise RuntimeError(f"表 {table_name} 第 {chunk_index} 块写入失败，同步中断，已同步 {synced_count} 行，"
+                                       f"下次运行将从断点 rowid > {last_rowid} 继续")
+                if state_entries:
+                    # 单行写入失败的行不记录哈希，下次仍会推送
+                    failed_ids = {id(row) for row in failed_rows}
+                    save_sync_state(conn, remote_table_name,
+                                    [entry for row, entry in zip(rows, state_entries) if id(row) not in failed_ids])
+                synced_count += len(rows) - len(failed_rows)
+                failed_count += len(failed_rows)
+            last_rowid = chunk[-1][0]
+            save_checkpoint(conn, table_name, remote_table_name, filter_key, last_rowid, synced_count)
+
+        clear_checkpoint(conn, table_name, remote_table_name, filter_key)
+        logger.info(f"表 {table_name} 数据已同步到远程MySQL数据库，共 {synced_count} 行，"
+                    f"未变化跳过 {skipped_count} 行")
+        if failed_count:
+            # 写入失败的行未记录哈希，下次运行会重新推送
+            raise RuntimeError(f"表 {table_name} 有 {failed_count} 行写入远程失败，下次运行重试")
 
-        rows = cursor.fetchall()
-        logger.info(f"表 {table_name} 查询到 {len(rows)} 行数据")
+    except Exception as e:
+        logger.error(f"同步数据到远程数据库时出错: {str(e)}")
+        raise
+    finally:
+        # 关闭本地数据库连接
+        if conn:
+            conn.close()
 
-        # 获取列名
-        column_names = [description[0] for description in cursor.description]
-        # 替换 '采集日期' 为 '采集时间'
-        for i, col in enumerate(column_names):
-            if col == "采集日期":
-                column_names[i] = "采集时间"
 
-        logger.debug(f"列名: {column_names}")
+def upsert_chunk_with_retry(pool, insert_sql, rows, label="数据", failed_rows=None):
+    """
+    写入一块数据，连接级错误时从连接池重新借用（自动重连）并重试
+    重试次数由环境变量 MYSQL_SYNC_RETRIES 控制（默认 3 次）
 
-        # 同步到MySQL数据库
-        table_unique_constraints = unique_constraints.get(table_name, []) if unique_constraints else []
-        sync_to_mysql(db_config, remote_table_name, column_names, rows, table_unique_constraints)
-        logger.info(f"表 {table_name} 数据已同步到远程MySQL数据库")
+    :param failed_rows: 传入列表时，收集逐行写入仍失败的行
+    :return: 是否写入成功
+    """
+    retries = max(1, int(os.getenv("MYSQL_SYNC_RETRIES", "3")))
+    for attempt in range(1, retries + 1):
+        if failed_rows is not None:
+            failed_rows.clear()
+        try:
+            with pool.connection() as mysql_conn:
+                upsert_rows_in_chunks(mysql_conn, insert_sql, rows, chunk_size=len(rows), label=label,
+                                      failed_rows=failed_rows)
+            return True
+        except Exception as e:
+            logger.warning(f"{label} 写入失败（第 {attempt}/{retries} 次）: {str(e)}")
+            if attempt < retries:
+                time.sleep(min(2 ** attempt, 30))
+    return False
+
+
+def prepare_remote_table(schema, cursor, remote_table_name, column_names, unique_constraints=None):
+    """
+    确保远程表存在（不存在则创建）且包含全部字段（缺少时添加），返回需要写入的列在 column_names 中的下标
+    表结构来自按运行缓存的表结构（见 db/remote_schema.py），不再每次执行 SHOW TABLES
 
-        # 关闭本地数据库连接
-        conn.close()
+    远程表缺少字段且无法添加时抛出 RuntimeError；设置 MYSQL_SYNC_IGNORE_MISSING_COLUMNS=1 时改为忽略这些字段
 
+    :param schema: 远程表结构缓存 RemoteSchemaCache
+    """
+    try:
+        table_exists = schema.table_exists(cursor, remote_table_name)
+        logger.debug(f"检查表 {remote_table_name} 是否存在: {table_exists}")
     except Exception as e:
-        logger.error(f"同步数据到远程数据库时出错: {str(e)}")
+        logger.warning(f"检查表 {remote_table_name} 是否存在时出错: {str(e)}")
+        table_exists = False
+    logger.info(f"表 {remote_table_name} 约束字段: {unique_constraints}")
+    # 如果表不存在，则创建表
+    if not table_exists:
+        logger.info(f"表 {remote_table_name} 不存在，正在创建...")
+        create_table_if_not_exists(cursor, remote_table_name, column_names, unique_constraints)
+        schema.invalidate()
+        return list(range(len(column_names)))
+
+    # 表已存在：远程表缺少的字段先补齐（ALTER TABLE），补齐失败时报错，不丢弃本地数据
+    remote_columns = set(schema.get_columns(cursor, remote_table_name))
+    mapped_column_names = map_column_names(tuple(column_names))
+    missing = [i for i, col in enumerate(mapped_column_names) if col not in remote_columns]
+    if not missing:
+        return list(range(len(column_names)))
+    missing_columns = [mapped_column_names[i] for i in missing]
+    if os.getenv("MYSQL_SYNC_IGNORE_MISSING_COLUMNS", "0") == "1":
+        logger.warning(f"远程表 {remote_table_name} 中不存在字段 {missing_columns}，"
+                       f"MYSQL_SYNC_IGNORE_MISSING_COLUMNS=1，同步时忽略这些字段")
+        return [i for i in range(len(column_names)) if i not in missing]
+
+    logger.info(f"远程表 {remote_table_name} 缺少字段 {missing_columns}，正在添加...")
+    add_missing_columns(cursor, remote_table_name, [column_names[i] for i in missing],
+                        get_mysql_config().get("database", ""))
+    schema.invalidate()
+    remote_columns = set(schema.get_columns(cursor, remote_table_name))
+    still_missing = [col for col in missing_columns if col not in remote_columns]
+    if still_missing:
+        raise RuntimeError(f"远程表 {remote_table_name} 缺少字段 {still_missing} 且无法自动添加，"
+                           f"请手动添加，或设置 MYSQL_SYNC_IGNORE_MISSING_COLUMNS=1 忽略这些字段")
+    return list(range(len(column_names)))
+
+
+def project_rows(rows, kept_indices, column_count):
+    """
+    按下标保留每行中需要同步的列（全部保留时原样返回）
+    """
+    if len(kept_indices) == column_count:
+        return rows
+    return [tuple(row[i] for i in kept_indices) for row in rows]
+
+
+def map_column_names(column_names):
+    """
+    将本地列名（中文）映射为远程表英文列名，按 (配置, 列名元组) 缓存
+    """
+    return _map_column_names(get_config(), column_names)
+
+
+@lru_cache(maxsize=None)
+def _map_column_names(settings, column_names):
+    return tuple(settings.field_mapping.get(col, col) for col in column_names)
+
+
+@lru_cache(maxsize=None)
+def build_upsert_sql(remote_table_name, column_names):
+    """
+    根据本地列名（中文）构建远程表的 INSERT ... ON DUPLICATE KEY UPDATE 语句
+    按 (表名, 列名元组) 缓存，同一张表的同一组列只构建一次
+
+    :param column_names: 列名元组
+    """
+    # 映射列名为英文名
+    mapped_column_names = map_column_names(column_names)
+    columns_str = ", ".join([f"`{col}`" for col in mapped_column_names])
+
+    # 构建ON DUPLICATE KEY UPDATE部分
+    update_fields = []
+    for i, col in enumerate(column_names):
+        if col not in ("id",):
+            update_fields.append(f"`{mapped_column_names[i]}` = VALUES(`{mapped_column_names[i]}`)")
+
+    placeholders = ", ".join(["%s"] * len(column_names))
+    return " ".join(f"""
+                    INSERT INTO {remote_table_name} ({columns_str})
+                    VALUES ({placeholders})
+                    ON DUPLICATE KEY UPDATE {", ".join(update_fields)}
+                    """.split())
 
 
 def sync_to_mysql(db_config, remote_table_name, column_names, rows, unique_constraints=None):
     """
     同步数据到MySQL数据库
-    支持表不存在时创建表，字段不存在时新增字段
+    支持表不存在时创建表，数据分块批量写入
     """
     try:
-        import pymysql
-        # 创建MySQL连接
-        mysql_conn = pymysql.connect(
-            host=db_config.get("host", "localhost"),
-            port=db_config.get("port", 3306),
-            user=db_config.get("user", ""),
-            password=db_config.get("password", ""),
-            database=db_config.get("database", ""),
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor,
-            use_unicode=True,
-            ssl_disabled=True,  # 对应 useSSL=false
-            init_command="SET SESSION time_zone='+08:00'"  # 对应 serverTimezone=Asia/Shanghai
-        )
-        try:
+        # 从共享连接池借用MySQL连接
+        pool = get_mysql_pool(db_config)
+        if pool is None:
+            logger.warning("未配置远程数据库，跳过数据同步")
+            return
+        with pool.connection() as mysql_conn:
             with mysql_conn.cursor() as cursor:
-                # 检查表是否存在
-                try:
-                    cursor.execute(f"SHOW TABLES LIKE '{remote_table_name}'")
-                    table_result = cursor.fetchall()
-                    table_exists = len(table_result) > 0
-                    logger.debug(f"检查表 {remote_table_name} 是否存在: {table_exists}, 查询结果: {table_result}")
-                except Exception as e:
-                    logger.warning(f"检查表 {remote_table_name} 是否存在时出错: {str(e)}")
-                    table_exists = False
-                logger.info(f"表 {remote_table_name} 约束字段: {unique_constraints}")
-                # 如果表不存在，则创建表
-                if not table_exists:
-                    logger.info(f"表 {remote_table_name} 不存在，正在创建...")
-                    create_table_if_not_exists(cursor, remote_table_name, column_names, unique_constraints)
-                # else:
-                # 如果表存在，检查是否有新增字段需要添加
-                # logger.info(f"表 {table_name} 已存在，检查是否需要新增字段...")
-                # add_missing_columns(cursor, table_name, column_names, db_config.get("database", ""))
-
-                if rows:
-                    # 映射列名为英文名
-                    mapped_column_names = []
-                    for col in column_names:
-                        if col in FIELD_MAPPING:
-                            mapped_column_names.append(FIELD_MAPPING[col])
-                        else:
-                            mapped_column_names.append(col)
-
-                    columns_str = ", ".join([f"`{col}`" for col in mapped_column_names])
-
-                    # 构建ON DUPLICATE KEY UPDATE部分
-                    update_fields = []
-                    for i, col in enumerate(column_names):
-                        if col not in ("id",):
-                            eng_col = mapped_column_names[i] if col in FIELD_MAPPING else col
-                            update_fields.append(f"`{eng_col}` = VALUES(`{eng_col}`)")
-
-                    placeholders = ", ".join(["%s"] * len(column_names))
-                    insert_sql = " ".join(f"""
-                                    INSERT INTO {remote_table_name} ({columns_str})
-                                    VALUES ({placeholders})
-                                    ON DUPLICATE KEY UPDATE {", ".join(update_fields)}
-                                    """.split())
-
-                    logger.debug(f'insert_sql:\n{insert_sql}')
-                    cursor.executemany(insert_sql, rows)
-
-            # 提交事务
+                kept_indices = prepare_remote_table(pool.schema, cursor, remote_table_name, column_names,
+                                                    unique_constraints)
             mysql_conn.commit()
-            logger.info(f"成功同步 {len(rows)} 条记录到MySQL数据库")
 
-        finally:
-            mysql_conn.close()
+            if rows:
+                insert_sql = build_upsert_sql(remote_table_name, tuple(column_names[i] for i in kept_indices))
+                logger.debug(f'insert_sql:\n{insert_sql}')
+                rows = project_rows(rows, kept_indices, len(column_names))
+                success_count, failed_count = upsert_rows_in_chunks(mysql_conn, insert_sql, rows,
+                                                                    label=f"表 {remote_table_name}")
+                logger.info(f"成功同步 {success_count} 条记录到MySQL数据库，失败 {failed_count} 条")
 
     except ImportError:
         logger.error("缺少 pymysql 库，请安装: pip install pymysql")
@@ -182,6 +508,7 @@ def create_table_if_not_exists(cursor, table_name, column_names, unique_constrai
     """
     如果表不存在则创建表
     """
+    field_mapping = get_config().field_mapping
     columns_definitions = []
     columns_definitions.append('`id` BIGINT AUTO_INCREMENT PRIMARY KEY')
     unique_keys = []
@@ -189,8 +516,8 @@ def create_table_if_not_exists(cursor, table_name, column_names, unique_constrai
     # 首先处理所有字段定义（不区分唯一与否）
     field_definitions = {}
     for col in column_names:
-        if col in FIELD_MAPPING:
-            eng_col = FIELD_MAPPING[col]
+        if col in field_mapping:
+            eng_col = field_mapping[col]
             if col == "采集日期":
                 field_definitions[eng_col] = f"`{eng_col}` DATE COMMENT '{col}'"
             elif col == "采集时间":
@@ -208,13 +535,13 @@ def create_table_if_not_exists(cursor, table_name, column_names, unique_constrai
     if unique_constraints:
         # 使用传入的唯一约束
         if isinstance(unique_constraints, str):  # 单字段唯一约束
-            eng_col = FIELD_MAPPING.get(unique_constraints, unique_constraints)
+            eng_col = field_mapping.get(unique_constraints, unique_constraints)
             if eng_col in field_definitions:
                 unique_keys.append(f"`{eng_col}`")
         elif isinstance(unique_constraints, list):  # 多字段组合唯一约束
             composite_keys = []
             for col in unique_constraints:
-                eng_col = FIELD_MAPPING.get(col, col)
+                eng_col = field_mapping.get(col, col)
                 if eng_col in field_definitions:
                     composite_keys.append(f"`{eng_col}`")
             if composite_keys:
@@ -253,21 +580,23 @@ def add_missing_columns(cursor, table_name, column_names, database_name):
     try:
         # 使用 SHOW COLUMNS 查询表结构
         cursor.execute(f"SHOW COLUMNS FROM {table_name}")
-        existing_columns = [row[0] for row in cursor.fetchall()]
+        # 连接池使用 DictCursor，每行为 {"Field": 列名, "Type": ..., ...}
+        existing_columns = [row["Field"] for row in cursor.fetchall()]
         logger.debug(f"表 {table_name} 的现有字段: {existing_columns}")
     except Exception as e:
         logger.error(f"无法获取表 {table_name} 的字段信息: {str(e)} (数据库: {database_name})")
         return
 
     # 检查是否有新增字段
+    field_mapping = get_config().field_mapping
     for col in column_names:
         # 映射中文字段名为英文名
-        eng_col = FIELD_MAPPING.get(col, col)
+        eng_col = field_mapping.get(col, col)
 
         # 检查英文字段名是否已存在
         if eng_col not in existing_columns:
             # 添加缺失的字段
-            if col in FIELD_MAPPING:
+            if col in field_mapping:
                 if col == "采集日期":
                     alter_sql = f"ALTER TABLE {table_name} ADD COLUMN `{eng_col}` DATE COMMENT '{col}'"
                 elif col == "采集时间":
@@ -284,57 +613,165 @@ def add_missing_columns(cursor, table_name, column_names, database_name):
                 logger.error(f"添加字段 {eng_col} 时出错: {str(e)} (SQL: {alter_sql})")
 
 
+# 作品（POST）数据同步到 s_xhs_data_overview_traffic_analysis 的映射规则
+# fields: [(远程表字段, 原始JSON字段)]，按顺序拼接在公共字段之后
+POST_SYNC_MAPPING = {
+    "weibo": {
+        "source_type": "1948663593734004737",
+        "type": "微博",
+        "url": "blog_link",
+        "title": "content",
+        "fields": [("view_count", "read_count"), ("shares", "forward_count"),
+                   ("comments", "comment_count"), ("likes", "like_count")],
+    },
+    "tiktok": {
+        "source_type": "1866687481668411393",
+        "type": "tiktok视频",
+        "url": "post_link",
+        "title": "title",
+        "fields": [("view_count", "view_count"), ("collects", "collection_count"),
+                   ("comments", "comment_count"), ("likes", "like_count")],
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def build_post_upsert_sql(app_name, table_name='s_xhs_data_overview_traffic_analysis'):
+    """
+    构建作品数据的 INSERT ... ON DUPLICATE KEY UPDATE 语句（所有作品共用同一条SQL）
+    """
+    metric_columns = [column for column, _ in POST_SYNC_MAPPING[app_name]["fields"]]
+    columns = ["device_ip", "account_id", "source_type", "url", "title", "collection_time", *metric_columns, "type"]
+    update_columns = ["title", *metric_columns, "account_id", "device_ip", "collection_time"]
+    return " ".join(f"""
+        INSERT INTO {table_name} ({", ".join(columns)})
+        VALUES ({", ".join(["%s"] * len(columns))})
+        ON DUPLICATE KEY UPDATE {", ".join(f"{col} = VALUES({col})" for col in update_columns)}
+        """.split())
+
+
+def map_post_rows(post_data_list, app_name, account_id=None):
+    """
+    将作品数据列表映射为与 build_post_upsert_sql 字段顺序一致的元组列表
+    """
+    mapping = POST_SYNC_MAPPING[app_name]
+    rows = []
+    for post_data in post_data_list:
+        rows.append((
+            post_data.get("device_ip", ""),  # 如果数据中有设备IP可以传入
+            account_id,
+            mapping["source_type"],
+            post_data.get(mapping["url"], ""),
+            post_data.get(mapping["title"], ""),
+            post_data.get("timestamp", ""),
+            *[str(post_data.get(key, "")) for _, key in mapping["fields"]],
+            mapping["type"],
+        ))
+    return rows
+
+
+@lru_cache(maxsize=None)
+def upsert_table_name(insert_sql):
+    """从 INSERT INTO <表名> ... 语句中取出表名（用于指标标签）"""
+    parts = insert_sql.split()
+    if len(parts) > 2 and parts[0].upper() == "INSERT" and parts[1].upper() == "INTO":
+        return parts[2].strip('`')
+    return "unknown"
+
+
+def upsert_rows_in_chunks(mysql_conn, insert_sql, rows, chunk_size=None, label="数据", failed_rows=None):
+    """
+    分块批量写入MySQL
+
+    每块使用 executemany（pymysql 会将 INSERT ... VALUES 改写为多行插入，一块只需一次往返），成功即提交；
+    某块失败时回滚，并仅对该块逐行重试，跳过真正出错的行。
+
+    :param mysql_conn: MySQL连接
+    :param insert_sql: 插入语句（%s 占位符）
+    :param rows: 参数元组列表
+    :param chunk_size: 每块行数，默认取环境变量 MYSQL_SYNC_CHUNK_SIZE（500）
+    :param label: 日志中的数据描述
+    :param failed_rows: 传入列表时，收集逐行写入失败的行
+    :return: (成功行数, 失败行数)
+    """
+    chunk_size = chunk_size or int(os.getenv("MYSQL_SYNC_CHUNK_SIZE", "500"))
+    rows_upserted = MYSQL_ROWS_UPSERTED.labels(upsert_table_name(insert_sql))
+    total_chunks = (len(rows) + chunk_size - 1) // chunk_size
+    success_count = failed_count = 0
+    for chunk_index, start in enumerate(range(0, len(rows), chunk_size), 1):
+        chunk = rows[start:start + chunk_size]
+        chunk_label = f"{label} 第 {chunk_index}/{total_chunks} 块" if total_chunks > 1 else label
+        try:
+            with mysql_conn.cursor() as cursor:
+                affected_rows = cursor.executemany(insert_sql, chunk)
+            mysql_conn.commit()
+            success_count += len(chunk)
+            rows_upserted.inc(len(chunk))
+            logger.info(f"{chunk_label} 批量写入成功: {len(chunk)} 行，影响行数: {affected_rows}")
+            continue
+        except Exception as e:
+            mysql_conn.rollback()
+            logger.warning(f"{chunk_label} 批量写入失败，改为逐行写入: {str(e)}")
+
+        # 逐行回退：单条语句出错只影响该行
+        chunk_success = 0
+        with mysql_conn.cursor() as cursor:
+            for row in chunk:
+                try:
+                    cursor.execute(insert_sql, row)
+                    chunk_success += 1
+                except Exception as e:
+                    failed_count += 1
+                    if failed_rows is not None:
+                        failed_rows.append(row)
+                    logger.error(f"{label} 单行写入失败: {str(e)}, 数据: {row}")
+        mysql_conn.commit()
+        success_count += chunk_success
+        rows_upserted.inc(chunk_success)
+        logger.info(f"{chunk_label} 逐行写入完成: 成功 {chunk_success} 行，"
+                    f"失败 {len(chunk) - chunk_success} 行")
+    return success_count, failed_count
+
+
+@staged("sync")
 def sync_post_data_to_remote(post_data_list, app_name, account_id=None):
     """
-    将微博数据同步到远程MySQL数据库中的s_xhs_data_overview_traffic_analysis表
-    
+    将作品（微博、tiktok）数据同步到远程MySQL数据库中的s_xhs_data_overview_traffic_analysis表
+    所有作品先映射为元组，再分块批量写入
+
     参数:
-    weibo_data_list: 微博数据列表，每个元素为包含微博信息的字典
+    post_data_list: 作品数据列表，每个元素为包含作品信息的字典
+    app_name: 应用名称，weibo 或 tiktok
     account_id: 账号ID，可选
     """
     try:
         # 从环境变量获取数据库配置
-        db_config = {
-            "host": os.getenv("MYSQL_HOST", "localhost"),
-            "port": int(os.getenv("MYSQL_PORT", 3306)),
-            "user": os.getenv("MYSQL_USER", ""),
-            "password": os.getenv("MYSQL_PASSWORD", ""),
-            "database": os.getenv("MYSQL_DATABASE", "")
-        }
+        db_config = get_mysql_config()
 
         # 如果没有配置数据库，则跳过同步
-        if not all([db_config["host"], db_config["user"], db_config["password"], db_config["database"]]):
+        if not is_mysql_configured(db_config):
             logger.warning("未配置远程数据库，跳过文章POST的数据同步")
             return
 
-        # 导入pymysql
-        import pymysql
-
-        # 创建MySQL连接
-        mysql_conn = pymysql.connect(
-            host=db_config.get("host", "localhost"),
-            port=db_config.get("port", 3306),
-            user=db_config.get("user", ""),
-            password=db_config.get("password", ""),
-            database=db_config.get("database", ""),
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor,
-            use_unicode=True,
-            ssl_disabled=True,  # 对应 useSSL=false
-            init_command="SET SESSION time_zone='+08:00'"  # 对应 serverTimezone=Asia/Shanghai
-        )
+        if app_name not in POST_SYNC_MAPPING:
+            logger.warning(f"不支持同步该APP的POST数据: {app_name}")
+            return
 
-        try:
-            with mysql_conn.cursor() as cursor:
-                # 确保表存在
-                table_name = 's_xhs_data_overview_traffic_analysis'
+        # 确保表存在
+        table_name = 's_xhs_data_overview_traffic_analysis'
+
+        # 准备插入数据
+        insert_sql = build_post_upsert_sql(app_name, table_name)
+        rows = map_post_rows(post_data_list, app_name, account_id)
 
-                # 检查表是否存在
+        # 从共享连接池借用MySQL连接
+        pool = get_mysql_pool(db_config)
+        with pool.connection() as mysql_conn:
+            with mysql_conn.cursor() as cursor:
+                # 检查表是否存在（使用进程级表结构缓存）
                 try:
-                    cursor.execute(f"SHOW TABLES LIKE '{table_name}'")
-                    table_result = cursor.fetchall()
-                    table_exists = len(table_result) > 0
-                    logger.debug(f"检查表 {table_name} 是否存在: {table_exists}, 查询结果: {table_result}")
+                    table_exists = pool.schema.table_exists(cursor, table_name)
+                    logger.debug(f"检查表 {table_name} 是否存在: {table_exists}")
                 except Exception as e:
                     logger.warning(f"检查表 {table_name} 是否存在时出错: {str(e)}")
                     table_exists = False
@@ -344,112 +781,10 @@ def sync_post_data_to_remote(post_data_list, app_name, account_id=None):
                     logger.info(f"表 {table_name} 不存在，请手动初始化")
                     # 使用与现有表结构一致的定义创建表
 
-                # 准备插入数据
-                if app_name == "weibo":
-                    for post_data in post_data_list:
-                        # 映射微博数据到表字段
-                        url = post_data.get("blog_link", "")
-                        title = post_data.get("content", "")
-                        collection_time = post_data.get("timestamp", "")
-                        view_count = str(post_data.get("read_count", ""))
-                        shares = str(post_data.get("forward_count", ""))
-                        comments = str(post_data.get("comment_count", ""))
-                        likes = str(post_data.get("like_count", ""))
-
-                        # 获取设备IP和来源类型（如果有提供）
-                        device_ip = post_data.get("device_ip", "")  # 如果数据中有设备IP可以传入
-                        source_type = "1948663593734004737"  # 默认设为weibo
-
-                        # 构建INSERT语句
-                        insert_sql = """
-                        INSERT INTO s_xhs_data_overview_traffic_analysis 
-                        (device_ip, account_id, source_type, url, title, collection_time, view_count, shares, comments, likes, type)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON DUPLICATE KEY UPDATE
-                        title = VALUES(title),
-                        view_count = VALUES(view_count),
-                        shares = VALUES(shares),
-                        comments = VALUES(comments),
-                        likes = VALUES(likes),
-                        account_id = VALUES(account_id),
-                        device_ip = VALUES(device_ip),
-                        collection_time =VALUES(collection_time)
-                        """
-
-                        # 建议改进
-                        try:
-                            affected_rows = cursor.execute(insert_sql, (
-                                device_ip,
-                                account_id,
-                                source_type,
-                                url,
-                                title,
-                                collection_time,
-                                view_count,
-                                shares,
-                                comments,
-                                likes,
-                                "微博"
-                            ))
-                            logger.debug(f"微博数据SQL执行成功，影响行数: {affected_rows}")
-                        except Exception as e:
-                            logger.error(f"执行微博数据SQL时出错: {str(e)}, SQL: {insert_sql}")
-                elif app_name == 'tiktok':
-                    for post_data in post_data_list:
-                        # 映射微博数据到表字段
-                        url = post_data.get("post_link", "")
-                        title = post_data.get("title", "")
-                        collection_time = post_data.get("timestamp", "")
-                        view_count = str(post_data.get("view_count", ""))
-                        collects = str(post_data.get("collection_count", ""))
-                        comments = str(post_data.get("comment_count", ""))
-                        likes = str(post_data.get("like_count", ""))
-
-                        # 获取设备IP和来源类型（如果有提供）
-                        device_ip = post_data.get("device_ip", "")  # 如果数据中有设备IP可以传入
-                        source_type = "1866687481668411393"
-
-                        # 构建INSERT语句
-                        insert_sql = """
-                        INSERT INTO s_xhs_data_overview_traffic_analysis 
-                        (device_ip, account_id, source_type, url, title, collection_time, view_count, collects, comments, likes, type)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON DUPLICATE KEY UPDATE
-                        title = VALUES(title),
-                        view_count = VALUES(view_count),
-                        collects = VALUES(collects),
-                        comments = VALUES(comments),
-                        likes = VALUES(likes),
-                        account_id = VALUES(account_id),
-                        device_ip = VALUES(device_ip),
-                        collection_time =VALUES(collection_time)
-                        """
-
-                        # 建议改进
-                        try:
-                            affected_rows = cursor.execute(insert_sql, (
-                                device_ip,
-                                account_id,
-                                source_type,
-                                url,
-                                title,
-                                collection_time,
-                                view_count,
-                                collects,
-                                comments,
-                                likes,
-                                "tiktok视频"
-                            ))
-                            logger.debug(f"POST数据SQL执行成功，影响行数: {affected_rows}")
-                        except Exception as e:
-                            logger.error(f"执行POST数据SQL时出错: {str(e)}, SQL: {insert_sql}")
-
-                # 提交事务
-                mysql_conn.commit()
-                logger.info(f"成功同步 {len(post_data_list)} 条POST数据到MySQL数据库")
-
-        finally:
-            mysql_conn.close()
+            logger.debug(f'insert_sql:\n{insert_sql}')
+            success_count, failed_count = upsert_rows_in_chunks(mysql_conn, insert_sql, rows,
+                                                                label=f"{app_name} POST数据")
+            logger.info(f"成功同步 {success_count} 条POST数据到MySQL数据库，失败 {failed_count} 条")
 
     except ImportError:
         logger.error("缺少 pymysql 库，请安装: pip install pymysql")
@@ -457,6 +792,29 @@ def sync_post_data_to_remote(post_data_list, app_name, account_id=None):
         logger.error(f"同步POST数据到 MySQL 数据库时出错: {str(e)}")
 
 
+# 各APP的来源类型（应用appid）
+SOURCE_TYPES = {
+    "xhs": "1894230222988058625",
+    "weibo": "1948663593734004737",
+    "tiktok": "1866687481668411393",
+}
+
+# 用户信息写入语句（模块加载时构建一次）
+USER_INFO_UPSERT_SQL = """
+    INSERT INTO s_xhs_user_info_ocr 
+    (device_ip, account_id, source_type, url, nickname, interaction, follows, fans, collection_time)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+    nickname = VALUES(nickname),
+    follows = VALUES(follows),
+    fans = VALUES(fans),
+    interaction = VALUES(interaction),
+    account_id = VALUES(account_id),
+    device_ip = VALUES(device_ip),
+    collection_time =VALUES(collection_time)
+"""
+
+
 def sync_user_info_to_remote(user_info_list, app_name=None, ip_port=None, account_id=None):
     """
     将用户信息数据同步到远程MySQL数据库中的s_xhs_user_info_ocr表
@@ -467,49 +825,40 @@ def sync_user_info_to_remote(user_info_list, app_name=None, ip_port=None, accoun
     ip_port: 设备IP和端口
     account_id: 账号ID
     """
+    sync_user_info_entries_to_remote([(user_info, app_name, ip_port, account_id) for user_info in user_info_list])
+
+
+def sync_user_info_entries_to_remote(entries):
+    """
+    在一个连接、一个事务中同步多个账号的用户信息到 s_xhs_user_info_ocr 表
+
+    参数:
+    entries: [(用户信息字典, 应用名称, 设备IP和端口, 账号ID), ...]
+
+    返回:
+    写入成功的条目下标列表；未配置数据库或同步失败时返回空列表
+    """
+    synced_indices = []
     try:
         # 从环境变量获取数据库配置
-        db_config = {
-            "host": os.getenv("MYSQL_HOST", "localhost"),
-            "port": int(os.getenv("MYSQL_PORT", 3306)),
-            "user": os.getenv("MYSQL_USER", ""),
-            "password": os.getenv("MYSQL_PASSWORD", ""),
-            "database": os.getenv("MYSQL_DATABASE", "")
-        }
+        db_config = get_mysql_config()
 
         # 如果没有配置数据库，则跳过同步
-        if not all([db_config["host"], db_config["user"], db_config["password"], db_config["database"]]):
+        if not is_mysql_configured(db_config):
             logger.warning("未配置远程数据库，跳过用户信息数据同步")
-            return
+            return []
 
-        # 导入pymysql
-        import pymysql
-
-        # 创建MySQL连接
-        mysql_conn = pymysql.connect(
-            host=db_config.get("host", "localhost"),
-            port=db_config.get("port", 3306),
-            user=db_config.get("user", ""),
-            password=db_config.get("password", ""),
-            database=db_config.get("database", ""),
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor,
-            use_unicode=True,
-            ssl_disabled=True,  # 对应 useSSL=false
-            init_command="SET SESSION time_zone='+08:00'"  # 对应 serverTimezone=Asia/Shanghai
-        )
-
-        try:
+        # 从共享连接池借用MySQL连接
+        pool = get_mysql_pool(db_config)
+        with pool.connection() as mysql_conn:
             with mysql_conn.cursor() as cursor:
                 # 确保表存在
                 table_name = 's_xhs_user_info_ocr'
 
-                # 检查表是否存在
+                # 检查表是否存在（使用进程级表结构缓存）
                 try:
-                    cursor.execute(f"SHOW TABLES LIKE '{table_name}'")
-                    table_result = cursor.fetchall()
-                    table_exists = len(table_result) > 0
-                    logger.debug(f"检查表 {table_name} 是否存在: {table_exists}, 查询结果: {table_result}")
+                    table_exists = pool.schema.table_exists(cursor, table_name)
+                    logger.debug(f"检查表 {table_name} 是否存在: {table_exists}")
                 except Exception as e:
                     logger.warning(f"检查表 {table_name} 是否存在时出错: {str(e)}")
                     table_exists = False
@@ -520,7 +869,7 @@ def sync_user_info_to_remote(user_info_list, app_name=None, ip_port=None, accoun
                     # 使用与现有表结构一致的定义创建表
 
                 # 准备插入数据
-                for user_info in user_info_list:
+                for index, (user_info, app_name, ip_port, account_id) in enumerate(entries):
                     # 映射用户信息数据到表字段
                     nickname = user_info.get("nickname", "")
                     url = user_info.get("profile_url", "")
@@ -531,27 +880,8 @@ def sync_user_info_to_remote(user_info_list, app_name=None, ip_port=None, accoun
 
                     # 设备IP和来源类型
                     device_ip = ip_port  # 使用ip_port作为设备IP
-                    if app_name == "xhs":
-                        source_type = "1894230222988058625"
-                    elif app_name == "weibo":
-                        source_type = "1948663593734004737"
-                    elif app_name == "tiktok":
-                        source_type = "1866687481668411393"
-
-                    # 构建INSERT语句
-                    insert_sql = """
-                    INSERT INTO s_xhs_user_info_ocr 
-                    (device_ip, account_id, source_type, url, nickname, interaction, follows, fans, collection_time)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    nickname = VALUES(nickname),
-                    follows = VALUES(follows),
-                    fans = VALUES(fans),
-                    interaction = VALUES(interaction),
-                    account_id = VALUES(account_id),
-                    device_ip = VALUES(device_ip),
-                    collection_time =VALUES(collection_time)
-                    """
+                    source_type = SOURCE_TYPES.get(app_name)
+                    insert_sql = USER_INFO_UPSERT_SQL
 
                     try:
                         affected_rows = cursor.execute(insert_sql, (
@@ -566,17 +896,18 @@ def sync_user_info_to_remote(user_info_list, app_name=None, ip_port=None, accoun
                             collection_time
                         ))
                         logger.debug(f"SQL执行成功，影响行数: {affected_rows}")
+                        synced_indices.append(index)
                     except Exception as e:
                         logger.error(f"执行SQL时出错: {str(e)}, SQL: {insert_sql}")
 
                 # 提交事务
                 mysql_conn.commit()
-                logger.info(f"成功同步 {len(user_info_list)} 条用户信息数据到MySQL数据库")
-
-        finally:
-            mysql_conn.close()
+                MYSQL_ROWS_UPSERTED.labels(table_name).inc(len(synced_indices))
+                logger.info(f"成功同步 {len(synced_indices)}/{len(entries)} 条用户信息数据到MySQL数据库")
+        return synced_indices
 
     except ImportError:
         logger.error("缺少 pymysql 库，请安装: pip install pymysql")
     except Exception as e:
         logger.error(f"同步用户信息数据到 MySQL 数据库时出错: {str(e)}")
+    return []
@@ -0,0 +1,205 @@
+"""
+截图识别任务台账
+
+进程在一轮识别中途退出（OOM、OCR 引擎卡死、systemd 重启）后，下次运行不必把最近 N 天的截图全部重新识别。
+台账保存在本地 ocr_data.db 的 s_ocr_job_ledger 表中，每张截图一行，按 (文件大小, 修改时间) 识别文件是否变化：
+- 扫描到的截图登记为 pending；文件变化后重新置为 pending
+- 开始识别前置为 running 并累加尝试次数，识别成功置为 done，失败置为 failed
+- 重启后 running（上次识别到一半进程就退出了）与 failed 的截图重新识别，done 的截图直接跳过
+- 尝试次数达到 OCR_JOB_MAX_ATTEMPTS 仍未成功的截图置为 quarantined（隔离），不再识别，
+  文件变化或执行 --retry-quarantined 后才重新识别
+"""
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from core.logger import logger
+from core.metrics import SQLITE_COMMIT_SECONDS
+from db import db_path
+
+load_dotenv()
+
+JOB_LEDGER_TABLE = "s_ocr_job_ledger"
+# 同一截图最多尝试识别的次数，超过后隔离
+OCR_JOB_MAX_ATTEMPTS = int(os.getenv("OCR_JOB_MAX_ATTEMPTS", "3"))
+# 台账保留天数
+OCR_JOB_LEDGER_DAYS = int(os.getenv("OCR_JOB_LEDGER_DAYS", "7"))
+
+PENDING, RUNNING, DONE, FAILED, QUARANTINED = "pending", "running", "done", "failed", "quarantined"
+
+
+def ensure_job_ledger_table(conn):
+    """
+    创建本地任务台账表（如不存在）
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {JOB_LEDGER_TABLE} (
+            "路径" TEXT PRIMARY KEY,
+            "应用" TEXT,
+            "文件大小" INTEGER,
+            "修改时间" REAL,
+            "状态" TEXT,
+            "尝试次数" INTEGER DEFAULT 0,
+            "最近错误" TEXT,
+            "发现时间" TEXT,
+            "更新时间" TEXT
+        )
+    """)
+    conn.commit()
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+class JobLedger:
+    """
+    用法：
+        ledger = JobLedger()
+        ledger.discover(paths, app_name)
+        for path in paths:
+            if ledger.claim(path):
+                ...
+                ledger.finish(path, ok, error)
+        ledger.close()
+    """
+
+    def __init__(self, path=None, max_attempts=OCR_JOB_MAX_ATTEMPTS):
+        self.db_path = path or db_path
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(self.db_path)
+        ensure_job_ledger_table(self.conn)
+        self.claimed_count = 0
+        self.skipped_count = 0
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def discover(self, paths, app_name):
+        """
+        登记扫描到的截图：新文件与已变化的文件置为 pending（尝试次数清零），其余保持原状态
+        """
+        now = _now()
+        rows = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            rows.append((path, app_name, stat.st_size, stat.st_mtime, PENDING, now, now))
+        if not rows:
+            return
+        self.conn.executemany(f"""
+            INSERT INTO {JOB_LEDGER_TABLE}
+                ("路径", "应用", "文件大小", "修改时间", "状态", "发现时间", "更新时间")
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT("路径") DO UPDATE SET
+                "文件大小" = excluded."文件大小",
+                "修改时间" = excluded."修改时间",
+                "状态" = excluded."状态",
+                "尝试次数" = 0,
+                "最近错误" = NULL,
+                "更新时间" = excluded."更新时间"
+            WHERE "文件大小" != excluded."文件大小" OR "修改时间" != excluded."修改时间"
+        """, rows)
+        self.conn.commit()
+
+    def claim(self, path, app_name=None):
+        """
+        开始识别一张截图前调用：需要识别时置为 running 并累加尝试次数
+
+        :return: 是否需要识别（done / quarantined 且文件未变化的截图返回 False）
+        """
+        row = self.conn.execute(
+            f'SELECT "状态", "尝试次数", "文件大小", "修改时间" FROM {JOB_LEDGER_TABLE} WHERE "路径" = ?',
+            (path,)).fetchone()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if row is None or (row[2], row[3]) != (stat.st_size, stat.st_mtime):
+            # 未登记或登记后又变化的文件（如监听模式提交的文件）重新登记
+            self.discover([path], app_name)
+            row = (PENDING, 0)
+        status, attempts = row[0], row[1]
+        if status in (DONE, QUARANTINED):
+            self.skipped_count += 1
+            return False
+        if attempts >= self.max_attempts:
+            # 上次识别到一半进程退出（running）或已失败多次：隔离
+            self._update(path, QUARANTINED, f"尝试 {attempts} 次仍未成功（上次状态 {status}）")
+            logger.warning(f"截图已尝试识别 {attempts} 次仍未成功，隔离: {path}")
+            self.skipped_count += 1
+            return False
+        if status == RUNNING:
+            logger.warning(f"上次识别该截图时进程中断，重新识别（第 {attempts + 1} 次）: {path}")
+        self.conn.execute(
+            f'UPDATE {JOB_LEDGER_TABLE} SET "状态" = ?, "尝试次数" = "尝试次数" + 1, "更新时间" = ? '
+            f'WHERE "路径" = ?', (RUNNING, _now(), path))
+        self._commit()
+        self.claimed_count += 1
+        return True
+
+    def finish(self, path, ok, error=None):
+        """
+        识别结束后调用：成功置为 done；失败置为 failed，尝试次数已达上限时置为 quarantined
+        """
+        if ok:
+            self._update(path, DONE, None)
+            return
+        row = self.conn.execute(
+            f'SELECT "尝试次数" FROM {JOB_LEDGER_TABLE} WHERE "路径" = ?', (path,)).fetchone()
+        attempts = row[0] if row else 0
+        if attempts >= self.max_attempts:
+            logger.warning(f"截图已尝试识别 {attempts} 次仍未成功，隔离: {path}")
+            self._update(path, QUARANTINED, error)
+        else:
+            self._update(path, FAILED, error)
+
+    def _update(self, path, status, error):
+        self.conn.execute(
+            f'UPDATE {JOB_LEDGER_TABLE} SET "状态" = ?, "最近错误" = ?, "更新时间" = ? WHERE "路径" = ?',
+            (status, error, _now(), path))
+        self._commit()
+
+    def _commit(self):
+        with SQLITE_COMMIT_SECONDS.labels("job_ledger").time():
+            self.conn.commit()
+
+    def reset(self, statuses=(FAILED, QUARANTINED)):
+        """
+        将指定状态的截图重新置为 pending（尝试次数清零），如修复蒙版后重新识别被隔离的截图
+
+        :return: 重置的条数
+        """
+        placeholders = ','.join('?' * len(statuses))
+        cursor = self.conn.execute(
+            f'UPDATE {JOB_LEDGER_TABLE} SET "状态" = ?, "尝试次数" = 0, "最近错误" = NULL, "更新时间" = ? '
+            f'WHERE "状态" IN ({placeholders})', (PENDING, _now(), *statuses))
+        self.conn.commit()
+        return cursor.rowcount
+
+    def prune(self, days=OCR_JOB_LEDGER_DAYS):
+        """
+        删除 days 天前登记的台账记录（对应目录已被清理）
+        """
+        cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        cursor = self.conn.execute(f'DELETE FROM {JOB_LEDGER_TABLE} WHERE "发现时间" < ?', (cutoff,))
+        self.conn.commit()
+        return cursor.rowcount
+
+    def status_counts(self):
+        """各状态的截图数 {状态: 数量}"""
+        return dict(self.conn.execute(
+            f'SELECT "状态", COUNT(*) FROM {JOB_LEDGER_TABLE} GROUP BY "状态"').fetchall())
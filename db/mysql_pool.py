@@ -0,0 +1,201 @@
+"""
+远程MySQL连接池模块
+
+为 db 包内所有远程同步函数提供共享、可复用的 pymysql 连接：
+- 连接数有上限（环境变量 MYSQL_POOL_SIZE，默认 4）
+- 借出前做健康检查（ping），断线时自动重连
+- 归还时回滚未提交的事务，连接保持常驻，供后续同步复用
+
+用法：
+    pool = get_mysql_pool()
+    if pool:
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                ...
+            conn.commit()
+"""
+
+import atexit
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from core.logger import logger
+from db.remote_schema import RemoteSchemaCache
+
+
+def get_mysql_config():
+    """
+    从环境变量获取远程MySQL数据库配置
+    """
+    return {
+        "host": os.getenv("MYSQL_HOST", "localhost"),
+        "port": int(os.getenv("MYSQL_PORT", 3306)),
+        "user": os.getenv("MYSQL_USER", ""),
+        "password": os.getenv("MYSQL_PASSWORD", ""),
+        "database": os.getenv("MYSQL_DATABASE", "")
+    }
+
+
+def is_mysql_configured(db_config):
+    """
+    判断远程数据库配置是否完整
+    """
+    return all([db_config.get("host"), db_config.get("user"), db_config.get("password"), db_config.get("database")])
+
+
+class MySQLPool:
+    """有界的 pymysql 连接池（线程安全）"""
+
+    def __init__(self, db_config, max_size=4, timeout=30):
+        """
+        :param db_config: 数据库配置字典，见 get_mysql_config
+        :param max_size: 连接数上限
+        :param timeout: 连接全部借出时，等待归还的最长秒数
+        """
+        self.db_config = db_config
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()  # 后进先出，优先复用最近用过的热连接
+        self._created = 0  # 已创建（含借出中）的连接数
+        self._lock = threading.Lock()
+        self._closed = False
+        self.schema = RemoteSchemaCache()  # 该库的表结构缓存，随连接池在进程内共享
+
+    def _connect(self):
+        import pymysql
+        return pymysql.connect(
+            host=self.db_config.get("host", "localhost"),
+            port=self.db_config.get("port", 3306),
+            user=self.db_config.get("user", ""),
+            password=self.db_config.get("password", ""),
+            database=self.db_config.get("database", ""),
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor,
+            use_unicode=True,
+            ssl_disabled=True,  # 对应 useSSL=false
+            init_command="SET SESSION time_zone='+08:00'"  # 对应 serverTimezone=Asia/Shanghai
+        )
+
+    def _new_connection(self):
+        """在连接数上限内新建连接，超出上限返回 None"""
+        with self._lock:
+            if self._created >= self.max_size:
+                return None
+            self._created += 1
+        try:
+            conn = self._connect()
+            logger.debug(f"MySQL连接池新建连接，当前连接数: {self._created}/{self.max_size}")
+            return conn
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard(self, conn):
+        """丢弃一个连接，释放其占用的名额"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def acquire(self):
+        """
+        借出一个连接：优先复用空闲连接，其次新建，都不行则等待归还。
+        借出前会 ping 检查连接，断线时自动重连。
+        """
+        if self._closed:
+            raise RuntimeError("MySQL连接池已关闭")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._new_connection()
+            if conn is not None:
+                return conn
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(f"等待MySQL连接超时（{self.timeout}秒），连接池上限: {self.max_size}")
+
+        # 健康检查：ping 失败时 pymysql 会尝试重连
+        try:
+            conn.ping(reconnect=True)
+        except Exception as e:
+            logger.warning(f"MySQL连接健康检查失败，重新建立连接: {str(e)}")
+            self._discard(conn)
+            conn = self._new_connection()
+            if conn is None:  # 理论上不会发生：刚释放了一个名额
+                raise TimeoutError("MySQL连接池已满，无法重建连接")
+        return conn
+
+    def release(self, conn, broken=False):
+        """
+        归还连接。broken=True 或回滚失败时，直接丢弃该连接。
+        """
+        if broken or self._closed:
+            self._discard(conn)
+            return
+        try:
+            conn.rollback()  # 清理借用方未提交的事务
+        except Exception as e:
+            logger.warning(f"MySQL连接归还时回滚失败，丢弃该连接: {str(e)}")
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """以上下文管理器方式借用连接，退出时自动归还"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """关闭连接池中所有空闲连接，借出中的连接会在归还时关闭"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+# 按数据库配置区分的连接池（同一进程内共享）
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_mysql_pool(db_config=None):
+    """
+    获取共享连接池。未配置远程数据库时返回 None。
+
+    :param db_config: 数据库配置字典，默认从环境变量读取
+    """
+    if db_config is None:
+        db_config = get_mysql_config()
+    if not is_mysql_configured(db_config):
+        return None
+    key = tuple(sorted(db_config.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = MySQLPool(db_config, max_size=int(os.getenv("MYSQL_POOL_SIZE", "4")))
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    """关闭所有连接池（进程退出时自动调用）"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+atexit.register(close_all_pools)
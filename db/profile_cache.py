@@ -0,0 +1,141 @@
+"""
+用户信息去重缓存
+
+同一账号的 profile_url.json / user_info.json 会出现在多个设备目录和日期目录下，
+以前每出现一次就同步一次远程库。这里在本地 ocr_data.db 中按
+(应用, 账号ID, 主页链接, 采集日期) 记录最近一次成功推送的用户信息及其哈希：
+- 与已推送内容相同的用户信息直接跳过（哈希包含设备IP：远程表会更新 device_ip，
+  同一账号换设备采集后仍会推送一次）
+- 有变化的用户信息在本轮内合并（同一键只保留最后一次），在本轮结束时一次性批量推送
+"""
+
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+
+from core.logger import logger, sampled
+from core.profiler import staged
+from db import db_path
+from db.data_sync import sync_user_info_entries_to_remote
+
+USER_INFO_CACHE_TABLE = "s_user_info_cache"
+# 参与哈希的用户信息字段
+USER_INFO_FIELDS = ("nickname", "follows", "fans", "interaction", "profile_url", "collect_time")
+
+
+def normalize_user_info(user_info):
+    """规范化用户信息：只保留同步字段，统一转为去除首尾空白的字符串"""
+    return {field: '' if user_info.get(field) is None else str(user_info.get(field)).strip()
+            for field in USER_INFO_FIELDS}
+
+
+def compute_user_info_hash(normalized):
+    return hashlib.sha1(json.dumps(normalized, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def ensure_user_info_cache_table(conn):
+    """
+    创建本地用户信息缓存表（如不存在）
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {USER_INFO_CACHE_TABLE} (
+            "应用" TEXT,
+            "账号ID" TEXT,
+            "链接" TEXT,
+            "采集日期" TEXT,
+            "用户信息" TEXT,
+            "哈希" TEXT,
+            "同步时间" TEXT,
+            UNIQUE("应用", "账号ID", "链接", "采集日期")
+        )
+    """)
+    conn.commit()
+
+
+class UserInfoBatch:
+    """
+    一轮处理中收集需要同步的用户信息，结束时调用 flush() 批量推送
+
+    整个批次复用一个本地库连接，用完调用 close()（或使用 with 语句）
+    """
+
+    def __init__(self, path=None):
+        self.db_path = path or db_path
+        self.conn = sqlite3.connect(self.db_path)
+        ensure_user_info_cache_table(self.conn)
+        self.pending = {}  # {(应用, 账号ID, 链接, 采集日期): (用户信息, 应用, 设备IP, 账号ID, 规范化信息, 哈希)}
+        self.skipped_count = 0
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _load_hash(self, key):
+        row = self.conn.execute(
+            f'SELECT "哈希" FROM {USER_INFO_CACHE_TABLE} '
+            f'WHERE "应用" = ? AND "账号ID" = ? AND "链接" = ? AND "采集日期" = ?', key).fetchone()
+        return row[0] if row else None
+
+    def add(self, user_info, app_name, ip_port, account_id):
+        """
+        登记一条用户信息；与上次推送的内容相同时跳过，否则等待 flush() 时推送
+
+        :return: 是否需要推送
+        """
+        normalized = normalize_user_info(user_info)
+        key = (app_name, str(account_id), normalized["profile_url"], normalized["collect_time"])
+        normalized["device_ip"] = '' if ip_port is None else str(ip_port).strip()
+        row_hash = compute_user_info_hash(normalized)
+        try:
+            synced_hash = self._load_hash(key)
+        except Exception as e:
+            logger.warning(f"读取用户信息缓存失败: {e}")
+            synced_hash = None
+        if synced_hash == row_hash:
+            self.skipped_count += 1
+            sampled("user_info").info(f"用户信息未变化，跳过同步: {app_name} {account_id} {normalized['nickname']}")
+            return False
+        # 同一键在本轮内多次出现时只保留最后一次
+        self.pending[key] = (user_info, app_name, ip_port, account_id, normalized, row_hash)
+        return True
+
+    @staged("sync")
+    def flush(self):
+        """
+        批量推送本轮有变化的用户信息，并记录推送成功的哈希
+
+        :return: 推送成功的条数
+        """
+        if not self.pending:
+            if self.skipped_count:
+                logger.info(f"用户信息均未变化，跳过 {self.skipped_count} 条")
+                self.skipped_count = 0
+            return 0
+        items = list(self.pending.items())
+        self.pending = {}
+        logger.info(f"批量同步用户信息 {len(items)} 条（未变化跳过 {self.skipped_count} 条）")
+        self.skipped_count = 0
+        synced_indices = sync_user_info_entries_to_remote(
+            [(user_info, app_name, ip_port, account_id) for _, (user_info, app_name, ip_port, account_id, _, _) in items])
+        if not synced_indices:
+            return 0
+
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            self.conn.executemany(
+                f'INSERT OR REPLACE INTO {USER_INFO_CACHE_TABLE} '
+                f'("应用", "账号ID", "链接", "采集日期", "用户信息", "哈希", "同步时间") VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(*items[i][0], json.dumps(items[i][1][4], ensure_ascii=False), items[i][1][5], now)
+                 for i in synced_indices])
+            self.conn.commit()
+        except Exception as e:
+            logger.error(f"保存用户信息缓存失败: {e}")
+        return len(synced_indices)
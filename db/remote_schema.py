@@ -0,0 +1,75 @@
+"""
+远程MySQL表结构缓存模块
+
+每次同步运行只查询一次 information_schema（运行开始时由 db/data_sync.reset_remote_schema_cache 清空），缓存：
+- 远程库中所有表及其列名
+- 各表的唯一索引（含主键）
+
+同步函数据此判断表是否存在、过滤远程表不存在的列，无需每次调用都执行 SHOW TABLES。
+建表或改表后调用 invalidate() 使缓存失效，下次访问时重新加载。
+"""
+
+import threading
+
+from core.logger import logger
+
+
+class RemoteSchemaCache:
+    """远程库表结构缓存（线程安全，随连接池共享，每次同步运行开始时清空）"""
+
+    def __init__(self):
+        self._columns = None  # {表名: [列名...]}，按列顺序
+        self._unique_keys = None  # {表名: {索引名: [列名...]}}
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self, cursor):
+        if self._columns is not None:
+            return
+        with self._lock:
+            if self._columns is not None:
+                return
+            cursor.execute("""
+                SELECT TABLE_NAME AS table_name, COLUMN_NAME AS column_name
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """)
+            columns = {}
+            for row in cursor.fetchall():
+                columns.setdefault(row["table_name"], []).append(row["column_name"])
+
+            cursor.execute("""
+                SELECT TABLE_NAME AS table_name, INDEX_NAME AS index_name, COLUMN_NAME AS column_name
+                FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE() AND NON_UNIQUE = 0
+                ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+            """)
+            unique_keys = {}
+            for row in cursor.fetchall():
+                unique_keys.setdefault(row["table_name"], {}).setdefault(row["index_name"], []).append(
+                    row["column_name"])
+
+            self._unique_keys = unique_keys
+            self._columns = columns
+            logger.info(f"已加载远程库表结构缓存，共 {len(columns)} 张表")
+
+    def table_exists(self, cursor, table_name):
+        """远程表是否存在"""
+        self._ensure_loaded(cursor)
+        return table_name in self._columns
+
+    def get_columns(self, cursor, table_name):
+        """远程表的列名列表，表不存在时返回空列表"""
+        self._ensure_loaded(cursor)
+        return self._columns.get(table_name, [])
+
+    def get_unique_keys(self, cursor, table_name):
+        """远程表的唯一索引 {索引名: [列名...]}，包含主键 PRIMARY"""
+        self._ensure_loaded(cursor)
+        return self._unique_keys.get(table_name, {})
+
+    def invalidate(self):
+        """清空缓存（建表、改表后调用）"""
+        with self._lock:
+            self._columns = None
+            self._unique_keys = None
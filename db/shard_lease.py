@@ -0,0 +1,267 @@
+"""
+多节点分片处理：分片租约表
+
+多台机器共享同一个 OCR 目录（如 NFS 挂载）时，以 (应用, 硬件, 日期, 设备) 目录为分片，
+各节点通过共享库中的租约表领取分片，避免重复识别：
+- 领取：分片空闲、租约已过期（持有节点宕机）、或已完成但目录内容有变化时，写入本节点ID与租约到期时间
+- 心跳：持有期间后台线程每 1/3 个租约周期续约一次；续约失败（租约已被其它节点接管）时停止处理该分片
+- 释放：处理完成标记为 done 并记录目录签名（文件数 + 最新修改时间），内容不变时其它节点不再领取；
+  中途出错标记为 pending，其它节点可立即领取
+
+识别结果照常写入各节点本地 ocr_data.db，再由数据同步推送到同一组远程表。
+
+环境变量：
+    OCR_SHARD_BACKEND   off（默认，单机）/ mysql（生产，使用 MYSQL_* 配置的远程库）/ sqlite（本地测试）
+    OCR_SHARD_DB        sqlite 后端的数据库文件，默认 db/shard_lease.db
+    OCR_WORKER_ID       节点ID，默认 <主机名>-<进程号>
+    OCR_LEASE_SECONDS   租约时长（秒），默认 300
+
+租约到期时间使用各节点的本地时钟，节点间需保持时间同步（NTP）。
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from core.logger import logger
+
+load_dotenv()
+
+SHARD_LEASE_TABLE = "s_ocr_shard_lease"
+OCR_SHARD_BACKEND = os.getenv("OCR_SHARD_BACKEND", "off").strip().lower()
+OCR_SHARD_DB = os.getenv("OCR_SHARD_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shard_lease.db'))
+OCR_WORKER_ID = os.getenv("OCR_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+OCR_LEASE_SECONDS = int(os.getenv("OCR_LEASE_SECONDS", "300"))
+
+PENDING, RUNNING, DONE = "pending", "running", "done"
+
+
+def shard_signature(root, files):
+    """目录签名：文件数 + 最新修改时间，用于判断已完成的分片是否有新文件"""
+    latest = 0
+    for filename in files:
+        try:
+            latest = max(latest, os.stat(os.path.join(root, filename)).st_mtime_ns)
+        except OSError:
+            continue
+    return f"{len(files)}:{latest}"
+
+
+class SqliteLeaseStore:
+    """SQLite 租约表（本地测试或同一台机器上的多个进程）"""
+
+    placeholder = "?"
+
+    def __init__(self, path=OCR_SHARD_DB):
+        self.path = path
+        with self.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {SHARD_LEASE_TABLE} (
+                    shard_key TEXT PRIMARY KEY,
+                    worker_id TEXT,
+                    status TEXT,
+                    lease_until REAL,
+                    signature TEXT,
+                    updated_at TEXT
+                )
+            """)
+
+    @contextmanager
+    def cursor(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn.cursor()
+            conn.commit()
+        finally:
+            conn.close()
+
+    def insert_ignore_sql(self):
+        return f"INSERT OR IGNORE INTO {SHARD_LEASE_TABLE}"
+
+
+class MysqlLeaseStore:
+    """MySQL 租约表（生产环境，多台机器共享）"""
+
+    placeholder = "%s"
+
+    def __init__(self, db_config=None):
+        from db.mysql_pool import get_mysql_pool
+        self.pool = get_mysql_pool(db_config)
+        if self.pool is None:
+            raise RuntimeError("OCR_SHARD_BACKEND=mysql 但远程数据库未配置（MYSQL_HOST / MYSQL_USER 等）")
+        with self.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {SHARD_LEASE_TABLE} (
+                    shard_key VARCHAR(512) PRIMARY KEY,
+                    worker_id VARCHAR(128),
+                    status VARCHAR(16),
+                    lease_until DOUBLE,
+                    signature VARCHAR(64),
+                    updated_at DATETIME
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+
+    @contextmanager
+    def cursor(self):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                yield cursor
+            conn.commit()
+
+    def insert_ignore_sql(self):
+        return f"INSERT IGNORE INTO {SHARD_LEASE_TABLE}"
+
+
+class ShardLeaseManager:
+    """
+    用法：
+        shards = get_shard_manager()
+        if shards is None or shards.acquire(shard_key, signature):
+            try:
+                for ...:
+                    if shards and shards.lost(shard_key):
+                        break
+                    ...
+            finally:
+                shards.release(shard_key, done=...)
+    """
+
+    def __init__(self, store, worker_id=OCR_WORKER_ID, lease_seconds=OCR_LEASE_SECONDS):
+        self.store = store
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._held = {}  # {分片: 是否仍持有}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _sql(self, sql):
+        return sql.replace("?", self.store.placeholder)
+
+    def acquire(self, shard_key, signature):
+        """
+        尝试领取分片
+
+        :param signature: 当前目录签名（见 shard_signature）
+        :return: 是否领取成功
+        """
+        now = time.time()
+        updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            with self.store.cursor() as cursor:
+                cursor.execute(self._sql(
+                    f"{self.store.insert_ignore_sql()} (shard_key, worker_id, status, lease_until, signature, updated_at) "
+                    f"VALUES (?, ?, ?, ?, ?, ?)"), (shard_key, "", PENDING, 0, "", updated_at))
+                cursor.execute(self._sql(
+                    f"UPDATE {SHARD_LEASE_TABLE} SET worker_id = ?, status = ?, lease_until = ?, signature = ?, "
+                    f"updated_at = ? WHERE shard_key = ? AND ("
+                    f"status = ? OR (status = ? AND (lease_until < ? OR worker_id = ?)) "
+                    f"OR (status = ? AND signature <> ?))"),
+                    (self.worker_id, RUNNING, now + self.lease_seconds, signature, updated_at, shard_key,
+                     PENDING, RUNNING, now, self.worker_id, DONE, signature))
+                acquired = cursor.rowcount == 1
+        except Exception as e:
+            logger.error(f"领取分片失败: {shard_key}, 错误: {e}")
+            return False
+        if acquired:
+            with self._lock:
+                self._held[shard_key] = True
+            self._start_heartbeat()
+        return acquired
+
+    def lost(self, shard_key):
+        """分片租约是否已丢失（续约失败，已被其它节点接管）"""
+        with self._lock:
+            return not self._held.get(shard_key, False)
+
+    def release(self, shard_key, done):
+        """
+        释放分片：done=True 标记为已完成，否则标记为 pending 供其它节点立即领取
+        """
+        with self._lock:
+            held = self._held.pop(shard_key, False)
+        if not held:
+            return
+        try:
+            with self.store.cursor() as cursor:
+                cursor.execute(self._sql(
+                    f"UPDATE {SHARD_LEASE_TABLE} SET status = ?, lease_until = ?, updated_at = ? "
+                    f"WHERE shard_key = ? AND worker_id = ?"),
+                    (DONE if done else PENDING, 0, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                     shard_key, self.worker_id))
+        except Exception as e:
+            # 释放失败时租约到期后其它节点仍可接管
+            logger.warning(f"释放分片失败: {shard_key}, 错误: {e}")
+
+    def renew(self):
+        """为持有的全部分片续约，返回续约失败的分片列表"""
+        with self._lock:
+            shard_keys = [key for key, held in self._held.items() if held]
+        lost = []
+        for shard_key in shard_keys:
+            try:
+                with self.store.cursor() as cursor:
+                    cursor.execute(self._sql(
+                        f"UPDATE {SHARD_LEASE_TABLE} SET lease_until = ?, updated_at = ? "
+                        f"WHERE shard_key = ? AND worker_id = ? AND status = ?"),
+                        (time.time() + self.lease_seconds, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                         shard_key, self.worker_id, RUNNING))
+                    renewed = cursor.rowcount == 1
+            except Exception as e:
+                # 网络抖动：下次心跳再试，租约到期前仍有效
+                logger.warning(f"分片续约失败，稍后重试: {shard_key}, 错误: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"分片租约已被其它节点接管，停止处理: {shard_key}")
+                with self._lock:
+                    if shard_key in self._held:
+                        self._held[shard_key] = False
+                lost.append(shard_key)
+        return lost
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is not None and self._heartbeat.is_alive():
+                return
+            self._stop.clear()
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="shard-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        interval = max(1.0, self.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            with self._lock:
+                if not self._held:
+                    self._heartbeat = None
+                    return
+            self.renew()
+
+    def close(self):
+        """释放全部未完成的分片并停止心跳"""
+        with self._lock:
+            shard_keys = list(self._held)
+        for shard_key in shard_keys:
+            self.release(shard_key, done=False)
+        self._stop.set()
+
+
+def get_shard_manager():
+    """
+    按 OCR_SHARD_BACKEND 创建分片租约管理器，未启用（off）时返回 None
+    """
+    if OCR_SHARD_BACKEND in ("", "off"):
+        return None
+    if OCR_SHARD_BACKEND == "sqlite":
+        store = SqliteLeaseStore()
+    elif OCR_SHARD_BACKEND == "mysql":
+        store = MysqlLeaseStore()
+    else:
+        raise ValueError(f"未知的分片后端: {OCR_SHARD_BACKEND}，可选 off / sqlite / mysql")
+    logger.info(f"多节点分片处理已启用（{OCR_SHARD_BACKEND}），节点ID: {OCR_WORKER_ID}，租约 {OCR_LEASE_SECONDS} 秒")
+    return ShardLeaseManager(store)
@@ -2,7 +2,7 @@
 
 """
 XHS-OCR 主入口文件
-支持定时任务和手动执行两种模式
+支持定时任务、手动执行和目录监听三种模式
 """
 
 import os
@@ -20,8 +20,18 @@ from db.pipeline import run_data_processing_pipeline
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from dotenv import load_dotenv
-from core.run import process_images
-from db.data_sync import sync_explore_data_to_remote
+from core.run import process_images, process_job, resolve_file_context, get_recent_dates, ocr_root
+from core.watcher import ImageWatcher
+from core.coordinator import RunCoordinator, OVERLAP_POLICIES
+from core.debug_overlay import overlay_writer
+from core.ocr_engine import shutdown_idle_ocr_engine, shutdown_ocr_engine
+from core.settings import reload_config_if_changed
+from core.metrics import QUEUE_DEPTH, maybe_write_textfile
+from core.profiler import PROFILE_MODES, configure as configure_profiling, profile_run, stage
+from db.profile_cache import UserInfoBatch
+from db.job_ledger import JobLedger
+from db.shard_lease import OCR_SHARD_BACKEND
+from db.data_sync import sync_explore_data_to_remote, reset_remote_schema_cache
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -55,7 +65,7 @@ def cleanup_old_directories(days_ago=2):
 
 def run_ocr_task():
     """
-    执行OCR识别任务
+    执行OCR识别任务，出错时记录日志后抛出异常（由 RunCoordinator 记为失败的运行）
     """
     cleanup_old_directories(2)  # 清理2天前的数据
 
@@ -65,85 +75,139 @@ def run_ocr_task():
         logger.info(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] OCR识别任务执行完成")
     except Exception as e:
         logger.error(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] OCR识别任务执行出错: {e}")
+        raise
 
 
-def run_sync_task():
+# 同步到远程的本地表: [(本地表, 远程表)]
+SYNC_TABLES = [
+    ('s_xhs_data_overview_traffic_analysis', 's_xhs_data_overview_traffic_analysis'),
+    ('s_tiktok_analysis_overview_ocr', 's_xhs_data_overview_traffic_analysis'),
+]
+
+
+def run_sync_task(full_resync=False):
     """
-    执行数据同步任务
+    执行数据同步任务，任一表同步出错时记录日志后抛出异常（由 RunCoordinator 记为失败的运行）
+    :param full_resync: 是否忽略增量同步状态，全量重新推送
+    :return: 同步成功时返回 True
     """
     logger.info(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始执行数据同步任务...")
     try:
+        # 远程表结构按运行缓存：长驻进程每次运行重新加载
+        reset_remote_schema_cache()
         # 本地数据加工
         day = int(os.getenv("OCR_RECENT_DAYS", "2"))
-        run_data_processing_pipeline(days=day)
-        # 数据同步
-        sync_explore_data_to_remote(table_name='s_xhs_data_overview_traffic_analysis'
-                                    , remote_table_name='s_xhs_data_overview_traffic_analysis'
-                                    , time_filter={"column": "采集日期", "days": day})
-
-        sync_explore_data_to_remote(table_name='s_tiktok_analysis_overview_ocr'
-                                    , remote_table_name='s_xhs_data_overview_traffic_analysis'
-                                    , time_filter={"column": "采集日期", "days": day})
+        with stage("merge"):
+            run_data_processing_pipeline(days=day)
+        # 数据同步：某张表失败时继续同步其余的表，最后抛出异常
+        errors = []
+        with stage("sync"):
+            for table_name, remote_table_name in SYNC_TABLES:
+                try:
+                    sync_explore_data_to_remote(table_name=table_name
+                                                , remote_table_name=remote_table_name
+                                                , time_filter={"column": "采集日期", "days": day}
+                                                , full_resync=full_resync)
+                except Exception as e:
+                    errors.append(f"{table_name}: {e}")
+        if errors:
+            raise RuntimeError("; ".join(errors))
 
         logger.info(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 数据同步任务执行完成")
+        return True
     except Exception as e:
         logger.error(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 数据同步任务执行出错: {e}")
+        raise
 
 
-def run_all_tasks(sync_enabled=True):
+def run_all_tasks(sync_enabled=True, full_resync=False):
     """
     执行所有任务：OCR识别 + 数据同步
+    OCR识别出错时仍执行数据同步（同步已入库的数据），任一任务出错时最后抛出异常，运行记为失败
     :param sync_enabled: 是否启用数据同步功能
+    :param full_resync: 是否全量重新同步
     """
+    errors = []
     logger.info(f"****[开始]采集数据的加工****")
-    run_ocr_task()
+    try:
+        run_ocr_task()
+    except Exception as e:
+        errors.append(f"OCR识别任务: {e}")
     logger.info(f"****[完成]采集数据的加工****")
     if sync_enabled:
         logger.info(f"****[开始]数据的同步****")
-        run_sync_task()
+        try:
+            run_sync_task(full_resync)
+        except Exception as e:
+            errors.append(f"数据同步任务: {e}")
         logger.info(f"****[完成]数据的同步****")
     else:
         logger.info(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 数据同步功能已禁用")
+    if errors:
+        raise RuntimeError("; ".join(errors))
 
 
-def manual_run(sync_enabled=True):
+def manual_run(sync_enabled=True, full_resync=False, overlap="skip"):
     """
     手动执行模式
     :param sync_enabled: 是否启用数据同步功能
+    :param full_resync: 是否全量重新同步
+    :param overlap: 其它实例正在运行时的策略 skip / coalesce
     """
     logger.info("XHS-OCR 手动执行模式")
-    run_all_tasks(sync_enabled)
+    RunCoordinator(overlap).run(run_all_tasks, sync_enabled, full_resync, trigger="manual")
+    maybe_write_textfile(force=True)
 
 
-def schedule_run(interval, at_time, sync_enabled=True):
+def schedule_run(interval, at_time, sync_enabled=True, full_resync=False, overlap="skip"):
     """
     定时任务模式
     :param interval: 时间间隔（分钟）
     :param at_time: 指定时间（如 "10:00"）
     :param sync_enabled: 是否启用数据同步功能
+    :param full_resync: 第一次执行时是否全量重新同步
+    :param overlap: 上一次任务（或其它实例）仍在运行时的策略 skip / coalesce
     """
     logger.info("XHS-OCR 定时任务模式")
 
     try:
         import schedule
 
+        coordinator = RunCoordinator(overlap)
+        # 全量重新同步只作用于第一次执行，之后恢复增量同步（与监听模式一致）
+        pending_full_resync = [full_resync]
+
+        def scheduled_job():
+            ran, _ = coordinator.run(run_all_tasks, sync_enabled=sync_enabled, full_resync=pending_full_resync[0],
+                                     trigger="schedule")
+            if ran:
+                # 被跳过（其它实例仍在运行）时保留到下一次执行
+                pending_full_resync[0] = False
+
         if at_time:
             # 在指定时间执行
-            schedule.every().day.at(at_time).do(run_all_tasks, sync_enabled=sync_enabled)
+            schedule.every().day.at(at_time).do(scheduled_job)
             logger.info(f"默认配置：每天 {at_time} 执行一次任务")
         elif interval:
             # 按时间间隔执行
-            schedule.every(interval).minutes.do(run_all_tasks, sync_enabled=sync_enabled)
+            schedule.every(interval).minutes.do(scheduled_job)
             logger.info(f"默认配置：每 {interval} 分钟执行一次任务")
         else:
             # 默认每小时执行
-            schedule.every().hour.do(run_all_tasks, sync_enabled=sync_enabled)
+            schedule.every().hour.do(scheduled_job)
             logger.info("默认配置：每小时执行一次任务")
+        if full_resync:
+            logger.info("第一次执行时全量重新同步，之后为增量同步")
 
         logger.info("定时任务已启动，按 Ctrl+C 退出")
 
         while True:
+            # config.ini 修改后重新加载（下次任务生效）
+            reload_config_if_changed()
             schedule.run_pending()
+            # 两次任务之间 OCR 引擎空闲超时后退出，释放内存
+            shutdown_idle_ocr_engine()
+            maybe_write_textfile()
             time.sleep(1)
 
     except ImportError:
@@ -152,6 +216,132 @@ def schedule_run(interval, at_time, sync_enabled=True):
         logger.error("或者使用手动执行模式: python main.py --mode manual")
 
 
+def process_ready_files(ready, processed, user_info_batch, ledger=None):
+    """
+    识别监听到的文件，返回实际识别的文件数
+    :param processed: {路径: (大小, 修改时间)}，跳过未变化的文件
+    :param ledger: 截图识别台账（见 db/job_ledger.py），已识别成功或已隔离的截图跳过
+    """
+    count = 0
+    for file_path in ready:
+        context = resolve_file_context(file_path)
+        if context is None:
+            continue
+        try:
+            stat = os.stat(file_path)
+            signature = (stat.st_size, stat.st_mtime)
+            if processed.get(file_path) == signature:
+                continue
+            logger.info(f"识别新文件: {file_path}")
+            result = process_job(ledger, *context, user_info_batch=user_info_batch)
+            processed[file_path] = signature
+            if result is not None:
+                count += 1
+        except Exception as e:
+            logger.error(f"处理文件出错: {file_path}, 错误: {e}")
+    return count
+
+
+def watch_run(sync_enabled=True, full_resync=False, debounce=5, sync_interval=30, poll_interval=10,
+              overlap="skip"):
+    """
+    目录监听模式：截图落地后即识别，空闲时定期加工与同步
+    :param sync_enabled: 是否启用数据同步功能
+    :param full_resync: 启动时的首次同步是否全量重新同步
+    :param debounce: 文件停止变化多少秒后开始识别
+    :param sync_interval: 数据加工与同步的最小间隔（分钟），只在没有待识别文件时执行
+    :param poll_interval: 未安装 watchdog 时的目录扫描间隔（秒）
+    :param overlap: 启动时的全量处理与定期同步遇到其它实例正在运行时的策略 skip / coalesce
+    """
+    logger.info("XHS-OCR 监听模式")
+    if OCR_SHARD_BACKEND not in ("", "off"):
+        logger.warning("监听模式下新落地的文件由本实例直接识别，不参与多节点分片（仅启动时的全量处理按分片领取）")
+    coordinator = RunCoordinator(overlap)
+    # 新文件的识别总是等待其它实例结束后执行，避免丢失；每批文件不单独输出运行报告
+    file_coordinator = RunCoordinator("coalesce", report_dir=None, profile=False)
+    # 先处理启动前已落地的文件
+    coordinator.run(run_all_tasks, sync_enabled, full_resync, trigger="watch")
+
+    watcher = ImageWatcher(ocr_root, get_recent_dates, debounce=debounce, poll_interval=poll_interval)
+    watcher.start()
+    QUEUE_DEPTH.labels("watch").set_function(lambda: watcher.pending_count)
+    user_info_batch = UserInfoBatch()
+    ledger = JobLedger()
+    processed = {}  # {路径: (大小, 修改时间)}，避免重复识别未变化的文件
+    has_new_data = False
+    last_sync_time = time.time()
+    current_day = datetime.now().strftime('%Y%m%d')
+    logger.info(f"监听已启动（去抖 {debounce} 秒，同步间隔 {sync_interval} 分钟），按 Ctrl+C 退出")
+    try:
+        while True:
+            reload_config_if_changed()
+            maybe_write_textfile()
+            ready = watcher.pop_ready()
+            if ready:
+                _, count = file_coordinator.run(process_ready_files, ready, processed, user_info_batch, ledger,
+                                                trigger="watch-file")
+                has_new_data = has_new_data or bool(count)
+            if ready or watcher.pending_count:
+                time.sleep(0.2)
+                continue
+
+            # 空闲：推送用户信息，按间隔执行数据加工与同步
+            user_info_batch.flush()
+            overlay_writer.flush()
+            shutdown_idle_ocr_engine()
+            if sync_enabled and has_new_data and time.time() - last_sync_time >= sync_interval * 60:
+                _, synced = coordinator.run(run_sync_task, trigger="watch-sync")
+                if synced:
+                    # 同步失败或被跳过时保留标记，下一个同步间隔重试
+                    has_new_data = False
+                last_sync_time = time.time()
+
+            # 跨天后清理旧目录
+            today = datetime.now().strftime('%Y%m%d')
+            if today != current_day:
+                current_day = today
+                cleanup_old_directories(2)
+                processed.clear()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("监听模式退出")
+    finally:
+        watcher.stop()
+        ledger.close()
+        user_info_batch.flush()
+        user_info_batch.close()
+        overlay_writer.flush()
+        shutdown_ocr_engine()
+        maybe_write_textfile(force=True)
+
+
+def serve_run(host="127.0.0.1", port=8765, max_queue=64):
+    """
+    HTTP 服务模式：采集设备上传截图，立即返回识别结果（见 core/ocr_server.py）
+    :param host: 监听地址
+    :param port: 监听端口
+    :param max_queue: 排队等待识别的请求上限，超出时返回 503
+    """
+    import asyncio
+    from core.ocr_server import OcrServer, OcrQueue
+
+    logger.info("XHS-OCR 服务模式")
+
+    async def serve():
+        await OcrServer(host, port, OcrQueue(max_queue=max_queue)).serve_forever()
+
+    try:
+        # 服务模式没有按运行划分，开启剖析时整个服务进程作为一次剖析，退出时写入
+        with profile_run(f"serve-{datetime.now().strftime('%Y%m%d-%H%M%S')}"):
+            asyncio.run(serve())
+    except KeyboardInterrupt:
+        logger.info("服务模式退出")
+    finally:
+        overlay_writer.flush()
+        shutdown_ocr_engine()
+        maybe_write_textfile(force=True)
+
+
 def main():
     """
     主函数
@@ -159,9 +349,9 @@ def main():
     parser = argparse.ArgumentParser(description='XHS-OCR 主程序')
     parser.add_argument(
         '--mode',
-        choices=['manual', 'schedule'],
+        choices=['manual', 'schedule', 'watch', 'serve'],
         default='manual',
-        help='运行模式: manual(手动执行) 或 schedule(定时任务)'
+        help='运行模式: manual(手动执行)、schedule(定时任务)、watch(监听目录，截图落地即识别) 或 serve(HTTP 识别服务)'
     )
     parser.add_argument(
         '--interval',
@@ -183,14 +373,85 @@ def main():
         dest='sync',
         help='禁用数据同步功能'
     )
+    parser.add_argument(
+        '--full-resync',
+        action='store_true',
+        help='忽略增量同步状态，全量重新推送最近N天的数据'
+    )
+    parser.add_argument(
+        '--debounce',
+        type=float,
+        default=5,
+        help='监听模式：文件停止变化多少秒后开始识别（默认 5）'
+    )
+    parser.add_argument(
+        '--sync-interval',
+        type=float,
+        default=30,
+        help='监听模式：数据加工与同步的最小间隔（分钟，默认 30），只在没有待识别文件时执行'
+    )
+    parser.add_argument(
+        '--poll-interval',
+        type=float,
+        default=10,
+        help='监听模式：未安装 watchdog 时扫描目录的间隔（秒，默认 10）'
+    )
+    parser.add_argument(
+        '--overlap',
+        choices=OVERLAP_POLICIES,
+        default='skip',
+        help='上一次任务或其它实例仍在运行时：skip(跳过本次触发，默认) 或 coalesce(等待其结束后执行一次)'
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='服务模式：监听地址（默认 127.0.0.1，仅本机可访问）'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8765,
+        help='服务模式：监听端口（默认 8765）'
+    )
+    parser.add_argument(
+        '--max-queue',
+        type=int,
+        default=64,
+        help='服务模式：排队等待识别的请求上限，超出时返回 503（默认 64）'
+    )
+    parser.add_argument(
+        '--retry-quarantined',
+        action='store_true',
+        help='启动前将识别失败与已隔离的截图重新置为待识别（如修复蒙版后）'
+    )
+    parser.add_argument(
+        '--profile',
+        choices=PROFILE_MODES,
+        help='剖析运行并将结果写入 logs/profile/: sample(采样，开销小) 或 cprofile(函数级统计)，默认取环境变量 OCR_PROFILE'
+    )
+    parser.add_argument(
+        '--profile-rate',
+        type=float,
+        help='被剖析的运行比例（0~1，默认 1），如 0.1 表示约十分之一的定时任务开启剖析'
+    )
     parser.set_defaults(sync=True)
 
     args = parser.parse_args()
+    configure_profiling(args.profile, args.profile_rate)
+
+    if args.retry_quarantined:
+        with JobLedger() as ledger:
+            logger.info(f"已将 {ledger.reset()} 张识别失败或已隔离的截图重新置为待识别")
 
     if args.mode == 'manual':
-        manual_run(args.sync)
+        manual_run(args.sync, args.full_resync, args.overlap)
     elif args.mode == 'schedule':
-        schedule_run(args.interval, args.at_time, args.sync)
+        schedule_run(args.interval, args.at_time, args.sync, args.full_resync, args.overlap)
+    elif args.mode == 'watch':
+        watch_run(args.sync, args.full_resync, args.debounce, args.sync_interval, args.poll_interval,
+                  args.overlap)
+    elif args.mode == 'serve':
+        serve_run(args.host, args.port, args.max_queue)
 
 
 if __name__ == "__main__":
@@ -2,7 +2,7 @@
 
 from .tbpu import Tbpu
 from .parser_tools.line_preprocessing import linePreprocessing  # 行预处理
-from .parser_tools.gap_tree import GapTree  # 间隙树排序算法
+from .parser_tools.gap_tree_np import GapTreeNP  # 间隙树排序算法（NumPy 实现）
 from .parser_tools.paragraph_parse import word_separator  # 上下句间隔符
 
 
@@ -11,7 +11,7 @@ class MultiNone(Tbpu):
         self.tbpuName = "排版解析-多栏-无换行"
 
         # 构建算法对象，指定包围盒的元素位置
-        self.gtree = GapTree(lambda tb: tb["normalized_bbox"])
+        self.gtree = GapTreeNP(lambda tb: tb["normalized_bbox"])
 
     def run(self, textBlocks):
         textBlocks = linePreprocessing(textBlocks)  # 预处理
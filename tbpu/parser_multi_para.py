@@ -2,7 +2,7 @@
 
 from .tbpu import Tbpu
 from .parser_tools.line_preprocessing import linePreprocessing  # 行预处理
-from .parser_tools.gap_tree import GapTree  # 间隙树排序算法
+from .parser_tools.gap_tree_np import GapTreeNP  # 间隙树排序算法（NumPy 实现）
 from .parser_tools.paragraph_parse import ParagraphParse  # 段内分析器
 
 
@@ -11,7 +11,7 @@ class MultiPara(Tbpu):
         self.tbpuName = "排版解析-多栏-自然段"
 
         # 间隙树对象
-        self.gtree = GapTree(lambda tb: tb["normalized_bbox"])
+        self.gtree = GapTreeNP(lambda tb: tb["normalized_bbox"])
 
         # 段内分析器对象
         get_info = lambda tb: (tb["normalized_bbox"], tb["text"])
@@ -0,0 +1,100 @@
+# 【间隙·树·排序算法】 GapTree 的 NumPy 数组实现
+# 与 gap_tree.GapTree 的 cuts / rows / 节点顺序完全一致，仅重写“求行和竖切线”一步：
+#   - 块单元的 bbox 保存为 (N,4) 数组，行划分使用 searchsorted 一次求出
+#   - 各行的间隙由分段累计最大值 (cummax) 向量化求出
+#   - 间隙组更新使用有序区间扫描（二分查找），不再两两比较所有间隙
+
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from .gap_tree import GapTree
+
+
+class GapTreeNP(GapTree):
+    # ======================= 求行和竖切线 =====================
+    """
+    输入输出与 GapTree._get_cuts_rows 相同：
+    输入：文本块单元列表 units=[ ( (x0,y0,x2,y2), _ ) ] 。必须按上到下排序。
+    返回：
+      竖切线列表 cuts=[ ( 左边缘x, 右边缘x, 起始行号, 结束行号 ) ] 。从左到右排序
+      页面上的行 rows=[ [unit...] ] 。从上到下，从左到右排序
+    """
+
+    def _get_cuts_rows(self, units, page_l, page_r):
+        if not units:
+            return [], []
+        page_l -= 1  # 保证页面左右边缘不与文本块重叠
+        page_r += 1
+        boxes = np.array([u[0] for u in units])  # (N,4)
+
+        # ========== 划分行 ==========
+        # 一行从最顶部的块开始，包含顶部不超过该块底部的所有后续块。
+        # units 已按顶部排序，故每个块所能包含的最后位置可由 searchsorted 一次求出
+        row_ends = np.searchsorted(boxes[:, 1], boxes[:, 3], side="right").tolist()
+        row_bounds = []  # 每行在 units 中的 [起, 止)
+        start = 0
+        while start < len(units):
+            end = max(start + 1, row_ends[start])
+            row_bounds.append((start, end))
+            start = end
+        row_ids = np.repeat(np.arange(len(row_bounds)), [e - s for s, e in row_bounds])
+
+        # 行内从左到右排序（稳定排序，与 list.sort 的并列顺序一致）
+        order = np.lexsort((boxes[:, 2], boxes[:, 0], row_ids))
+        order_list = order.tolist()
+        rows = [[units[i] for i in order_list[s:e]] for s, e in row_bounds]
+
+        # ========== 求每行的间隙 ==========
+        lefts = boxes[order, 0]
+        rights = boxes[order, 2]
+        row_ids = row_ids[order]
+        # 行内右边缘的累计最大值。先转为名次（整数）再按行加偏移，保证分段且精确
+        uniq_rights, ranks = np.unique(rights, return_inverse=True)
+        offset = row_ids * len(uniq_rights)
+        cum_rights = uniq_rights[np.maximum.accumulate(ranks + offset) - offset]
+        first_in_row = np.ones(len(units), dtype=bool)
+        first_in_row[1:] = row_ids[1:] != row_ids[:-1]
+        # 每个块左侧的搜索起点：行首为页面左边缘，否则为行内之前各块右边缘的最大值
+        search_starts = np.empty(len(units), dtype=np.result_type(cum_rights, page_l))
+        search_starts[0] = page_l
+        search_starts[1:] = cum_rights[:-1]
+        search_starts[first_in_row] = page_l
+        search_starts = np.maximum(search_starts, page_l)
+        has_gap = (lefts > search_starts).tolist()
+        search_starts = search_starts.tolist()
+        lefts = lefts.tolist()
+        row_lasts = np.maximum(cum_rights[[e - 1 for _, e in row_bounds]], page_l).tolist()
+
+        # ========== 逐行更新考察中的间隙组 ==========
+        completed_cuts = []  # 已生成完毕的竖切线 [ ( 左边缘x, 右边缘x , 起始行号, 结束行号 ) ]
+        gaps = []  # 考察中的间隙 [ (左边缘x, 右边缘x , 开始行号) ]
+        for row_index, (s, e) in enumerate(row_bounds):
+            # 当前行的间隙，左右边缘均为非递减序列
+            gaps_l = [search_starts[k] for k in range(s, e) if has_gap[k]]
+            gaps_r = [lefts[k] for k in range(s, e) if has_gap[k]]
+            gaps_l.append(row_lasts[row_index])
+            gaps_r.append(page_r)
+            # 与 gap1 相交的 gap2 为连续区间 [lo, hi)
+            new_gaps = []
+            added = [True] * len(gaps_l)  # gaps2[i] 是否新加入
+            for g1 in gaps:
+                l1, r1, _ = g1
+                lo = bisect_left(gaps_r, l1)
+                hi = bisect_right(gaps_l, r1)
+                if lo >= hi:  # 没有任何交集，彻底移除
+                    completed_cuts.append((*g1, row_index - 1))
+                    continue
+                for i2 in range(lo, hi):
+                    new_gaps.append((max(l1, gaps_l[i2]), min(r1, gaps_r[i2]), g1[2]))
+                    added[i2] = False
+            for i2, flag in enumerate(added):
+                if flag:
+                    new_gaps.append((gaps_l[i2], gaps_r[i2], row_index))
+            gaps = new_gaps
+        # 遍历结束，收集 gaps 中剩余的间隙，组成延伸到最后一行的竖切线
+        row_max = len(rows) - 1
+        for g in gaps:
+            completed_cuts.append((*g, row_max))
+        completed_cuts.sort(key=lambda c: c[0])
+        return completed_cuts, rows
@@ -0,0 +1,61 @@
+"""
+排版解析器对比：默认排序（paddle_position）与 tbpu 解析器的耗时和排序结果
+
+用法：
+    python test/demo/layout_parser_benchmark.py                 # 使用模拟的流量分析面板
+    python test/demo/layout_parser_benchmark.py ocr_result.json # 使用保存的 PaddleOCR 结果（ocr.run 返回的 data 列表）
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.ocr import sort_text_lines  # noqa: E402
+
+PARSER_KEYS = ["paddle_position", "multi_para", "multi_line", "multi_none", "single_line"]
+
+
+def make_panel(rows=4, cols=2, seed=0):
+    """
+    模拟流量分析面板：每格上方是指标名，下方是数值，同一行各格的基线有几像素抖动
+    """
+    rng = random.Random(seed)
+    text_lines = []
+    for r in range(rows):
+        for c in range(cols):
+            x = 40 + c * 360
+            y = 120 + r * 150 + rng.randint(-12, 12)
+            for text, dy, h in ((f"指标{r}-{c}", 0, 32), (f"{rng.randint(0, 9999)}", 48, 44)):
+                w = 24 * len(text)
+                top = y + dy
+                text_lines.append({
+                    "box": [[x, top], [x + w, top], [x + w, top + h], [x, top + h]],
+                    "score": 0.99,
+                    "text": text,
+                })
+    rng.shuffle(text_lines)
+    return text_lines
+
+
+def benchmark(text_lines, repeat=200):
+    for key in PARSER_KEYS:
+        result = sort_text_lines(text_lines, key)  # 预热，同时构建缓存的解析器实例
+        start = time.perf_counter()
+        for _ in range(repeat):
+            sort_text_lines(text_lines, key)
+        cost = (time.perf_counter() - start) / repeat * 1000
+        print(f"{key:<16} {cost:8.3f} ms  {[line['text'] for line in result]}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            data = json.load(f)
+        lines = data["data"] if isinstance(data, dict) else data
+    else:
+        lines = make_panel()
+    benchmark(lines)
@@ -0,0 +1,80 @@
+"""
+ProfileFetcher 演示：用本地静态页面代替小红书用户主页，验证并发抓取与 __INITIAL_STATE__ 等待
+
+每个页面在随机 0.5~2 秒后才写入 window.__INITIAL_STATE__，模拟前端渲染延迟。
+
+用法（需安装 playwright 及 chromium）：
+    python test/demo/profile_fetcher_demo.py [页面数] [并发数]
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.user_profile import ProfileFetcher  # noqa: E402
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"></head><body>
+<script>
+setTimeout(function () {{
+    window.__INITIAL_STATE__ = {{user: {{userPageData: {{_rawValue: {data}}}}}}};
+}}, {delay});
+</script>
+</body></html>
+"""
+
+
+def write_pages(directory, count):
+    for i in range(count):
+        data = {
+            "basicInfo": {"nickname": f"用户{i}", "redId": f"{100000 + i}", "desc": "", "images": ""},
+            "interactions": [
+                {"type": "follows", "count": str(i)},
+                {"type": "fans", "count": str(i * 10)},
+                {"type": "interaction", "count": str(i * 100)},
+            ],
+        }
+        html = PAGE_TEMPLATE.format(data=json.dumps(data, ensure_ascii=False), delay=random.randint(500, 2000))
+        with open(os.path.join(directory, f"profile_{i}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+
+
+def serve(directory):
+    handler = partial(SimpleHTTPRequestHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def main(count, max_contexts):
+    with tempfile.TemporaryDirectory() as directory:
+        write_pages(directory, count)
+        server = serve(directory)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        urls = [f"{base}/profile_{i}.html?xsec_token={i}" for i in range(count)]
+        try:
+            async with ProfileFetcher(max_contexts=max_contexts, cookie_str="", use_cache=False) as fetcher:
+                start = time.perf_counter()
+                results = await fetcher.fetch_many(urls)
+                cost = time.perf_counter() - start
+        finally:
+            server.shutdown()
+    for url, user_info in results.items():
+        print(url, user_info.get("nickname"), user_info.get("fans"))
+    ok = sum(1 for user_info in results.values() if user_info)
+    print(f"成功 {ok}/{count}，并发数 {max_contexts}，耗时 {cost:.2f}s（原实现每个主页固定等待 10s）")
+
+
+if __name__ == "__main__":
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    asyncio.run(main(page_count, concurrency))
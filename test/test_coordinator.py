@@ -0,0 +1,109 @@
+"""
+任务运行协调（core/coordinator.py）测试：其它实例持有文件锁时的 skip / coalesce 策略
+
+另一个实例用单独打开的文件句柄持有锁（与另一个进程加锁效果相同）。
+
+运行：python -m pytest -q test/test_coordinator.py
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.coordinator import RunCoordinator, _try_lock, _unlock  # noqa: E402
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="Windows 下同一进程内的 msvcrt 锁不互斥")
+
+
+@pytest.fixture
+def held_lock(tmp_path):
+    """以另一个文件句柄持有锁，返回 (锁文件路径, 释放函数)"""
+    lock_path = str(tmp_path / "social_ocr.lock")
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT)
+    assert _try_lock(fd)
+    os.write(fd, json.dumps({"pid": 1, "run_id": "other"}).encode("utf-8"))
+    state = {"fd": fd}
+
+    def release():
+        if state["fd"] is not None:
+            _unlock(state["fd"])
+            os.close(state["fd"])
+            state["fd"] = None
+
+    yield lock_path, release
+    release()
+
+
+def reports(report_dir):
+    if not os.path.isdir(report_dir):
+        return []
+    result = []
+    for name in sorted(os.listdir(report_dir)):
+        with open(os.path.join(report_dir, name), encoding="utf-8") as f:
+            result.append(json.load(f))
+    return result
+
+
+def test_skip_when_other_instance_holds_lock(tmp_path, held_lock):
+    lock_path, release = held_lock
+    report_dir = str(tmp_path / "runs")
+    calls = []
+    coordinator = RunCoordinator("skip", lock_path=lock_path, report_dir=report_dir, profile=False)
+    assert coordinator.run(calls.append, 1, trigger="schedule") == (False, None)
+    assert calls == []
+    [report] = reports(report_dir)
+    assert report["status"] == "skipped" and "other" in report["holder"]
+
+    release()
+    assert coordinator.run(lambda: "done", trigger="schedule") == (True, "done")
+
+
+def test_coalesce_waits_for_other_instance(tmp_path, held_lock):
+    lock_path, release = held_lock
+    coordinator = RunCoordinator("coalesce", lock_path=lock_path, report_dir=None, wait_interval=0.05,
+                                 profile=False)
+    started = []
+    result = {}
+
+    def run():
+        result["value"] = coordinator.run(lambda: started.append(time.time()) or "done", trigger="watch")
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    time.sleep(0.3)
+    assert started == []  # 等待其它实例释放锁
+    released_at = time.time()
+    release()
+    thread.join(5)
+    assert result["value"] == (True, "done")
+    assert started[0] >= released_at
+
+
+def test_overlapping_triggers_in_process(tmp_path):
+    lock_path = str(tmp_path / "social_ocr.lock")
+    for policy, expected_runs in (("skip", 1), ("coalesce", 2)):
+        coordinator = RunCoordinator(policy, lock_path=lock_path, report_dir=None, profile=False)
+        runs = []
+        entered = threading.Event()
+        proceed = threading.Event()
+
+        def task():
+            runs.append(1)
+            entered.set()
+            proceed.wait(5)
+
+        thread = threading.Thread(target=coordinator.run, args=(task,), kwargs={"trigger": "schedule"})
+        thread.start()
+        assert entered.wait(5)
+        # 运行期间的多次触发：skip 直接跳过，coalesce 合并为结束后的一次
+        for _ in range(3):
+            assert coordinator.run(task, trigger="watch") == (False, None)
+        proceed.set()
+        thread.join(5)
+        assert len(runs) == expected_runs, policy
@@ -0,0 +1,240 @@
+"""
+远程同步（db/data_sync.py）测试：使用返回字典行的假游标（与连接池的 pymysql DictCursor 一致）
+
+运行：python -m pytest -q test/test_data_sync.py
+"""
+
+import os
+import re
+import sqlite3
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db.data_sync as data_sync  # noqa: E402
+from db.data_sync import (add_missing_columns, map_column_names, prepare_remote_table,  # noqa: E402
+                          reset_remote_schema_cache, sync_explore_data_to_remote)
+from db.remote_schema import RemoteSchemaCache  # noqa: E402
+
+
+class FakeDictCursor:
+    """模拟远程 MySQL：tables 为 {表名: [列名...]}，查询结果为字典行"""
+
+    def __init__(self, tables, unique_keys=None):
+        self.tables = tables
+        self.unique_keys = unique_keys or {}  # {表名: {索引名: [列名...]}}
+        self.statements = []
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        if "information_schema.COLUMNS" in sql:
+            self._rows = [{"table_name": table, "column_name": col}
+                          for table, cols in self.tables.items() for col in cols]
+        elif "information_schema.STATISTICS" in sql:
+            self._rows = [{"table_name": table, "index_name": index, "column_name": col}
+                          for table, indexes in self.unique_keys.items()
+                          for index, cols in indexes.items() for col in cols]
+        elif sql.startswith("SHOW COLUMNS FROM"):
+            table = sql.split()[-1]
+            self._rows = [{"Field": col, "Type": "text", "Null": "YES", "Key": "", "Default": None, "Extra": ""}
+                          for col in self.tables[table]]
+        elif sql.startswith("ALTER TABLE"):
+            table, col = re.match(r"ALTER TABLE (\S+) ADD COLUMN `([^`]+)`", sql).groups()
+            self.tables[table].append(col)
+            self._rows = []
+        else:
+            raise AssertionError(f"未预期的 SQL: {sql}")
+
+    def fetchall(self):
+        return self._rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_add_missing_columns_reads_dict_rows():
+    cursor = FakeDictCursor({"t_remote": ["title"]})
+    add_missing_columns(cursor, "t_remote", ["作品标题", "采集日期", "新字段"], "db")
+    assert cursor.tables["t_remote"] == ["title", "collection_date", "新字段"]
+    alters = [sql for sql in cursor.statements if sql.startswith("ALTER TABLE")]
+    assert alters == ["ALTER TABLE t_remote ADD COLUMN `collection_date` DATE COMMENT '采集日期'",
+                      "ALTER TABLE t_remote ADD COLUMN `新字段` TEXT"]
+
+
+def test_prepare_remote_table_adds_local_column_and_keeps_it():
+    cursor = FakeDictCursor({"t_remote": ["title", "collection_date"]})
+    kept = prepare_remote_table(RemoteSchemaCache(), cursor, "t_remote", ["作品标题", "采集日期", "新字段"])
+    assert kept == [0, 1, 2]
+    assert cursor.tables["t_remote"] == ["title", "collection_date", "新字段"]
+
+
+def test_prepare_remote_table_no_alter_when_complete():
+    cursor = FakeDictCursor({"t_remote": ["title", "collection_date"]})
+    assert prepare_remote_table(RemoteSchemaCache(), cursor, "t_remote", ["作品标题", "采集日期"]) == [0, 1]
+    assert not any(sql.startswith(("ALTER", "SHOW")) for sql in cursor.statements)
+
+
+def test_schema_cache_reloads_on_each_run(monkeypatch):
+    schema = RemoteSchemaCache()
+    monkeypatch.setattr(data_sync, "get_mysql_pool", lambda: type("Pool", (), {"schema": schema})())
+    cursor = FakeDictCursor({"t_remote": ["title"]})
+    assert schema.get_columns(cursor, "t_remote") == ["title"]
+    # 运行之间远程表被修改：同一次运行内仍使用缓存，下一次运行重新加载
+    cursor.tables["t_remote"].append("collection_date")
+    assert schema.get_columns(cursor, "t_remote") == ["title"]
+    reset_remote_schema_cache()
+    assert schema.get_columns(cursor, "t_remote") == ["title", "collection_date"]
+
+
+def test_reset_schema_cache_without_remote_db(monkeypatch):
+    monkeypatch.setattr(data_sync, "get_mysql_pool", lambda: None)
+    reset_remote_schema_cache()
+
+
+# ======================= sync_explore_data_to_remote =====================
+LOCAL_COLUMNS = ["账号ID", "作品标题", "链接", "采集日期", "观看数"]
+KEY_COLUMNS = ["账号ID", "链接", "采集时间"]
+
+
+class FakePool:
+    """连接池替身：表结构查询走 FakeDictCursor，写入由 upsert_chunk_with_retry 的替身记录"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.schema = RemoteSchemaCache()
+
+    @contextmanager
+    def connection(self):
+        class Conn:
+            def cursor(conn):
+                return self.cursor
+
+            def commit(conn):
+                pass
+        yield Conn()
+
+
+class FakeRemote:
+    """记录写入远程的行；fail_chunks 中的块号（从 1 开始）写入失败，fail_rows 为逐行写入仍失败的行数"""
+
+    def __init__(self):
+        self.rows = []
+        self.calls = 0
+        self.fail_chunks = set()
+        self.fail_rows = 0
+
+    def upsert(self, pool, insert_sql, rows, label="数据", failed_rows=None):
+        self.calls += 1
+        if self.calls in self.fail_chunks:
+            return False
+        if self.fail_rows and failed_rows is not None:
+            failed_rows.extend(rows[:self.fail_rows])
+            rows = rows[self.fail_rows:]
+        self.rows.extend(rows)
+        return True
+
+
+@pytest.fixture
+def sync_env(tmp_path, monkeypatch):
+    """临时 ocr_data.db（表 s_t）+ 远程表 r_t（含唯一键）"""
+    db_file = tmp_path / "ocr_data.db"
+    conn = sqlite3.connect(db_file)
+    conn.execute(f"CREATE TABLE s_t ({', '.join(f'{chr(34)}{c}{chr(34)} TEXT' for c in LOCAL_COLUMNS)})")
+    today = datetime.now().strftime('%Y%m%d')
+    conn.executemany("INSERT INTO s_t VALUES (?, ?, ?, ?, ?)",
+                     [("acc", f"标题{i}", f"link{i}", today, str(i)) for i in range(10)])
+    conn.commit()
+    conn.close()
+
+    column_names = ["采集时间" if c == "采集日期" else c for c in LOCAL_COLUMNS]
+    cursor = FakeDictCursor({"r_t": list(map_column_names(tuple(column_names)))},
+                            {"r_t": {"uk": list(map_column_names(tuple(KEY_COLUMNS)))}})
+    remote = FakeRemote()
+    monkeypatch.setattr(data_sync, "current_dir", str(tmp_path))
+    monkeypatch.setattr(data_sync, "get_mysql_config", lambda: {"host": "h", "user": "u", "password": "p",
+                                                                 "database": "d", "port": 3306})
+    monkeypatch.setattr(data_sync, "get_mysql_pool", lambda *args: FakePool(cursor))
+    monkeypatch.setattr(data_sync, "upsert_chunk_with_retry", remote.upsert)
+    monkeypatch.setattr(data_sync.time, "sleep", lambda seconds: None)
+    return db_file, remote
+
+
+def sync(full_resync=False, chunk_size=4):
+    sync_explore_data_to_remote(table_name="s_t", remote_table_name="r_t",
+                                time_filter={"column": "采集日期", "days": 2},
+                                chunk_size=chunk_size, full_resync=full_resync)
+
+
+def checkpoints(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute('SELECT "筛选条件", "最后rowid" FROM s_sync_checkpoint').fetchall()
+    finally:
+        conn.close()
+
+
+def test_sync_pushes_all_rows_then_skips_unchanged(sync_env):
+    db_file, remote = sync_env
+    sync()
+    assert len(remote.rows) == 10
+    assert checkpoints(db_file) == []
+    sync()
+    assert len(remote.rows) == 10  # 未变化的行不再推送
+
+
+def test_sync_raises_when_chunk_fails_and_keeps_checkpoint(sync_env):
+    db_file, remote = sync_env
+    remote.fail_chunks = {2}
+    with pytest.raises(RuntimeError, match="第 2 块写入失败"):
+        sync()
+    assert len(remote.rows) == 4
+    assert [rowid for _, rowid in checkpoints(db_file)] == [4]
+    # 下次运行从断点继续
+    sync()
+    assert len(remote.rows) == 10
+    assert checkpoints(db_file) == []
+
+
+def test_sync_raises_when_rows_fail(sync_env):
+    db_file, remote = sync_env
+    remote.fail_rows = 1
+    with pytest.raises(RuntimeError, match="3 行写入远程失败"):
+        sync()
+    # 失败的行未记录哈希，下次运行重新推送
+    remote.fail_rows = 0
+    pushed = len(remote.rows)
+    sync()
+    assert len(remote.rows) - pushed == 3
+
+
+def test_full_resync_does_not_resume_from_delta_checkpoint(sync_env):
+    db_file, remote = sync_env
+    remote.fail_chunks = {2}
+    with pytest.raises(RuntimeError):
+        sync()
+    assert checkpoints(db_file) == [("采集日期:最近2天:增量", 4)]
+    # 全量重新同步从头推送全部行，并清理增量模式的断点
+    pushed = len(remote.rows)
+    sync(full_resync=True)
+    assert len(remote.rows) - pushed == 10
+    assert checkpoints(db_file) == []
+
+
+def test_full_resync_resumes_from_its_own_checkpoint(sync_env):
+    db_file, remote = sync_env
+    remote.fail_chunks = {2}
+    with pytest.raises(RuntimeError):
+        sync(full_resync=True)
+    assert checkpoints(db_file) == [("采集日期:最近2天:全量", 4)]
+    pushed = len(remote.rows)
+    sync(full_resync=True)
+    assert len(remote.rows) - pushed == 6
+    assert checkpoints(db_file) == []
@@ -0,0 +1,96 @@
+"""
+GapTreeNP 与 GapTree 的差分测试：随机文本块下排序结果、行、竖切线与异常完全一致
+
+运行：python -m pytest -q test/test_gap_tree_np.py
+"""
+
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tbpu.parser_tools.gap_tree import GapTree  # noqa: E402
+from tbpu.parser_tools.gap_tree_np import GapTreeNP  # noqa: E402
+
+SEEDS = range(300)
+
+
+def get_bbox(tb):
+    return tb["bbox"]
+
+
+def random_blocks(rng):
+    """
+    随机文本块：整数坐标的网格排版（大量相同的顶部、左右边缘，覆盖并列情况）或任意浮点坐标
+    """
+    count = rng.randint(1, 40)
+    blocks = []
+    if rng.random() < 0.5:
+        cols = rng.randint(1, 4)
+        for i in range(count):
+            col = rng.randrange(cols)
+            x0 = col * 100 + rng.choice([0, 0, 5, 10])
+            y0 = rng.randint(0, 12) * 20
+            w = rng.choice([30, 60, 90, 120])
+            h = rng.choice([10, 20, 30])
+            blocks.append({"id": i, "bbox": (x0, y0, x0 + w, y0 + h)})
+    else:
+        for i in range(count):
+            x0 = rng.uniform(0, 500)
+            y0 = rng.uniform(0, 500)
+            blocks.append({"id": i, "bbox": (x0, y0, x0 + rng.uniform(1, 200), y0 + rng.uniform(1, 40))})
+    return blocks
+
+
+def ids(blocks):
+    return [tb["id"] for tb in blocks]
+
+
+def run_tree(tree, blocks):
+    """返回 (排序结果, 行, 竖切线, 区块) 或 异常类型"""
+    try:
+        result = tree.sort(list(blocks))
+    except Exception as e:
+        return type(e)
+    rows = [[unit[1]["id"] for unit in row] for row in tree.current_rows]
+    nodes = [ids(tbs) for tbs in tree.get_nodes_text_blocks()]
+    return ids(result), rows, tree.current_cuts, nodes
+
+
+def test_cuts_rows_match_random_blocks():
+    for seed in SEEDS:
+        blocks = random_blocks(random.Random(seed))
+        expected = run_tree(GapTree(get_bbox), blocks)
+        actual = run_tree(GapTreeNP(get_bbox), blocks)
+        assert actual == expected, f"seed={seed}"
+
+
+def test_cuts_rows_match_direct_call():
+    # 直接比较 _get_cuts_rows（不经过布局树，覆盖布局树会抛异常的输入）
+    for seed in SEEDS:
+        blocks = random_blocks(random.Random(seed))
+        units, page_l, page_r = GapTree(get_bbox)._get_units(blocks, get_bbox)
+        cuts, rows = GapTree(get_bbox)._get_cuts_rows(units, page_l, page_r)
+        cuts_np, rows_np = GapTreeNP(get_bbox)._get_cuts_rows(units, page_l, page_r)
+        assert cuts_np == cuts, f"seed={seed}"
+        assert [[u[1]["id"] for u in row] for row in rows_np] == [[u[1]["id"] for u in row] for row in rows], \
+            f"seed={seed}"
+
+
+def test_same_exception_on_empty_input():
+    expected = run_tree(GapTree(get_bbox), [])
+    assert isinstance(expected, type) and issubclass(expected, Exception)
+    assert run_tree(GapTreeNP(get_bbox), []) is expected
+
+
+def test_same_result_on_degenerate_blocks():
+    cases = [
+        [{"id": 0, "bbox": (10, 10, 10, 10)}],  # 零宽高
+        [{"id": i, "bbox": (0, 0, 50, 20)} for i in range(5)],  # 完全重叠
+        [{"id": i, "bbox": (i * 10, 0, i * 10 + 100, 20)} for i in range(5)],  # 同一行相互覆盖
+        [{"id": i, "bbox": (0, i * 5, 50, i * 5 + 20)} for i in range(5)],  # 上下相互覆盖
+        [{"id": 0, "bbox": (0, 0, 50, 20)}, {"id": 1, "bbox": (50, 0, 100, 20)}],  # 左右边缘相接
+    ]
+    for blocks in cases:
+        assert run_tree(GapTreeNP(get_bbox), blocks) == run_tree(GapTree(get_bbox), blocks), blocks
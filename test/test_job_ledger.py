@@ -0,0 +1,102 @@
+"""
+截图识别任务台账（db/job_ledger.py）测试：领取、完成、进程中断后重试、隔离与重置
+
+运行：python -m pytest -q test/test_job_ledger.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.job_ledger import DONE, FAILED, PENDING, QUARANTINED, RUNNING, JobLedger  # noqa: E402
+
+
+@pytest.fixture
+def env(tmp_path):
+    """临时台账库 + 3 张截图"""
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"note_data_overview_top#作品{i}.png"
+        path.write_bytes(b"png" * (i + 1))
+        paths.append(str(path))
+    return str(tmp_path / "ocr_data.db"), paths
+
+
+def status(ledger, path):
+    return ledger.conn.execute('SELECT "状态", "尝试次数" FROM s_ocr_job_ledger WHERE "路径" = ?',
+                               (path,)).fetchone()
+
+
+def test_claim_and_finish(env):
+    db_file, paths = env
+    with JobLedger(db_file) as ledger:
+        ledger.discover(paths, "xhs")
+        assert ledger.status_counts() == {PENDING: 3}
+        assert ledger.claim(paths[0])
+        assert status(ledger, paths[0]) == (RUNNING, 1)
+        ledger.finish(paths[0], True)
+        assert status(ledger, paths[0]) == (DONE, 1)
+        # 已完成的截图不再领取；重复登记不改变状态
+        ledger.discover(paths, "xhs")
+        assert not ledger.claim(paths[0])
+        assert ledger.claimed_count == 1 and ledger.skipped_count == 1
+
+
+def test_retry_after_crash(env):
+    db_file, paths = env
+    ledger = JobLedger(db_file)
+    ledger.discover(paths, "xhs")
+    assert ledger.claim(paths[0])
+    ledger.finish(paths[0], True)
+    assert ledger.claim(paths[1])
+    # 识别 paths[1] 时进程退出：不调用 finish，连接直接关闭
+    ledger.close()
+
+    with JobLedger(db_file) as ledger:
+        ledger.discover(paths, "xhs")
+        assert [ledger.claim(path) for path in paths] == [False, True, True]
+        assert status(ledger, paths[1]) == (RUNNING, 2)
+        ledger.finish(paths[1], True)
+        ledger.finish(paths[2], False, "所有蒙版均未识别成功")
+        assert ledger.status_counts() == {DONE: 2, FAILED: 1}
+
+
+def test_quarantine_after_max_attempts_and_reset(env):
+    db_file, paths = env
+    with JobLedger(db_file, max_attempts=2) as ledger:
+        ledger.discover(paths[:1], "xhs")
+        for _ in range(2):
+            assert ledger.claim(paths[0])
+            ledger.finish(paths[0], False, "识别失败")
+        assert status(ledger, paths[0]) == (QUARANTINED, 2)
+        assert not ledger.claim(paths[0])
+        # --retry-quarantined
+        assert ledger.reset() == 1
+        assert status(ledger, paths[0]) == (PENDING, 0)
+        assert ledger.claim(paths[0])
+
+
+def test_crash_at_max_attempts_quarantines(env):
+    db_file, paths = env
+    for _ in range(2):
+        ledger = JobLedger(db_file, max_attempts=2)
+        assert ledger.claim(paths[0], "xhs")
+        ledger.close()  # 每次都在识别中途退出
+    with JobLedger(db_file, max_attempts=2) as ledger:
+        assert not ledger.claim(paths[0], "xhs")
+        assert status(ledger, paths[0])[0] == QUARANTINED
+
+
+def test_changed_file_is_claimed_again(env):
+    db_file, paths = env
+    with JobLedger(db_file) as ledger:
+        ledger.discover(paths[:1], "xhs")
+        assert ledger.claim(paths[0])
+        ledger.finish(paths[0], True)
+        with open(paths[0], "ab") as f:
+            f.write(b"new")
+        assert ledger.claim(paths[0], "xhs")
+        assert status(ledger, paths[0]) == (RUNNING, 1)
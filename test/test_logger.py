@@ -0,0 +1,99 @@
+"""
+日志抽样（core/logger.py）测试：抽样丢弃、同一任务同一类别只抽样一次、出现 WARNING 时补记任务内被丢弃的日志
+
+日志输出到内存中的 sink（与控制台、文件使用相同的 _keep 过滤）。
+
+运行：python -m pytest -q test/test_logger.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import logger as logger_module  # noqa: E402
+from core.logger import job_context, logger, sampled  # noqa: E402
+
+CATEGORY = "test_category"
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    """内存 sink，返回已输出的日志记录列表；默认丢弃 CATEGORY 类别的全部抽样日志"""
+    monkeypatch.setitem(logger_module.LOG_SAMPLE_RATES, CATEGORY, 0)
+    records = []
+    handler_id = logger.add(lambda message: records.append(message.record), level="DEBUG",
+                            filter=logger_module._keep, format="{message}")
+    yield records
+    logger.remove(handler_id)
+
+
+def messages(records):
+    return [record["message"] for record in records]
+
+
+def test_dropped_lines_are_replayed_on_warning(sink):
+    with job_context("a.png"):
+        for i in range(3):
+            sampled(CATEGORY).info(f"尝试蒙版 {i}")
+        logger.info("普通日志")
+        assert messages(sink) == ["普通日志"]
+        logger.warning("识别失败")
+        sampled(CATEGORY).info("之后的日志")
+    assert messages(sink) == ["普通日志", "尝试蒙版 0", "尝试蒙版 1", "尝试蒙版 2", "识别失败"]
+    replayed = sink[1:4]
+    assert all(record["extra"].get("replayed") for record in replayed)
+    assert [record["extra"]["job"] for record in replayed] == ["a.png"] * 3
+    # 补记的日志保留原始时间
+    assert replayed[0]["time"] <= replayed[2]["time"] <= sink[4]["time"]
+
+
+def test_no_replay_without_warning_or_outside_job(sink):
+    with job_context("ok.png"):
+        sampled(CATEGORY).info("成功的截图")
+    sampled(CATEGORY).info("任务外的日志")
+    logger.warning("任务外的警告")
+    logger.error("再次出错")
+    assert messages(sink) == ["任务外的警告", "再次出错"]
+
+
+def test_replay_is_per_job(sink):
+    with job_context("outer.png"):
+        sampled(CATEGORY).info("外层")
+        with job_context("inner.png"):
+            sampled(CATEGORY).info("内层")
+            logger.error("内层出错")
+        logger.warning("外层出错")
+    assert messages(sink) == ["内层", "内层出错", "外层", "外层出错"]
+
+
+def test_sample_decision_once_per_job_and_category(sink, monkeypatch):
+    monkeypatch.setitem(logger_module.LOG_SAMPLE_RATES, CATEGORY, 0.5)
+    # 每个任务第一次抽样的结果决定该类别的全部日志，之后的随机数不影响
+    draws = [0.9, 0.1, 0.1]
+    monkeypatch.setattr(logger_module.random, "random", lambda: draws.pop(0))
+    with job_context("dropped.png"):
+        for i in range(3):
+            sampled(CATEGORY).info(f"dropped {i}")
+    draws[:] = [0.1, 0.9, 0.9]
+    with job_context("kept.png"):
+        for i in range(3):
+            sampled(CATEGORY).info(f"kept {i}")
+    assert messages(sink) == ["kept 0", "kept 1", "kept 2"]
+
+
+def test_rate_one_keeps_everything(sink, monkeypatch):
+    monkeypatch.setitem(logger_module.LOG_SAMPLE_RATES, CATEGORY, 1)
+    sampled(CATEGORY).info("保留")
+    assert messages(sink) == ["保留"]
+
+
+def test_replay_buffer_is_bounded(sink, monkeypatch):
+    monkeypatch.setattr(logger_module, "SAMPLE_BUFFER_SIZE", 5)
+    with job_context("many.png"):
+        for i in range(20):
+            sampled(CATEGORY).debug(f"line {i}")
+        logger.warning("出错")
+    assert messages(sink) == [f"line {i}" for i in range(5)] + ["出错"]
@@ -0,0 +1,48 @@
+"""
+蒙版区域对齐与候选接受规则测试
+
+运行：python -m pytest -q test/test_mask_scoring.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.mask_scoring import align_to_slots, evaluate_lines, is_acceptable  # noqa: E402
+
+
+def line(text, score, x0, y0, x1, y1):
+    return text, score, [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def test_slot_takes_one_line_nearest_center():
+    slots = [(0, 0, 400, 60)]
+    lines = [line("观看来源", 0.99, 0, 0, 100, 20), line("45.2%", 0.95, 150, 20, 250, 45)]
+    texts, confidences = align_to_slots(lines, slots)
+    assert texts == ["45.2%"]
+    assert confidences == [0.95]
+
+
+def test_slot_tie_prefers_higher_confidence():
+    slots = [(0, 0, 200, 40)]
+    lines = [line("1234", 0.80, 50, 10, 150, 30), line("1284", 0.97, 50, 10, 150, 30)]
+    assert align_to_slots(lines, slots) == (["1284"], [0.97])
+
+
+def test_multi_slot_alignment_drops_noise_lines():
+    slots = [(0, 0, 100, 40), (200, 0, 300, 40)]
+    lines = [line("12", 0.99, 10, 10, 90, 30), line("x", 0.99, 80, 0, 95, 10), line("34", 0.98, 210, 10, 290, 30)]
+    texts, _ = align_to_slots(lines, slots)
+    assert texts == ["12", "34"]
+
+
+def test_single_slot_requires_count_match():
+    fields = ["观看来源-首页推荐"]
+    slots = [(0, 0, 400, 60)]
+    noisy = [line("观看来源", 0.99, 0, 0, 100, 20), line("45.2%", 0.99, 150, 20, 250, 45)]
+    candidate = evaluate_lines(noisy, slots, fields)
+    assert candidate["texts"] == ["45.2%"]
+    assert not is_acceptable(candidate, accept_score=0.5)
+    exact = [line("45.2%", 0.99, 150, 20, 250, 45)]
+    assert is_acceptable(evaluate_lines(exact, slots, fields), accept_score=0.5)
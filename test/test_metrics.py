@@ -0,0 +1,84 @@
+"""
+进程内指标（core/metrics.py）测试：Counter / Gauge / 累计分桶 Histogram 的 Prometheus 文本输出
+
+运行：python -m pytest -q test/test_metrics.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.metrics import (REGISTRY, RUNS, Counter, Gauge, Histogram, Registry,  # noqa: E402
+                          write_textfile)
+
+
+def make_registry():
+    registry = Registry()
+    images = registry.register(Counter("t_images_total", "截图数", ("app", "tag")))
+    queue = registry.register(Gauge("t_queue_depth", "队列长度", ("queue",)))
+    seconds = registry.register(Histogram("t_call_seconds", "耗时", buckets=(1, 0.1, 0.5)))
+    return registry, images, queue, seconds
+
+
+def test_render_counter_gauge_histogram():
+    registry, images, queue, seconds = make_registry()
+    images.labels("xhs", "note").inc()
+    images.labels("xhs", "note").inc(2)
+    images.labels("tiktok", 'a"b\\c').inc()
+    queue.labels("watch").set(3)
+    queue.labels("serve").set_function(lambda: 7)
+    for value in (0.05, 0.1, 0.3, 2):
+        seconds.observe(value)
+
+    assert registry.render() == "\n".join([
+        "# HELP t_images_total 截图数",
+        "# TYPE t_images_total counter",
+        't_images_total{app="tiktok",tag="a\\"b\\\\c"} 1',
+        't_images_total{app="xhs",tag="note"} 3',
+        "# HELP t_queue_depth 队列长度",
+        "# TYPE t_queue_depth gauge",
+        't_queue_depth{queue="serve"} 7',
+        't_queue_depth{queue="watch"} 3',
+        "# HELP t_call_seconds 耗时",
+        "# TYPE t_call_seconds histogram",
+        # 分桶按上界排序，计数为累计值（<= 上界的观测数）
+        't_call_seconds_bucket{le="0.1"} 2',
+        't_call_seconds_bucket{le="0.5"} 3',
+        't_call_seconds_bucket{le="1"} 3',
+        't_call_seconds_bucket{le="+Inf"} 4',
+        "t_call_seconds_sum 2.45",
+        "t_call_seconds_count 4",
+    ]) + "\n"
+
+
+def test_histogram_time_and_failing_gauge_function():
+    registry, _, queue, seconds = make_registry()
+    with seconds.time():
+        pass
+    queue.labels("broken").set_function(lambda: 1 / 0)  # 取值出错时不输出该行
+    text = registry.render()
+    assert 't_call_seconds_bucket{le="0.1"} 1' in text
+    assert "t_call_seconds_count 1" in text
+    assert 'queue="broken"' not in text
+
+
+def test_labels_and_registration_errors():
+    registry, images, _, _ = make_registry()
+    with pytest.raises(ValueError):
+        images.labels("xhs")
+    with pytest.raises(ValueError):
+        registry.register(Counter("t_images_total", "重复"))
+
+
+def test_global_registry_and_textfile(tmp_path):
+    RUNS.labels("test-render", "success").inc()
+    text = REGISTRY.render()
+    assert "# TYPE ocr_runs_total counter" in text
+    assert 'ocr_runs_total{trigger="test-render",status="success"} 1' in text
+    assert "# TYPE ocr_engine_call_seconds histogram" in text
+    path = tmp_path / "metrics" / "social_ocr.prom"
+    assert write_textfile(str(path))
+    assert 'trigger="test-render"' in path.read_text(encoding="utf-8")
@@ -0,0 +1,66 @@
+"""
+数值字段校验（core/normalize.validate_fields）的表驱动测试，字段类型取自 config.ini 的 [field_types]
+
+运行：python -m pytest -q test/test_normalize.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.normalize import get_field_type, validate_fields  # noqa: E402
+
+# (字段名, 识别结果, 是否合法)
+CASES = [
+    # count
+    ("观看数", "1234", True),
+    ("观看数", "0", True),
+    ("观看数", "1,234", True),
+    ("观看数", "12,345,678", True),
+    ("观看数", "1.5万", True),
+    ("观看数", "1.2w", True),
+    ("观看数", "3K", True),
+    ("观看数", "1,23", False),
+    ("观看数", "12.5%", False),
+    ("观看数", "1.5亿", False),
+    ("观看数", "l234", False),
+    ("观看数", "", False),
+    ("点赞数", "--", False),
+    # percent
+    ("封面点击率", "12.5%", True),
+    ("完播率", "0%", True),
+    ("2秒退出率", "100%", True),
+    ("封面点击率", "12.5", False),
+    ("封面点击率", "%", False),
+    ("封面点击率", "12.5%%", False),
+    # duration
+    ("平均观看时长", "12", True),
+    ("平均观看时长", "12.5", True),
+    ("平均观看时长", "1:05", True),
+    ("平均观看时长", "01:02:03", True),
+    ("平均观看时长", "1:2:3:4", False),
+    ("平均观看时长", "1:005", False),
+    ("平均观看时长", "12.5%", False),
+    # 未配置类型的字段不校验
+    ("观看来源-首页推荐", "任意文本", True),
+    ("未知字段", "", True),
+]
+
+
+@pytest.mark.parametrize("field_name, value, valid", CASES)
+def test_validate_single_field(field_name, value, valid):
+    assert validate_fields([value], [field_name]) == ([] if valid else [(field_name, value)])
+
+
+def test_validate_returns_all_invalid_fields_in_order():
+    field_names = ["曝光数", "观看数", "封面点击率", "平均观看时长", "涨粉数"]
+    values = ["1.2万", "abc", "5.1%", "1:0x", "12"]
+    assert validate_fields(values, field_names) == [("观看数", "abc"), ("平均观看时长", "1:0x")]
+
+
+def test_field_types_from_config():
+    assert [get_field_type(name) for name in ("观看数", "完播率", "平均观看时长", "观看来源-首页推荐")] == \
+        ["count", "percent", "duration", None]
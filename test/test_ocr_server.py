@@ -0,0 +1,82 @@
+"""
+HTTP OCR 服务（core/ocr_server.py）的请求参数校验与保存时的任务运行锁测试
+
+运行：python -m pytest -q test/test_ocr_server.py
+"""
+
+import os
+import sys
+from http import HTTPStatus
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core.run  # noqa: E402
+from core import ocr_server  # noqa: E402
+from core.coordinator import RunCoordinator, _try_lock, _unlock  # noqa: E402
+from core.ocr_server import OcrRequest, recognize_request  # noqa: E402
+
+VALID = {"app": "xhs", "hardware": "aibox", "tag": "note_data_overview_top"}
+
+
+def validate(**params):
+    return OcrRequest({**VALID, **params}, b"png").validate()
+
+
+def test_valid_request():
+    assert validate() is None
+    assert OcrRequest({"app": "tiktok", "tag": "analysis_overview"}, b"png").validate() is None
+
+
+@pytest.mark.parametrize("params, error", [
+    ({"tag": ""}, "缺少参数 tag"),
+    ({"app": "../xhs"}, "参数 app"),
+    ({"hardware": "aibox/../../tmp"}, "参数 hardware"),
+    ({"tag": ".."}, "参数 tag"),
+    ({"tag": "note_data_overview_top\\..\\x"}, "参数 tag"),
+    ({"tag": "x; DROP TABLE s_xhs_note_ocr"}, "参数 tag"),
+    ({"tag": "note_traffic_analysis_bak"}, "未配置的标签"),  # 有蒙版目录但未在 [tags] 配置
+    ({"hardware": "futurecloud", "tag": "analysis_overview"}, "蒙版目录不存在"),
+    ({"app": "tiktok"}, "蒙版目录不存在"),
+])
+def test_invalid_request(params, error):
+    assert error in validate(**params)
+
+
+def test_empty_body():
+    assert "请求体为空" in OcrRequest(VALID, b"").validate()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="用 fcntl.flock 检查锁")
+def test_save_holds_run_lock(tmp_path, monkeypatch):
+    lock_path = str(tmp_path / "social_ocr.lock")
+    monkeypatch.setattr(ocr_server, "save_coordinator",
+                        RunCoordinator("coalesce", lock_path=lock_path, report_dir=None, profile=False))
+    monkeypatch.setattr(core.run, "imread_with_pil", lambda data: "image")
+    monkeypatch.setattr(core.run, "recognize_with_masks",
+                        lambda *args, **kwargs: (["12"], ["观看数"], {"观看数": 0.99}))
+    lock_held = []
+
+    def save_recognition(*args):
+        # 写库期间其它实例无法获取锁
+        fd = os.open(lock_path, os.O_RDWR)
+        try:
+            locked = _try_lock(fd)
+            if locked:
+                _unlock(fd)
+            lock_held.append(not locked)
+        finally:
+            os.close(fd)
+
+    monkeypatch.setattr(core.run, "save_recognition", save_recognition)
+    status, payload = recognize_request(OcrRequest({**VALID, "save": "1"}, b"png"))
+    assert status == HTTPStatus.OK and payload["saved"] is True
+    assert lock_held == [True]
+
+    def failing_save(*args):
+        raise OSError("database is locked")
+
+    monkeypatch.setattr(core.run, "save_recognition", failing_save)
+    status, payload = recognize_request(OcrRequest({**VALID, "save": "1"}, b"png"))
+    assert status == HTTPStatus.INTERNAL_SERVER_ERROR and not payload["ok"]
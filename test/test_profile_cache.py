@@ -0,0 +1,80 @@
+"""
+用户信息去重缓存（db/profile_cache.UserInfoBatch）测试：未变化跳过、设备IP变化重新推送、整批复用一个连接
+
+运行：python -m pytest -q test/test_profile_cache.py
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import profile_cache  # noqa: E402
+from db.profile_cache import UserInfoBatch  # noqa: E402
+
+USER_INFO = {"nickname": "小明", "follows": 10, "fans": 200, "interaction": 3000,
+             "profile_url": "https://www.xiaohongshu.com/user/profile/1", "collect_time": "20250902"}
+
+
+@pytest.fixture
+def pushed(monkeypatch):
+    """记录推送到远程的 (用户信息, 应用, 设备IP, 账号ID)，全部推送成功"""
+    entries = []
+
+    def sync_entries(batch):
+        entries.extend(batch)
+        return list(range(len(batch)))
+
+    monkeypatch.setattr(profile_cache, "sync_user_info_entries_to_remote", sync_entries)
+    return entries
+
+
+def test_unchanged_user_info_is_skipped(tmp_path, pushed):
+    path = str(tmp_path / "ocr_data.db")
+    with UserInfoBatch(path) as batch:
+        assert batch.add(USER_INFO, "xhs", "192.168.1.2:5555", "acc")
+        # 同一键在本轮内只推送最后一次
+        assert batch.add({**USER_INFO, "fans": 201}, "xhs", "192.168.1.2:5555", "acc")
+        assert batch.flush() == 1
+    assert [entry[0]["fans"] for entry in pushed] == [201]
+
+    # 新的批次（如下一轮运行）读取已记录的哈希
+    with UserInfoBatch(path) as batch:
+        assert not batch.add({**USER_INFO, "fans": 201}, "xhs", "192.168.1.2:5555", "acc")
+        assert batch.flush() == 0
+    assert len(pushed) == 1
+
+
+def test_device_ip_change_is_pushed(tmp_path, pushed):
+    with UserInfoBatch(str(tmp_path / "ocr_data.db")) as batch:
+        batch.add(USER_INFO, "xhs", "192.168.1.2:5555", "acc")
+        batch.flush()
+        # 远程表会更新 device_ip，换设备采集后需要重新推送
+        assert batch.add(USER_INFO, "xhs", "192.168.1.3:5555", "acc")
+        assert batch.flush() == 1
+        assert not batch.add(USER_INFO, "xhs", "192.168.1.3:5555", "acc")
+    assert [entry[2] for entry in pushed] == ["192.168.1.2:5555", "192.168.1.3:5555"]
+
+
+def test_batch_reuses_one_connection(tmp_path, pushed, monkeypatch):
+    connections = []
+    real_connect = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        connections.append(args)
+        return real_connect(*args, **kwargs)
+
+    monkeypatch.setattr(profile_cache.sqlite3, "connect", connect)
+    with UserInfoBatch(str(tmp_path / "ocr_data.db")) as batch:
+        for i in range(20):
+            batch.add({**USER_INFO, "profile_url": f"https://www.xiaohongshu.com/user/profile/{i}"},
+                      "xhs", "192.168.1.2:5555", f"acc{i}")
+        assert batch.flush() == 20
+        for i in range(20):
+            batch.add({**USER_INFO, "profile_url": f"https://www.xiaohongshu.com/user/profile/{i}"},
+                      "xhs", "192.168.1.2:5555", f"acc{i}")
+        assert batch.skipped_count == 20
+    assert len(connections) == 1
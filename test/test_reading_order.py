@@ -0,0 +1,193 @@
+"""
+阅读顺序排序（core/ocr.sort_by_reading_order）与旧排序实现的对比测试
+
+旧实现固定使用 20 像素（Paddle）/ 5 像素（Surya）分行；新实现的阈值为行高中位数 * 0.5，
+行高中位数为 40 时两者应完全一致，放大截图后新实现的结果不变。
+
+运行：python -m pytest -q test/test_reading_order.py
+"""
+
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ocr import (ROW_HEIGHT_RATIO, sort_by_reading_order, sort_text_lines_by_paddle_position,  # noqa: E402
+                      sort_text_lines_by_surya_position)
+
+SEEDS = range(300)
+
+
+# ======================= 旧实现（重构前的 core/ocr.py） =====================
+def old_sort_paddle(text_lines):
+    def get_line_position(line):
+        box = line['box']
+        y_center = sum(point[1] for point in box) / 4
+        x_center = sum(point[0] for point in box) / 4
+        return (y_center, x_center)
+
+    sorted_lines = sorted(text_lines, key=get_line_position)
+    result = []
+    current_line = []
+    last_y = None
+    for line in sorted_lines:
+        box = line['box']
+        y_center = sum(point[1] for point in box) / 4
+        x_center = sum(point[0] for point in box) / 4
+        if last_y is None or abs(y_center - last_y) < 20:
+            current_line.append((x_center, line))
+        else:
+            current_line.sort(key=lambda x: x[0])
+            result.extend([item[1] for item in current_line])
+            current_line = [(x_center, line)]
+        last_y = y_center
+    if current_line:
+        current_line.sort(key=lambda x: x[0])
+        result.extend([item[1] for item in current_line])
+    return result
+
+
+def old_sort_surya(text_lines):
+    sorted_lines = sorted(text_lines, key=lambda line: line.bbox[1])
+    result = []
+    current_y = None
+    current_group = []
+    for line in sorted_lines:
+        if current_y is None or abs(line.bbox[1] - current_y) > 5:
+            if current_group:
+                current_group.sort(key=lambda l: l.bbox[0])
+                result.extend(current_group)
+            current_group = [line]
+            current_y = line.bbox[1]
+        else:
+            current_group.append(line)
+    if current_group:
+        current_group.sort(key=lambda l: l.bbox[0])
+        result.extend(current_group)
+    return result
+
+
+# ======================= 测试数据 =====================
+def paddle_line(index, x, y, w, h, scale=1):
+    x, y, w, h = x * scale, y * scale, w * scale, h * scale
+    return {"text": str(index), "score": 0.99, "box": [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]}
+
+
+def random_paddle_lines(rng, height=40, scale=1):
+    """
+    行高均为 height 的随机文本行。坐标取小范围内的整数，大量文本行的中心 y 或 x 相同
+    """
+    lines = []
+    for i in range(rng.randint(1, 40)):
+        x = rng.randint(0, 12) * 30
+        y = rng.randint(0, 60) * rng.choice([1, 5, 10])
+        w = rng.choice([20, 40, 60])
+        lines.append(paddle_line(i, x, y, w, height, scale))
+    return lines
+
+
+def texts(lines):
+    return [line["text"] for line in lines]
+
+
+# ======================= Paddle =====================
+def test_matches_old_sorter_when_threshold_is_20():
+    # 行高中位数 40 * 0.5 = 20，与旧实现的固定阈值相同
+    assert 40 * ROW_HEIGHT_RATIO == 20
+    for seed in SEEDS:
+        lines = random_paddle_lines(random.Random(seed))
+        assert texts(sort_text_lines_by_paddle_position(lines)) == texts(old_sort_paddle(lines)), f"seed={seed}"
+
+
+def test_matches_old_sorter_with_mixed_heights_median_40():
+    for seed in SEEDS:
+        rng = random.Random(seed)
+        lines = random_paddle_lines(rng)
+        # 一半文本行改为更矮或更高的行，行高中位数仍为 40
+        for line in lines[: len(lines) // 2]:
+            h = rng.choice([30, 50])
+            top = line["box"][0][1] + 20 - h / 2  # 保持中心 y 不变
+            for point, dy in zip(line["box"], (0, 0, h, h)):
+                point[1] = top + dy
+        heights = sorted(line["box"][2][1] - line["box"][0][1] for line in lines)
+        if len(heights) % 2 == 0 and heights[len(heights) // 2 - 1] != heights[len(heights) // 2]:
+            continue  # 偶数个时中位数可能落在两者之间
+        if heights[len(heights) // 2] != 40:
+            continue
+        assert texts(sort_text_lines_by_paddle_position(lines)) == texts(old_sort_paddle(lines)), f"seed={seed}"
+
+
+def test_matches_old_sorter_when_heights_unavailable():
+    # 行高均为 0 时退回固定的 20 像素阈值
+    for seed in SEEDS:
+        lines = random_paddle_lines(random.Random(seed), height=0)
+        assert texts(sort_text_lines_by_paddle_position(lines)) == texts(old_sort_paddle(lines)), f"seed={seed}"
+
+
+def test_threshold_scales_with_screenshot():
+    # 放大截图后排序结果与原尺寸一致（旧实现的固定阈值会把放大后的同一行拆开）
+    for seed in SEEDS:
+        expected = texts(old_sort_paddle(random_paddle_lines(random.Random(seed))))
+        for scale in (2, 3):
+            lines = random_paddle_lines(random.Random(seed), scale=scale)
+            assert texts(sort_text_lines_by_paddle_position(lines)) == expected, f"seed={seed} scale={scale}"
+
+
+def test_row_threshold_boundary():
+    # 行高中位数 80，阈值 40：中心 y 相差 39.5 为同一行，相差 40 为下一行
+    same_row = [paddle_line("a", 300, 100, 40, 80), paddle_line("b", 0, 139.5, 40, 80)]
+    assert texts(sort_text_lines_by_paddle_position(same_row)) == ["b", "a"]
+    next_row = [paddle_line("a", 300, 100, 40, 80), paddle_line("b", 0, 140, 40, 80)]
+    assert texts(sort_text_lines_by_paddle_position(next_row)) == ["a", "b"]
+
+
+def test_row_break_uses_previous_line_not_row_start():
+    # 与旧实现一致：与上一行文本（而非行首）比较，逐步下移的文本行连成一行
+    lines = [paddle_line(str(i), 300 - i * 50, 100 + i * 15, 40, 40) for i in range(5)]
+    assert texts(sort_text_lines_by_paddle_position(lines)) == ["4", "3", "2", "1", "0"]
+    assert texts(old_sort_paddle(lines)) == ["4", "3", "2", "1", "0"]
+
+
+def test_equal_y_lines_order():
+    # 中心 y 相同：按 x 从左到右；y、x 均相同：保持原始顺序
+    lines = [paddle_line("c", 200, 100, 40, 40), paddle_line("a", 0, 100, 40, 40),
+             paddle_line("b1", 100, 100, 40, 40), paddle_line("b2", 100, 100, 40, 40)]
+    assert texts(sort_text_lines_by_paddle_position(lines)) == ["a", "b1", "b2", "c"]
+    lines[2], lines[3] = lines[3], lines[2]
+    assert texts(sort_text_lines_by_paddle_position(lines)) == ["a", "b2", "b1", "c"]
+    assert texts(old_sort_paddle(lines)) == ["a", "b2", "b1", "c"]
+
+
+def test_empty_input():
+    assert sort_text_lines_by_paddle_position([]) == []
+    assert sort_by_reading_order([], [], default_threshold=20) == []
+
+
+# ======================= Surya =====================
+def random_surya_lines(rng):
+    """
+    常规排版：各行行高相同、行间距不小于行高，同一行的顶部有 0~2 像素抖动
+    """
+    lines = []
+    height = rng.choice([20, 24, 32])
+    row_tops = sorted(rng.sample(range(0, 40), rng.randint(1, 10)))
+    index = 0
+    for row in row_tops:
+        xs = rng.sample(range(0, 20), rng.randint(1, 5))
+        for x in xs:
+            top = row * height * 2 + rng.randint(0, 2)
+            left = x * 50
+            lines.append(SimpleNamespace(text=str(index), bbox=[left, top, left + 40, top + height]))
+            index += 1
+    rng.shuffle(lines)
+    return lines
+
+
+def test_surya_matches_old_sorter_on_normal_layouts():
+    for seed in SEEDS:
+        lines = random_surya_lines(random.Random(seed))
+        new = [line.text for line in sort_text_lines_by_surya_position(lines)]
+        old = [line.text for line in old_sort_surya(lines)]
+        assert new == old, f"seed={seed}"
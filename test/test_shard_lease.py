@@ -0,0 +1,97 @@
+"""
+多节点分片租约（db/shard_lease.py）测试：两个节点通过同一个 SQLite 租约表竞争分片
+
+运行：python -m pytest -q test/test_shard_lease.py
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.shard_lease import ShardLeaseManager, SqliteLeaseStore  # noqa: E402
+
+SHARD = "xhs/aibox/20250902/192.168.1.2:5555#acc"
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """共享同一租约表的两个节点 a / b"""
+    store = SqliteLeaseStore(str(tmp_path / "shard_lease.db"))
+    managers = []
+
+    def make(worker_id, lease_seconds=300):
+        manager = ShardLeaseManager(store, worker_id=worker_id, lease_seconds=lease_seconds)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+def test_only_one_worker_acquires_shard(workers):
+    a, b = workers("a"), workers("b")
+    assert a.acquire(SHARD, "3:100")
+    assert not b.acquire(SHARD, "3:100")
+    # 出错释放（pending）后其它节点可立即领取
+    a.release(SHARD, done=False)
+    assert b.acquire(SHARD, "3:100")
+    assert not a.acquire(SHARD, "3:100")
+
+
+def test_done_shard_is_reacquired_only_when_signature_changes(workers):
+    a, b = workers("a"), workers("b")
+    assert a.acquire(SHARD, "3:100")
+    a.release(SHARD, done=True)
+    assert not b.acquire(SHARD, "3:100")
+    assert b.acquire(SHARD, "4:200")  # 目录有新文件
+
+
+def test_concurrent_acquire_each_shard_once(workers):
+    shards = [f"xhs/aibox/20250902/device{i}" for i in range(30)]
+    managers = [workers(f"w{i}") for i in range(4)]
+    acquired = {manager.worker_id: [] for manager in managers}
+    barrier = threading.Barrier(len(managers))
+
+    def run(manager):
+        barrier.wait()
+        for shard in shards:
+            if manager.acquire(shard, "1:1"):
+                acquired[manager.worker_id].append(shard)
+
+    threads = [threading.Thread(target=run, args=(manager,)) for manager in managers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    owned = [shard for shards_owned in acquired.values() for shard in shards_owned]
+    assert sorted(owned) == sorted(shards)
+
+
+def test_expired_lease_is_taken_over(workers):
+    a, b = workers("a", lease_seconds=0.2), workers("b")
+    assert a.acquire(SHARD, "3:100")
+    assert not b.acquire(SHARD, "3:100")
+    time.sleep(0.3)  # a 宕机，未续约，租约到期
+    assert b.acquire(SHARD, "3:100")
+    # a 恢复后续约失败，停止处理该分片；释放不会覆盖 b 的租约
+    assert a.renew() == [SHARD]
+    assert a.lost(SHARD)
+    a.release(SHARD, done=True)
+    assert not b.lost(SHARD)
+    assert b.renew() == []
+    assert not a.acquire(SHARD, "3:100")
+
+
+def test_renew_keeps_lease(workers):
+    a, b = workers("a", lease_seconds=0.5), workers("b")
+    assert a.acquire(SHARD, "3:100")
+    for _ in range(3):
+        time.sleep(0.2)
+        assert a.renew() == []
+    assert not b.acquire(SHARD, "3:100")
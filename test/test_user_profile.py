@@ -0,0 +1,106 @@
+"""
+ProfileFetcher 并发抓取测试：多个并发 fetch 只启动一个浏览器，context 数不超过上限
+
+浏览器替换为内存中的替身（不需要安装 playwright）。
+
+运行：python -m pytest -q test/test_user_profile.py
+"""
+
+import asyncio
+import os
+import sys
+import types
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.user_profile import ProfileFetcher  # noqa: E402
+
+
+class FakePage:
+    def __init__(self, url_data):
+        self.url_data = url_data
+        self.url = None
+
+    async def goto(self, url, **kwargs):
+        await asyncio.sleep(0)
+        self.url = url
+
+    async def wait_for_function(self, script, **kwargs):
+        await asyncio.sleep(0)
+
+    async def evaluate(self, script):
+        return self.url_data[self.url]
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, url_data):
+        self.url_data = url_data
+
+    async def add_cookies(self, cookies):
+        pass
+
+    async def new_page(self):
+        return FakePage(self.url_data)
+
+    async def close(self):
+        pass
+
+
+class FakeBrowserModule:
+    """playwright.async_api 替身，记录浏览器启动次数与创建的 context 数"""
+
+    def __init__(self, url_data):
+        self.url_data = url_data
+        self.launches = 0
+        self.contexts = 0
+        self.chromium = self
+
+    def async_playwright(self):
+        return self
+
+    async def start(self):
+        await asyncio.sleep(0.01)  # 启动期间让出事件循环，暴露并发启动
+        return self
+
+    async def launch(self, **kwargs):
+        await asyncio.sleep(0.01)
+        self.launches += 1
+        return self
+
+    async def new_context(self):
+        self.contexts += 1
+        return FakeContext(self.url_data)
+
+    async def close(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+def user_data(name):
+    return {"basicInfo": {"nickname": name, "redId": name}, "interactions": []}
+
+
+def test_concurrent_fetches_launch_one_browser(monkeypatch):
+    urls = [f"https://www.xiaohongshu.com/user/profile/{i}" for i in range(8)]
+    fake = FakeBrowserModule({url: user_data(str(i)) for i, url in enumerate(urls)})
+    module = types.ModuleType("playwright.async_api")
+    module.async_playwright = fake.async_playwright
+    monkeypatch.setitem(sys.modules, "playwright", types.ModuleType("playwright"))
+    monkeypatch.setitem(sys.modules, "playwright.async_api", module)
+
+    async def main():
+        fetcher = ProfileFetcher(max_contexts=3, cookie_str="", use_cache=False)
+        try:
+            return await fetcher.fetch_many(urls)
+        finally:
+            await fetcher.close()
+
+    results = asyncio.run(main())
+    assert fake.launches == 1
+    assert fake.contexts <= 3
+    assert [results[url]["nickname"] for url in urls] == [str(i) for i in range(8)]